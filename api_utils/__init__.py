@@ -5,6 +5,67 @@ api_utils
 
 Flask-API-Utils helps you to create APIs.
 
+Modules are imported on first access of their attributes, so apps which
+don't use e.g. authentication don't pay for its import. It's done the same
+way as in Werkzeug.
+
 """
-from .app import ResponsiveFlask
-from .auth import Hawk
+import sys
+from types import ModuleType
+
+# Public objects by module.
+all_by_module = {
+    'api_utils.app': ['ResponsiveFlask'],
+    'api_utils.auth': ['Hawk'],
+}
+
+# Modules which are imported on attribute access, e.g. api_utils.formatters.
+submodules = frozenset((
+    'app', 'auth', 'batch', 'cache', 'cache_control', 'compat', 'compression',
+    'coroutines', 'datastructures', 'formatters', 'json_backends', 'metrics',
+    'negotiation', 'nonces', 'parsers', 'payload', 'ratelimit', 'schema',
+    'signals', 'sqlite', 'timing', 'wrappers',
+))
+
+object_origins = {}
+for module, items in all_by_module.items():
+    for item in items:
+        object_origins[item] = module
+
+
+class module(ModuleType):
+    """Automatically import objects from the modules."""
+
+    def __getattr__(self, name):
+        if name in object_origins:
+            module = __import__(object_origins[name], None, None, [name])
+            for extra_name in all_by_module[module.__name__]:
+                setattr(self, extra_name, getattr(module, extra_name))
+            return getattr(module, name)
+        elif name in submodules:
+            __import__('api_utils.' + name)
+            return sys.modules['api_utils.' + name]
+        return ModuleType.__getattribute__(self, name)
+
+    def __dir__(self):
+        """Just show what we want to show."""
+        result = list(new_module.__all__)
+        result.extend(('__file__', '__path__', '__doc__', '__all__',
+                       '__name__', '__package__'))
+        return result
+
+
+# Keep a reference to this module so that it's not garbage collected.
+old_module = sys.modules['api_utils']
+
+# Setup the new module and patch it into the dict of loaded modules.
+new_module = sys.modules['api_utils'] = module('api_utils')
+new_module.__dict__.update({
+    '__file__': __file__,
+    '__package__': 'api_utils',
+    '__path__': __path__,
+    '__doc__': __doc__,
+    '__all__': tuple(object_origins),
+    '__loader__': globals().get('__loader__'),
+    '__spec__': globals().get('__spec__'),
+})
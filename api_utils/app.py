@@ -6,13 +6,30 @@ api_utils.app
 This module helps to make responses in appropriate formats.
 
 """
+import hashlib
+from functools import partial, wraps
+
+from werkzeug.datastructures import ImmutableDict
 from werkzeug.exceptions import default_exceptions
-from flask import Flask, request
+from flask import Flask, request, stream_with_context, _request_ctx_stack
 
-from . import formatters
+from . import compat, formatters, parsers
+from .cache_control import PRIVATE_POLICY
+from .compression import compress_response
+from .coroutines import (
+    is_awaitable, is_async_iterator, run_sync, iterate_sync
+)
+from .datastructures import LRUCache, FormatterRegistry
+from .formatters import _json_indent, _to_bytes
+from .negotiation import NegotiationTable
+from .json_backends import get_json_backend
+from .timing import start_timer, stop_timer, server_timing_header
+from .wrappers import Request
 
 __all__ = ('ResponsiveFlask',)
 
+_missing = object()
+
 
 class ResponsiveFlask(Flask):
     """Changes Flask behavior to respond in requested format.
@@ -35,46 +52,424 @@ class ResponsiveFlask(Flask):
         app.default_mimetype = xml_mimetype
         app.response_formatters[xml_mimetype] = dummy_xml_formatter
 
+    Formatters' mimetypes are compiled into :attr:`negotiation_table`,
+    so ``application/*`` ranges, ``q=0`` exclusions and structured syntax
+    suffixes (``application/vnd.company+json`` is served by JSON formatter)
+    are supported. Negotiated mimetypes are cached by raw Accept header in
+    :attr:`negotiation_cache`. The table is rebuilt and the cache is cleared
+    whenever :attr:`response_formatters` or :attr:`default_mimetype` changes.
+
+    Large dicts are encoded incrementally and streamed when estimated
+    number of items (top-level keys and items of top-level lists and dicts)
+    reaches ``RESPONSE_STREAMING_THRESHOLD``. Formatter has to provide
+    ``iterencode`` function for that, otherwise the body is built at once.
+
+    Responses are compressed by coding negotiated by Accept-Encoding header
+    when ``RESPONSE_COMPRESSION_ENABLED`` is set, see
+    :func:`api_utils.compression.compress_response` for settings.
+
+    Formatted responses get ETag when ``RESPONSE_ETAG_ENABLED`` is set
+    (weak one if ``RESPONSE_ETAG_WEAK`` is set), so ``If-None-Match``
+    requests are answered with 304. See :meth:`versioned` to skip
+    serialization of unchanged resources.
+
+    Phases of request processing are timed when ``SERVER_TIMING_ENABLED``
+    is set, and their durations are sent in ``Server-Timing`` header.
+    See :mod:`api_utils.timing`.
+
+    Responses get ``Vary: Accept`` and ``Cache-Control`` of
+    :attr:`cache_policy` or of a policy of the view, see
+    :mod:`api_utils.cache_control`.
+
+    Request bodies are parsed by :attr:`request_parsers` on access to
+    ``request.payload``, see :class:`api_utils.wrappers.Request`.
+
+    :param json_backend: Name or sequence of names of JSON libraries
+        in order of preference, see :mod:`api_utils.json_backends`.
+        Flask's stdlib based encoder is used by default.
+
     """
+    default_config = ImmutableDict(dict(
+        Flask.default_config,
+        REQUEST_PAYLOAD_MAX_SIZE=1024 * 1024,
+        RESPONSE_STREAMING_THRESHOLD=None,
+        RESPONSE_STREAMING_CHUNK_SIZE=64 * 1024,
+        RESPONSE_ETAG_ENABLED=False,
+        RESPONSE_ETAG_WEAK=False,
+        SERVER_TIMING_ENABLED=False,
+        RESPONSE_COMPRESSION_ENABLED=False,
+        RESPONSE_COMPRESSION_ENCODINGS=('zstd', 'br', 'gzip', 'deflate'),
+        RESPONSE_COMPRESSION_LEVELS=None,
+        RESPONSE_COMPRESSION_MIN_SIZE=500,
+        RESPONSE_COMPRESSION_EXCLUDED_MIMETYPES=(
+            'image/png', 'image/jpeg', 'image/gif', 'image/webp',
+            'video/', 'audio/', 'font/woff', 'font/woff2',
+            'application/zip', 'application/gzip', 'application/x-gzip',
+            'application/x-bzip2', 'application/x-7z-compressed',
+            'application/x-rar-compressed', 'application/zstd',
+        ),
+    ))
+
+    request_class = Request
+
+    #: Maximum number of distinct Accept headers to remember.
+    negotiation_cache_size = 128
+    #: Maximum number of rendered 406 and static error bodies to remember.
+    rendered_errors_cache_size = 256
+
     def __init__(self, *args, **kwargs):
+        json_backend = kwargs.pop('json_backend', None)
         super(ResponsiveFlask, self).__init__(*args, **kwargs)
+        self.json_backend = get_json_backend(json_backend)
+        self.negotiation_cache = LRUCache(maxsize=self.negotiation_cache_size)
+        self.rendered_errors_cache = LRUCache(
+            maxsize=self.rendered_errors_cache_size
+        )
         self.default_mimetype = 'application/json'
         self.response_formatters = {
             'application/json': formatters.json
         }
+        #: Default :class:`~api_utils.cache_control.CachePolicy` of views.
+        self.cache_policy = None
+        #: Parsers of request bodies by Content-Type, see
+        #: :attr:`api_utils.wrappers.Request.payload`.
+        self.request_parsers = {
+            'application/json': parsers.json,
+            'application/x-ndjson': parsers.ndjson,
+        }
+
+    @property
+    def default_mimetype(self):
+        return self._default_mimetype
+
+    @default_mimetype.setter
+    def default_mimetype(self, mimetype):
+        self._default_mimetype = mimetype
+        self._response_formatters_changed()
 
-    def default_errorhandler(self, f):
+    @property
+    def response_formatters(self):
+        return self._response_formatters
+
+    @response_formatters.setter
+    def response_formatters(self, formatters_map):
+        registry = FormatterRegistry(formatters_map)
+        registry.on_change = self._response_formatters_changed
+        self._response_formatters = registry
+        self._response_formatters_changed()
+
+    def _response_formatters_changed(self):
+        """Rebuilds everything that was derived from formatters."""
+        self.negotiation_table = NegotiationTable(
+            mimetypes=getattr(self, '_response_formatters', ()),
+            default_mimetype=self._default_mimetype,
+        )
+        self.negotiation_cache.clear()
+        self.rendered_errors_cache.clear()
+
+    def default_errorhandler(self, f=None, static=False):
         """Decorator that registers handler of default (Werkzeug) HTTP errors.
 
         Note that it might override already defined error handlers.
 
+        If response of the handler depends only on error code and
+        description, pass ``static=True``. Then formatted body is
+        rendered once per error and negotiated mimetype and served
+        from :attr:`rendered_errors_cache` afterwards::
+
+            @app.default_errorhandler(static=True)
+            def error_handler(error):
+                return {'code': error.code}, error.code
+
         """
+        if f is None:
+            return partial(self.default_errorhandler, static=static)
+
+        handler = self._static_errorhandler(f) if static else f
         for http_code in default_exceptions:
-            self.error_handler_spec[None][http_code] = f
+            self.error_handler_spec[None][http_code] = handler
         return f
 
+    def _static_errorhandler(self, f):
+        """Wraps error handler, so its responses are rendered once."""
+        @wraps(f)
+        def handler(error):
+            response_mimetype = (
+                self._response_mimetype_based_on_accept_header()
+            )
+            if response_mimetype is None:
+                return f(error)
+
+            key = (
+                'error', getattr(error, 'code', None),
+                getattr(error, 'description', None),
+                response_mimetype, self._rendering_key(),
+            )
+            value = self.rendered_errors_cache.get(key)
+            if value is None:
+                response = self.make_response(f(error))
+                if response.is_streamed:
+                    return response
+                value = (response.get_data(), response.status_code, [
+                    (name, header) for name, header in response.headers
+                    if name.lower() != 'content-length'
+                ])
+                self.rendered_errors_cache.set(key, value)
+
+            body, status, headers = value
+            return self.response_class(
+                response=body, status=status, headers=headers
+            )
+
+        return handler
+
+    def _rendering_key(self):
+        """Returns settings which formatted bodies depend on."""
+        return (
+            _json_indent(),
+            self.config['JSON_SORT_KEYS'],
+            self.config['JSON_AS_ASCII'],
+        )
+
+    def _not_acceptable_body(self):
+        """Returns list of available mimetypes in default format.
+        It is rendered once until formatters or settings change.
+
+        """
+        key = ('406', self._rendering_key())
+        body = self.rendered_errors_cache.get(key)
+        if body is None:
+            default_formatter = self.response_formatters.get(
+                self.default_mimetype
+            )
+            default_formatter = getattr(
+                default_formatter, 'error_formatter', default_formatter
+            )
+            body = _to_bytes(default_formatter(
+                mimetypes=list(self.response_formatters)
+            ))
+            self.rendered_errors_cache.set(key, body)
+        return body
+
+    def add_batch_url_rule(self, rule='/batch', endpoint='batch',
+                           max_requests=20, max_workers=None,
+                           decorators=()):
+        """Adds ``POST`` view which runs many API calls in one request,
+        see :class:`api_utils.batch.Batch`.
+
+        .. code-block:: python
+
+            app.add_batch_url_rule(max_workers=4,
+                                   decorators=[hawk.auth_required])
+
+        :param decorators: View decorators, e.g. ``hawk.auth_required``.
+
+        """
+        from .batch import Batch
+
+        batch = Batch(self, max_requests=max_requests, max_workers=max_workers)
+
+        def view_func():
+            return batch.dispatch_request()
+
+        for decorator in decorators:
+            view_func = decorator(view_func)
+        self.add_url_rule(rule, endpoint, view_func, methods=['POST'])
+        return batch
+
+    def versioned(self, version_func):
+        """Decorator that answers conditional requests before view runs.
+
+        ``version_func`` takes the view arguments and returns cheap version
+        key of the resource, e.g. row version or ``updated_at``. ETag is
+        derived from the key and negotiated mimetype, so when it matches
+        ``If-None-Match``, 304 is returned and neither view nor formatter
+        is called::
+
+            @app.route('/products/<int:product_id>')
+            @app.versioned(lambda product_id: Product.version(product_id))
+            def product_detail(product_id):
+                return Product.get(product_id).to_dict()
+
+        """
+        def decorator(view_func):
+            @wraps(view_func)
+            def wrapped_view_func(*args, **kwargs):
+                response_mimetype = (
+                    self._response_mimetype_based_on_accept_header()
+                )
+                if response_mimetype is None:
+                    return view_func(*args, **kwargs)
+
+                version = u'{0}:{1}'.format(
+                    response_mimetype, version_func(*args, **kwargs)
+                )
+                etag = hashlib.sha1(version.encode('utf-8')).hexdigest()
+                _request_ctx_stack.top.version_etag = etag
+                if self._is_not_modified(etag):
+                    response = self.response_class(
+                        status=304, mimetype=response_mimetype
+                    )
+                    response.set_etag(etag, self.config['RESPONSE_ETAG_WEAK'])
+                    return response
+                return view_func(*args, **kwargs)
+
+            return wrapped_view_func
+        return decorator
+
+    def _is_not_modified(self, etag):
+        return (request.method in ('GET', 'HEAD') and
+                request.if_none_match.contains_weak(etag))
+
+    def _make_conditional(self, response):
+        """Sets ETag of formatted response and turns it to 304 if client
+        has the same representation.
+
+        """
+        weak = self.config['RESPONSE_ETAG_WEAK']
+        version_etag = getattr(_request_ctx_stack.top, 'version_etag', None)
+        if version_etag is not None:
+            response.set_etag(version_etag, weak)
+        elif self.config['RESPONSE_ETAG_ENABLED'] and not response.is_streamed:
+            response.add_etag(weak=weak)
+        else:
+            return response
+
+        etag, _ = response.get_etag()
+        if not self._is_not_modified(etag):
+            return response
+
+        not_modified = self.response_class(
+            status=304, mimetype=response.mimetype
+        )
+        not_modified.set_etag(etag, weak)
+        response.close()
+        return not_modified
+
     def _response_mimetype_based_on_accept_header(self):
         """Determines mimetype to response based on Accept header.
 
         If mimetype is not found, it returns ``None``.
 
         """
-        response_mimetype = None
+        started_at = start_timer(self)
+        accept_header = request.headers.get('Accept', '')
+        # Every response depends on Accept header, see process_response.
+        _request_ctx_stack.top.response_negotiated = True
+        response_mimetype = self.negotiation_cache.get(accept_header, _missing)
+        if response_mimetype is _missing:
+            response_mimetype = self.negotiation_table.select(accept_header)
+            self.negotiation_cache.set(accept_header, response_mimetype)
+        stop_timer(self, 'negotiation', started_at)
+        return response_mimetype
 
-        if not request.accept_mimetypes:
-            response_mimetype = self.default_mimetype
-        else:
-            all_media_types_wildcard = '*/*'
+    def _request_parser(self, mimetype):
+        """Returns parser of request mimetype. ``+json`` and ``+xml``
+        suffixes are served by parsers of ``application/json`` and
+        ``application/xml``.
 
-            for mimetype, q in request.accept_mimetypes:
-                if mimetype == all_media_types_wildcard:
-                    response_mimetype = self.default_mimetype
-                    break
-                if mimetype in self.response_formatters:
-                    response_mimetype = mimetype
-                    break
+        """
+        parser = self.request_parsers.get(mimetype)
+        if parser is None and '+' in mimetype:
+            parser = self.request_parsers.get(
+                'application/' + mimetype.rsplit('+', 1)[1]
+            )
+        return parser
 
-        return response_mimetype
+    def _response_formatter(self, response_mimetype):
+        """Returns formatter which serves negotiated mimetype."""
+        return self.response_formatters.get(
+            self.negotiation_table.formatter_mimetype(response_mimetype)
+        )
+
+    def _view_serializer(self):
+        """Returns serializer attached to the view by
+        :func:`~api_utils.schema.output_schema`.
+
+        """
+        view_func = self.view_functions.get(request.endpoint)
+        return getattr(view_func, 'output_serializer', None)
+
+    def dispatch_request(self):
+        """Runs coroutine of async view, so its exceptions are handled by
+        error handlers of the app.
+
+        Return value of the view is marked, so error responses made after
+        it are not serialized by schema of the view.
+
+        """
+        return self._view_return_value(
+            super(ResponsiveFlask, self).dispatch_request()
+        )
+
+    def _view_return_value(self, rv):
+        """Awaits return value of the view if it's a coroutine and marks
+        it, so :meth:`make_response` can serialize it by schema. It's used
+        by decorators which make responses of views themselves.
+
+        """
+        if is_awaitable(rv):
+            rv = run_sync(rv)
+        _request_ctx_stack.top.view_returned = True
+        return rv
+
+    def _view_cache_policy(self):
+        """Returns policy attached to the view by
+        :func:`~api_utils.cache_control.cache_policy`.
+
+        """
+        view_func = self.view_functions.get(request.endpoint)
+        return getattr(view_func, 'cache_policy', None)
+
+    def _apply_cache_policy(self, response):
+        """Sets Vary and Cache-Control headers of the response."""
+        ctx = _request_ctx_stack.top
+        if getattr(ctx, 'response_negotiated', False):
+            response.vary.add('Accept')
+        auth_vary = getattr(ctx, 'auth_vary', ())
+        for header in auth_vary:
+            response.vary.add(header)
+
+        if request.method not in ('GET', 'HEAD'):
+            return response
+        policy = self._view_cache_policy() or self.cache_policy
+        if policy is None and auth_vary:
+            policy = PRIVATE_POLICY
+        if policy is not None:
+            policy.apply(response, authenticated=bool(auth_vary))
+        return response
+
+    def _is_large_response(self, rv):
+        """Estimates size of dict by its top-level items, e.g.
+        ``{'objects': [...]}`` has ``1 + len(objects)`` items.
+
+        """
+        threshold = self.config['RESPONSE_STREAMING_THRESHOLD']
+        if threshold is None:
+            return False
+
+        size = len(rv)
+        for value in rv.values():
+            if isinstance(value, (list, tuple, dict)):
+                size += len(value)
+            if size >= threshold:
+                return True
+        return False
+
+    def process_response(self, response):
+        """Compresses response after ``after_request`` functions,
+        so they deal with uncompressed body.
+
+        """
+        response = super(ResponsiveFlask, self).process_response(response)
+        response = self._apply_cache_policy(response)
+        if self.config['SERVER_TIMING_ENABLED']:
+            timing = server_timing_header()
+            if timing is not None:
+                response.headers['Server-Timing'] = timing
+        if self.config['RESPONSE_COMPRESSION_ENABLED']:
+            response = compress_response(response, self.config)
+        return response
 
     def make_response(self, rv):
         """Returns response based on Accept header.
@@ -88,20 +483,29 @@ class ResponsiveFlask(Flask):
         Accept field value, then a 406 (not acceptable) response will
         be sent.
 
+        If view returns an iterator of records (e.g. generator), they are
+        streamed by ``stream`` function of the formatter.
+
+        Async generators are streamed as iterators, see
+        :mod:`api_utils.coroutines`. Coroutines of async views are run
+        by :meth:`dispatch_request`.
+
         """
+        ctx = _request_ctx_stack.top
+        view_returned = getattr(ctx, 'view_returned', False)
+        ctx.view_returned = False
         status = headers = None
         if isinstance(rv, tuple):
             rv, status, headers = rv + (None,) * (3 - len(rv))
+        if is_async_iterator(rv):
+            rv = iterate_sync(rv)
 
         response_mimetype = self._response_mimetype_based_on_accept_header()
         if response_mimetype is None:
             # Return 406, list of available mimetypes in default format.
-            default_formatter = self.response_formatters.get(
-                self.default_mimetype
-            )
-            available_mimetypes = default_formatter(
-                mimetypes=list(self.response_formatters)
-            )
+            started_at = start_timer(self)
+            available_mimetypes = self._not_acceptable_body()
+            stop_timer(self, 'format', started_at)
 
             rv = self.response_class(
                 response=available_mimetypes,
@@ -109,11 +513,46 @@ class ResponsiveFlask(Flask):
                 mimetype=self.default_mimetype,
             )
         elif isinstance(rv, dict):
-            formatter = self.response_formatters.get(response_mimetype)
+            started_at = start_timer(self)
+            formatter = self._response_formatter(response_mimetype)
+            if view_returned and status in (None, 200):
+                if formatter is formatters.json:
+                    formatter = self._view_serializer() or formatter
+            else:
+                # Error bodies don't match schema of schema serializers.
+                formatter = getattr(formatter, 'error_formatter', formatter)
+            iterencode = getattr(formatter, 'iterencode', None)
+            if iterencode is not None and self._is_large_response(rv):
+                body = stream_with_context(iterencode(
+                    rv, chunk_size=self.config['RESPONSE_STREAMING_CHUNK_SIZE']
+                ))
+            else:
+                body = formatter(**rv)
+            stop_timer(self, 'format', started_at)
+            rv = self.response_class(
+                response=body,
+                mimetype=response_mimetype,
+            )
+            if status in (None, 200):
+                rv = self._make_conditional(rv)
+        elif isinstance(rv, compat.Iterator):
+            started_at = start_timer(self)
+            formatter = self._response_formatter(response_mimetype)
+            stream = getattr(formatter, 'stream', None)
+            if stream is None:
+                raise TypeError(
+                    'Formatter of {0} does not support streaming'.format(
+                        response_mimetype
+                    )
+                )
+            body = stream_with_context(stream(rv))
+            stop_timer(self, 'format', started_at)
             rv = self.response_class(
-                response=formatter(**rv),
+                response=body,
                 mimetype=response_mimetype,
             )
+            if status in (None, 200):
+                rv = self._make_conditional(rv)
 
         return super(ResponsiveFlask, self).make_response(
             rv=(rv, status, headers)
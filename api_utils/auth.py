@@ -7,20 +7,24 @@ This module provides API authentication based on Hawk scheme and
 Flask-Login extension.
 
 """
+import math
 from functools import wraps
 
-from flask import request, session, current_app
+from flask import request, session, current_app, _request_ctx_stack
 from werkzeug.exceptions import BadRequest, Unauthorized
-try:
-    import mohawk
-    from flask.ext.login import current_user
-except ImportError:
-    pass
 
 from . import compat
+from .coroutines import is_awaitable, run_sync
+from .datastructures import LRUCache
+from .ratelimit import MemoryRateLimitBackend, RateLimitExceeded
+from .signals import hawk_auth_failed
+from .timing import start_timer, stop_timer
 
 __all__ = ('Hawk',)
 
+_missing = object()
+_not_found = object()
+
 
 class Hawk(object):
     """HTTP authentication scheme using a message authentication code
@@ -28,9 +32,21 @@ class Hawk(object):
 
     Instances are *not* bound to specific apps.
 
+    :param nonce_store: :class:`~api_utils.nonces.NonceStore` which
+        protects from replay attacks. Note that there is no protection
+        by default.
+    :param rate_limit_backend: :class:`~api_utils.ratelimit.RateLimitBackend`
+        which keeps request rates of clients when ``HAWK_RATE_LIMIT``
+        is set. In-memory backend is used by default.
+
     """
-    def __init__(self, app=None):
+    def __init__(self, app=None, nonce_store=None, rate_limit_backend=None):
         self._client_key_loader_func = None
+        self.nonce_store = nonce_store
+        self.rate_limit_backend = rate_limit_backend
+        #: :class:`~api_utils.datastructures.LRUCache` of client keys,
+        #: it's created on first lookup if the cache is enabled.
+        self.credentials_cache = None
 
         if app is not None:
             self.init_app(app)
@@ -43,9 +59,17 @@ class Hawk(object):
         app.config.setdefault('HAWK_ACCEPT_UNTRUSTED_CONTENT', False)
         app.config.setdefault('HAWK_LOCALTIME_OFFSET_IN_SECONDS', 0)
         app.config.setdefault('HAWK_TIMESTAMP_SKEW_IN_SECONDS', 60)
+        app.config.setdefault('HAWK_CREDENTIALS_CACHE_TTL', None)
+        app.config.setdefault('HAWK_CREDENTIALS_CACHE_SIZE', 1024)
+        app.config.setdefault('HAWK_CREDENTIALS_NEGATIVE_CACHE_TTL', 5)
+        app.config.setdefault('HAWK_STREAMING_PAYLOAD_HASH', False)
+        app.config.setdefault('HAWK_PAYLOAD_SPOOL_MAX_SIZE', 1024 * 1024)
+        app.config.setdefault('HAWK_RATE_LIMIT', None)
+        app.config.setdefault('HAWK_RATE_LIMIT_BURST', None)
 
         if app.config['HAWK_SIGN_RESPONSE']:
             app.after_request(self._sign_response)
+        app.after_request(self._add_retry_after)
 
     def client_key_loader(self, f):
         """Registers a function to be called to find a client key.
@@ -59,12 +83,25 @@ class Hawk(object):
                 else:
                     raise LookupError()
 
+        Client keys are cached for ``HAWK_CREDENTIALS_CACHE_TTL`` seconds
+        if it is set. Unknown clients are cached for
+        ``HAWK_CREDENTIALS_NEGATIVE_CACHE_TTL`` seconds, so floods of
+        unknown ids don't hit the storage.
+
+        Function can be a coroutine function, then it's run on event loop
+        of the thread, see :mod:`api_utils.coroutines`.
+
         :param f: The callback for retrieving a client key.
 
         """
         @wraps(f)
         def wrapped_f(client_id):
-            client_key = f(client_id)
+            app = current_app._get_current_object()
+            started_at = start_timer(app)
+            try:
+                client_key = self._load_client_key(f, client_id)
+            finally:
+                stop_timer(app, 'hawk-credentials', started_at)
             return {
                 'id': client_id,
                 'key': client_key,
@@ -74,16 +111,76 @@ class Hawk(object):
         self._client_key_loader_func = wrapped_f
         return wrapped_f
 
+    def invalidate_client_key(self, client_id=None):
+        """Removes client key from the cache, e.g. when it was rotated.
+
+        :param client_id: Client id or ``None`` to remove all keys.
+
+        """
+        if self.credentials_cache is None:
+            return
+        if client_id is None:
+            self.credentials_cache.clear()
+        else:
+            self.credentials_cache.delete(client_id)
+
+    def _call_client_key_loader(self, f, client_id):
+        client_key = f(client_id)
+        if is_awaitable(client_key):
+            client_key = run_sync(client_key)
+        return client_key
+
+    def _load_client_key(self, f, client_id):
+        ttl = current_app.config['HAWK_CREDENTIALS_CACHE_TTL']
+        if not ttl:
+            return self._call_client_key_loader(f, client_id)
+
+        if self.credentials_cache is None:
+            self.credentials_cache = LRUCache(
+                maxsize=current_app.config['HAWK_CREDENTIALS_CACHE_SIZE']
+            )
+        client_key = self.credentials_cache.get(client_id, _missing)
+        if client_key is _not_found:
+            raise LookupError()
+        if client_key is not _missing:
+            return client_key
+
+        try:
+            client_key = self._call_client_key_loader(f, client_id)
+        except LookupError:
+            negative_ttl = current_app.config[
+                'HAWK_CREDENTIALS_NEGATIVE_CACHE_TTL'
+            ]
+            if negative_ttl:
+                self.credentials_cache.set(
+                    client_id, _not_found, ttl=negative_ttl
+                )
+            raise
+        self.credentials_cache.set(client_id, client_key, ttl=ttl)
+        return client_key
+
     def auth_required(self, view_func):
         """Decorator that provides an access to view function for
         authenticated users only.
 
         Note that we don't run authentication when `HAWK_ENABLED` is `False`.
 
+        Responses of :class:`~api_utils.ResponsiveFlask` get
+        ``Vary: Authorization`` and private ``Cache-Control``.
+
         """
         @wraps(view_func)
         def wrapped_view_func(*args, **kwargs):
             if current_app.config['HAWK_ENABLED']:
+                # Response depends on credentials, so it must not be
+                # shared by caches, see ResponsiveFlask.cache_policy.
+                if current_app.config['HAWK_ALLOW_COOKIE_AUTH']:
+                    _request_ctx_stack.top.auth_vary = (
+                        'Authorization', 'Cookie'
+                    )
+                else:
+                    _request_ctx_stack.top.auth_vary = ('Authorization',)
+
                 if current_app.config['HAWK_ALLOW_COOKIE_AUTH'] and session:
                     self._auth_by_cookie()
                 else:
@@ -92,29 +189,71 @@ class Hawk(object):
 
         return wrapped_view_func
 
+    def _seen_nonce(self, sender_id, nonce, timestamp):
+        skew = (
+            current_app.config['HAWK_TIMESTAMP_SKEW_IN_SECONDS'] +
+            abs(current_app.config['HAWK_LOCALTIME_OFFSET_IN_SECONDS'])
+        )
+        return self.nonce_store.seen(sender_id, nonce, timestamp, skew)
+
     def _auth_by_cookie(self):
+        from flask.ext.login import current_user
+
         if not compat.is_user_authenticated(current_user):
             raise Unauthorized()
 
     def _auth_by_signature(self):
+        # mohawk is imported on first use, so it doesn't slow down
+        # startup of apps which don't need it.
+        import mohawk
+        from .batch import HAWK_RECEIVER_ENVIRON_KEY
+        from .payload import StreamingReceiver
+
         if self._client_key_loader_func is None:
             raise RuntimeError('Client key loader function was not defined')
+
+        receiver = request.environ.get(HAWK_RECEIVER_ENVIRON_KEY)
+        if receiver is not None:
+            # Sub-request of a batch which was verified as a whole.
+            _request_ctx_stack.top.hawk_receiver = receiver
+            self._limit_rate(receiver.parsed_header['id'])
+            return
+
         if 'Authorization' not in request.headers:
+            self._auth_failed('MissingAuthorization')
             raise Unauthorized()
 
+        seen_nonce = None
+        if self.nonce_store is not None:
+            seen_nonce = self._seen_nonce
+
+        receiver_kwargs = dict(
+            credentials_map=self._client_key_loader_func,
+            request_header=request.headers['Authorization'],
+            url=request.url,
+            method=request.method,
+            seen_nonce=seen_nonce,
+            accept_untrusted_content=current_app.config['HAWK_ACCEPT_UNTRUSTED_CONTENT'],
+            localtime_offset_in_seconds=current_app.config['HAWK_LOCALTIME_OFFSET_IN_SECONDS'],
+            timestamp_skew_in_seconds=current_app.config['HAWK_TIMESTAMP_SKEW_IN_SECONDS']
+        )
+        app = current_app._get_current_object()
+        started_at = start_timer(app)
         try:
-            mohawk.Receiver(
-                credentials_map=self._client_key_loader_func,
-                request_header=request.headers['Authorization'],
-                url=request.url,
-                method=request.method,
-                content=request.get_data(),
-                content_type=request.mimetype,
-                accept_untrusted_content=current_app.config['HAWK_ACCEPT_UNTRUSTED_CONTENT'],
-                localtime_offset_in_seconds=current_app.config['HAWK_LOCALTIME_OFFSET_IN_SECONDS'],
-                timestamp_skew_in_seconds=current_app.config['HAWK_TIMESTAMP_SKEW_IN_SECONDS']
-            )
-        except mohawk.exc.MacMismatch:
+            if current_app.config['HAWK_STREAMING_PAYLOAD_HASH']:
+                receiver = StreamingReceiver(
+                    request=request,
+                    spool_max_size=current_app.config['HAWK_PAYLOAD_SPOOL_MAX_SIZE'],
+                    **receiver_kwargs
+                )
+            else:
+                receiver = mohawk.Receiver(
+                    content=request.get_data(),
+                    content_type=request.mimetype,
+                    **receiver_kwargs
+                )
+        except mohawk.exc.MacMismatch as e:
+            self._auth_failed(type(e).__name__)
             # mohawk exception contains computed MAC.
             # We should not expose it in response.
             raise Unauthorized()
@@ -124,17 +263,70 @@ class Hawk(object):
             mohawk.exc.MisComputedContentHash,
             mohawk.exc.TokenExpired
         ) as e:
+            self._auth_failed(type(e).__name__)
             raise Unauthorized(str(e))
         except mohawk.exc.HawkFail as e:
+            self._auth_failed(type(e).__name__)
             raise BadRequest(str(e))
-        except KeyError:
+        except KeyError as e:
+            self._auth_failed(type(e).__name__)
             raise BadRequest()
+        finally:
+            stop_timer(app, 'hawk-verify', started_at)
+
+        # Response is signed by verified receiver, so request is not
+        # verified twice.
+        _request_ctx_stack.top.hawk_receiver = receiver
+        self._limit_rate(receiver.parsed_header['id'])
+
+    def _auth_failed(self, reason):
+        hawk_auth_failed.send(current_app._get_current_object(), reason=reason)
+
+    def _limit_rate(self, client_id):
+        """Raises :class:`~api_utils.ratelimit.RateLimitExceeded` when
+        the client exceeded ``HAWK_RATE_LIMIT`` requests per second.
+
+        """
+        rate = current_app.config['HAWK_RATE_LIMIT']
+        if not rate:
+            return
+        burst = (current_app.config['HAWK_RATE_LIMIT_BURST'] or
+                 max(int(math.ceil(rate)), 1))
+
+        if self.rate_limit_backend is None:
+            self.rate_limit_backend = MemoryRateLimitBackend()
+        retry_after = self.rate_limit_backend.consume(client_id, rate, burst)
+        if retry_after:
+            e = RateLimitExceeded(retry_after)
+            _request_ctx_stack.top.hawk_rate_limit_exceeded = e
+            raise e
+
+    def _add_retry_after(self, response):
+        """Adds ``Retry-After`` header to responses which were built
+        by custom error handlers.
+
+        """
+        e = getattr(_request_ctx_stack.top, 'hawk_rate_limit_exceeded', None)
+        if e is not None and 'Retry-After' not in response.headers:
+            response.headers['Retry-After'] = e.retry_after_header
+        return response
 
     def _sign_response(self, response):
-        """Signs a response if it's possible."""
+        """Signs a response if it's possible.
+
+        Request is verified once again only if view was not protected
+        by :meth:`auth_required`.
+
+        """
         if 'Authorization' not in request.headers:
             return response
 
+        import mohawk
+
+        mohawk_receiver = getattr(_request_ctx_stack.top, 'hawk_receiver', None)
+        if mohawk_receiver is not None:
+            return self._set_server_authorization(response, mohawk_receiver)
+
         try:
             mohawk_receiver = mohawk.Receiver(
                 credentials_map=self._client_key_loader_func,
@@ -150,8 +342,14 @@ class Hawk(object):
         except mohawk.exc.HawkFail:
             return response
 
+        return self._set_server_authorization(response, mohawk_receiver)
+
+    def _set_server_authorization(self, response, mohawk_receiver):
+        app = current_app._get_current_object()
+        started_at = start_timer(app)
         response.headers['Server-Authorization'] = mohawk_receiver.respond(
             content=response.data,
             content_type=response.mimetype
         )
+        stop_timer(app, 'hawk-sign', started_at)
         return response
@@ -0,0 +1,219 @@
+# coding: utf-8
+"""
+api_utils.batch
+~~~~~~~~~~~~~~~
+
+This module runs many API calls in one HTTP request.
+
+Batch is a JSON list of sub-requests which are dispatched in process
+by the app, so a client pays for one round trip and one authentication:
+
+.. code-block:: http
+
+    POST /batch HTTP/1.1
+    Content-Type: application/json
+
+    {"requests": [
+        {"method": "GET", "path": "/products?page=2"},
+        {"method": "POST", "path": "/carts", "body": {"product_id": 1}}
+    ]}
+
+Responses are returned in the same order in the negotiated format::
+
+    {"responses": [
+        {"status": 200, "headers": {...}, "body": {...}},
+        {"status": 201, "headers": {...}, "body": {...}}
+    ]}
+
+Values of repeated response headers (e.g. ``Set-Cookie``) are lists.
+Binary bodies (e.g. of ``Accept: application/msgpack``) are embedded
+as base64 strings and marked by ``"body_encoding": "base64"``.
+
+"""
+import base64
+import threading
+from multiprocessing.pool import ThreadPool
+
+from flask import request, json, _request_ctx_stack
+from werkzeug.datastructures import Headers
+from werkzeug.exceptions import BadRequest, RequestEntityTooLarge
+from werkzeug.test import EnvironBuilder
+
+__all__ = ('Batch',)
+
+#: Environ key which marks sub-requests of a batch.
+BATCH_ENVIRON_KEY = 'api_utils.batch'
+#: Environ key of verified Hawk receiver of the batch request.
+HAWK_RECEIVER_ENVIRON_KEY = 'api_utils.batch.hawk_receiver'
+
+#: Requests which don't change state, so they can run concurrently.
+SAFE_METHODS = frozenset(('GET', 'HEAD', 'OPTIONS'))
+
+#: Headers of the batch request which are passed to sub-requests.
+INHERITED_HEADERS = ('Cookie', 'Accept-Language', 'User-Agent')
+
+#: Headers of sub-requests which are ignored. Sub-responses are embedded
+#: into the batch response, so they must not be compressed.
+IGNORED_HEADERS = frozenset(('accept-encoding',))
+
+_string_types = (str, type(u''))
+
+
+def _is_json(mimetype):
+    return mimetype == 'application/json' or mimetype.endswith('+json')
+
+
+def _is_text(mimetype):
+    return (mimetype.startswith('text/') or
+            mimetype in ('application/xml', 'application/javascript') or
+            mimetype.endswith('+xml'))
+
+
+class Batch(object):
+    """Dispatches sub-requests of a batch through the app's URL map.
+
+    Sub-requests ask for JSON unless they have ``Accept`` header, so their
+    bodies are embedded into the batch response as is. Other textual bodies
+    are embedded as strings, binary ones as base64 strings.
+
+    When the batch request was authenticated by
+    :meth:`~api_utils.Hawk.auth_required`, sub-requests are trusted
+    without signatures. Rate limit is still applied to every sub-request.
+
+    Consecutive ``GET``, ``HEAD`` and ``OPTIONS`` sub-requests run
+    concurrently on a pool of ``max_workers`` threads if it is set, other
+    ones run one by one in the given order.
+
+    :param max_requests: Maximum number of sub-requests in a batch.
+    :param max_workers: Size of thread pool, sub-requests run in the
+        request's thread by default.
+
+    """
+    def __init__(self, app, max_requests=20, max_workers=None):
+        self.app = app
+        self.max_requests = max_requests
+        self.max_workers = max_workers
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def dispatch_request(self):
+        """Returns dict of sub-responses of the current request."""
+        if BATCH_ENVIRON_KEY in request.environ:
+            raise BadRequest('Batches can not be nested')
+
+        environs = [self._make_environ(sub_request)
+                    for sub_request in self._parse_batch()]
+        responses = []
+        for group in self._group(environs):
+            if len(group) > 1 and self.max_workers:
+                responses.extend(self._get_pool().map(self._run, group))
+            else:
+                responses.extend(self._run(environ) for environ in group)
+        return {'responses': responses}
+
+    def _parse_batch(self):
+        batch = request.get_json(force=True, silent=True)
+        if not isinstance(batch, dict):
+            raise BadRequest('Batch must be a JSON object')
+        sub_requests = batch.get('requests')
+        if not isinstance(sub_requests, list):
+            raise BadRequest('Batch must have list of requests')
+        if len(sub_requests) > self.max_requests:
+            raise RequestEntityTooLarge(
+                'Batch has more than {0} requests'.format(self.max_requests)
+            )
+
+        for sub_request in sub_requests:
+            if (not isinstance(sub_request, dict) or
+                    not isinstance(sub_request.get('path'), _string_types) or
+                    not sub_request['path'].startswith('/')):
+                raise BadRequest('Request must have absolute path')
+            if not isinstance(sub_request.get('method', 'GET'),
+                              _string_types):
+                raise BadRequest('Request method must be a string')
+            headers = sub_request.get('headers', {})
+            if (not isinstance(headers, dict) or not all(
+                    isinstance(value, _string_types)
+                    for value in headers.values())):
+                raise BadRequest('Request headers must be a JSON object '
+                                 'of strings')
+        return sub_requests
+
+    def _make_environ(self, sub_request):
+        path, _, query_string = sub_request['path'].partition('?')
+        headers = Headers([(name, request.headers[name])
+                           for name in INHERITED_HEADERS
+                           if name in request.headers])
+        headers['Accept'] = 'application/json'
+        for name, value in sub_request.get('headers', {}).items():
+            if name.lower() not in IGNORED_HEADERS:
+                headers[name] = value
+
+        kwargs = {}
+        if 'body' in sub_request:
+            kwargs['data'] = json.dumps(sub_request['body'])
+            kwargs['content_type'] = 'application/json'
+
+        builder = EnvironBuilder(
+            path=path,
+            query_string=query_string,
+            base_url=request.url_root,
+            method=sub_request.get('method', 'GET').upper(),
+            headers=headers,
+            environ_base={'REMOTE_ADDR': request.remote_addr},
+            **kwargs
+        )
+        environ = builder.get_environ()
+        environ[BATCH_ENVIRON_KEY] = True
+        hawk_receiver = getattr(_request_ctx_stack.top, 'hawk_receiver', None)
+        if hawk_receiver is not None:
+            environ[HAWK_RECEIVER_ENVIRON_KEY] = hawk_receiver
+        return environ
+
+    def _group(self, environs):
+        """Splits sub-requests to groups which can run concurrently."""
+        group = []
+        for environ in environs:
+            if environ['REQUEST_METHOD'] not in SAFE_METHODS:
+                if group:
+                    yield group
+                    group = []
+                yield [environ]
+            else:
+                group.append(environ)
+        if group:
+            yield group
+
+    def _get_pool(self):
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ThreadPool(self.max_workers)
+        return self._pool
+
+    def _run(self, environ):
+        response = self.app.response_class.from_app(
+            self.app.wsgi_app, environ, buffered=True
+        )
+        sub_response = {'status': response.status_code}
+        data = response.get_data()
+        body = None
+        if data and (_is_json(response.mimetype) or
+                     _is_text(response.mimetype)):
+            try:
+                body = data.decode(response.charset)
+            except UnicodeDecodeError:
+                pass
+            else:
+                if _is_json(response.mimetype):
+                    body = json.loads(body)
+        if data and body is None:
+            body = base64.b64encode(data).decode('ascii')
+            sub_response['body_encoding'] = 'base64'
+        headers = {}
+        for name in response.headers.keys():
+            if name not in headers:
+                values = response.headers.getlist(name)
+                headers[name] = values[0] if len(values) == 1 else values
+        sub_response.update(headers=headers, body=body)
+        return sub_response
@@ -0,0 +1,313 @@
+# coding: utf-8
+"""
+api_utils.cache
+~~~~~~~~~~~~~~~
+
+This module caches formatted responses of views, so neither a view
+nor a formatter runs on cache hit.
+
+"""
+import hashlib
+import json
+import sqlite3
+import time
+from functools import wraps
+
+from flask import request, current_app, _request_ctx_stack
+
+from .datastructures import LRUCache
+from .sqlite import SQLiteConnector
+
+__all__ = ('ResponseCache', 'CacheBackend', 'MemoryCacheBackend',
+           'SQLiteCacheBackend')
+
+#: Headers which are not stored with cached response.
+UNCACHED_HEADERS = frozenset(('content-length', 'set-cookie'))
+
+
+class CacheBackend(object):
+    """Protocol of response cache storages.
+
+    Values are ``(body, status, headers)`` tuples, where ``body`` is bytes,
+    ``status`` is int and ``headers`` is a list of ``(name, value)`` pairs.
+    External stores can use :meth:`dumps` and :meth:`loads` to convert
+    values to bytes and back.
+
+    """
+    def get(self, key):
+        """Returns value or ``None`` if key is not found or expired."""
+        raise NotImplementedError()
+
+    def set(self, key, value, ttl):
+        raise NotImplementedError()
+
+    def delete(self, key):
+        raise NotImplementedError()
+
+    def clear(self):
+        raise NotImplementedError()
+
+    def stats(self):
+        """Returns dict with ``hits``, ``misses`` and ``evictions``
+        counters.
+
+        """
+        raise NotImplementedError()
+
+    @staticmethod
+    def dumps(value):
+        body, status, headers = value
+        meta = json.dumps([status, headers]).encode('utf-8')
+        return meta + b'\n' + body
+
+    @staticmethod
+    def loads(data):
+        meta, body = data.split(b'\n', 1)
+        status, headers = json.loads(meta.decode('utf-8'))
+        return body, status, [tuple(header) for header in headers]
+
+
+class MemoryCacheBackend(CacheBackend):
+    """In-process LRU cache. Each worker process has its own one."""
+    def __init__(self, maxsize=1024, clock=time.time):
+        self._cache = LRUCache(maxsize=maxsize, clock=clock)
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def set(self, key, value, ttl):
+        self._cache.set(key, value, ttl=ttl)
+
+    def delete(self, key):
+        self._cache.delete(key)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self):
+        return self._cache.stats()
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """LRU cache in SQLite database which is shared by worker processes
+    of a host.
+
+    Counters returned by :meth:`stats` are per process.
+
+    :param path: Path to database file.
+    :param maxsize: Maximum number of entries.
+
+    """
+    #: Statements which are run on every new connection.
+    schema = (
+        'CREATE TABLE IF NOT EXISTS response_cache ('
+        'key TEXT PRIMARY KEY, status INTEGER, headers TEXT, '
+        'body BLOB, expires REAL, accessed REAL)',
+        'CREATE INDEX IF NOT EXISTS response_cache_accessed '
+        'ON response_cache (accessed)',
+    )
+
+    def __init__(self, path, maxsize=1024, timeout=5.0, clock=time.time):
+        self.path = path
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._connector = SQLiteConnector(path, self.schema, timeout)
+
+    def _connection(self):
+        return self._connector.connection()
+
+    def get(self, key):
+        connection = self._connection()
+        now = self.clock()
+        row = connection.execute(
+            'SELECT status, headers, body, expires FROM response_cache '
+            'WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None or row[3] <= now:
+            self.misses += 1
+            return None
+
+        connection.execute(
+            'UPDATE response_cache SET accessed = ? WHERE key = ?', (now, key)
+        )
+        self.hits += 1
+        status, headers, body, _ = row
+        return (
+            bytes(body), status,
+            [tuple(header) for header in json.loads(headers)]
+        )
+
+    def set(self, key, value, ttl):
+        body, status, headers = value
+        connection = self._connection()
+        now = self.clock()
+        connection.execute(
+            'INSERT OR REPLACE INTO response_cache '
+            '(key, status, headers, body, expires, accessed) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (key, status, json.dumps(headers), sqlite3.Binary(body),
+             now + ttl, now)
+        )
+        cursor = connection.execute(
+            'DELETE FROM response_cache WHERE key IN ('
+            'SELECT key FROM response_cache ORDER BY accessed LIMIT max('
+            '(SELECT count(*) FROM response_cache) - ?, 0))',
+            (self.maxsize,)
+        )
+        self.evictions += max(cursor.rowcount, 0)
+
+    def delete(self, key):
+        self._connection().execute(
+            'DELETE FROM response_cache WHERE key = ?', (key,)
+        )
+
+    def clear(self):
+        self._connection().execute('DELETE FROM response_cache')
+
+    def stats(self):
+        size = self._connection().execute(
+            'SELECT count(*) FROM response_cache'
+        ).fetchone()[0]
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': size,
+            'maxsize': self.maxsize,
+        }
+
+
+class ResponseCache(object):
+    """Caches formatted bodies of :class:`~api_utils.ResponsiveFlask`
+    views.
+
+    .. code-block:: python
+
+        cache = ResponseCache(app, backend=MemoryCacheBackend(maxsize=512))
+
+
+        @app.route('/products')
+        @cache.cached(ttl=60, query_args=('page',))
+        def product_list():
+            return {'objects': [...]}
+
+    Cache key consists of endpoint, view arguments, given query arguments
+    and negotiated mimetype. Only successful ``GET`` and ``HEAD``
+    responses which are not streamed are cached.
+
+    Responses of views protected by :meth:`~api_utils.Hawk.auth_required`
+    are cached per client, so the decorator has to be applied *under*
+    ``auth_required``. Otherwise cache hit would skip authentication,
+    so such responses are not cached at all.
+
+    Instances are *not* bound to specific apps.
+
+    """
+    def __init__(self, app=None, backend=None):
+        self.backend = backend if backend is not None else MemoryCacheBackend()
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RESPONSE_CACHE_ENABLED', True)
+        app.config.setdefault('RESPONSE_CACHE_DEFAULT_TTL', 300)
+
+    def stats(self):
+        return self.backend.stats()
+
+    def cached(self, ttl=None, query_args=()):
+        """Decorator that caches view's response.
+
+        :param ttl: Time to live in seconds,
+            ``RESPONSE_CACHE_DEFAULT_TTL`` is used by default.
+        :param query_args: Names of query arguments which affect response.
+
+        """
+        def decorator(view_func):
+            @wraps(view_func)
+            def wrapped_view_func(*args, **kwargs):
+                if (not current_app.config['RESPONSE_CACHE_ENABLED'] or
+                        request.method not in ('GET', 'HEAD')):
+                    return view_func(*args, **kwargs)
+
+                response_mimetype = (
+                    current_app._response_mimetype_based_on_accept_header()
+                )
+                if response_mimetype is None:
+                    return view_func(*args, **kwargs)
+
+                ctx = _request_ctx_stack.top
+                authenticated = hasattr(ctx, 'auth_vary')
+                key = self._make_key(query_args, response_mimetype)
+                value = self.backend.get(key)
+                if value is not None:
+                    return self._make_response(value)
+
+                # The response is made here, before dispatch_request could
+                # await coroutine of async view and mark its return value.
+                response = current_app.make_response(
+                    current_app._view_return_value(view_func(*args, **kwargs))
+                )
+                # Authentication ran after the key was made, i.e. the
+                # decorator is above auth_required.
+                if authenticated != hasattr(ctx, 'auth_vary'):
+                    return response
+                if response.status_code == 200 and not response.is_streamed:
+                    self.backend.set(
+                        key,
+                        self._make_value(response),
+                        ttl if ttl is not None else
+                        current_app.config['RESPONSE_CACHE_DEFAULT_TTL']
+                    )
+                return response
+
+            return wrapped_view_func
+        return decorator
+
+    def _make_key(self, query_args, response_mimetype):
+        key = json.dumps([
+            request.endpoint,
+            sorted(request.view_args.items()),
+            [(arg, request.args.getlist(arg)) for arg in query_args],
+            response_mimetype,
+            self._client_key(),
+        ], default=str)
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def _client_key(self):
+        """Returns identity of authenticated client, Hawk client id
+        or values of headers which the response varies by.
+
+        """
+        ctx = _request_ctx_stack.top
+        auth_vary = getattr(ctx, 'auth_vary', None)
+        if auth_vary is None:
+            return None
+        receiver = getattr(ctx, 'hawk_receiver', None)
+        if receiver is not None:
+            return ['hawk', receiver.parsed_header['id']]
+        return [(header, request.headers.get(header)) for header in auth_vary]
+
+    def _make_value(self, response):
+        headers = [
+            (name, value) for name, value in response.headers
+            if name.lower() not in UNCACHED_HEADERS
+        ]
+        return response.get_data(), response.status_code, headers
+
+    def _make_response(self, value):
+        body, status, headers = value
+        response = current_app.response_class(
+            response=body, status=status, headers=headers
+        )
+        etag, _ = response.get_etag()
+        if etag is not None and current_app._is_not_modified(etag):
+            not_modified = current_app.response_class(status=304)
+            not_modified.headers['ETag'] = response.headers['ETag']
+            return not_modified
+        return response
@@ -0,0 +1,119 @@
+# coding: utf-8
+"""
+api_utils.cache_control
+~~~~~~~~~~~~~~~~~~~~~~~
+
+This module sets ``Cache-Control`` of responses, so shared caches (CDN,
+reverse proxies) can serve them.
+
+Responses of :class:`~api_utils.ResponsiveFlask` always get
+``Vary: Accept``, because their format depends on it. Policy is set
+app-wide or per route:
+
+.. code-block:: python
+
+    app.cache_policy = CachePolicy(max_age=60)
+
+
+    @app.route('/products')
+    @cache_policy(max_age=60, s_maxage=300, stale_while_revalidate=30)
+    def product_list():
+        return {'objects': [...]}
+
+"""
+__all__ = ('CachePolicy', 'cache_policy')
+
+#: Statuses which responses get ``Cache-Control`` of the policy.
+CACHEABLE_STATUSES = frozenset((200, 203, 204, 300, 301, 304))
+
+
+class CachePolicy(object):
+    """Describes how ``GET`` and ``HEAD`` responses are cached.
+
+    Responses of views protected by :meth:`~api_utils.Hawk.auth_required`
+    get ``Vary: Authorization`` and are ``private`` unless ``public`` is
+    ``True``, so shared caches don't serve them to other clients.
+    ``s-maxage`` is not sent with ``private``.
+
+    ``Cache-Control`` which was set by a view is kept.
+
+    :param max_age: Seconds a response is fresh for.
+    :param s_maxage: Seconds a response is fresh for shared caches,
+        it makes the response ``public``.
+    :param stale_while_revalidate: Seconds a stale response can be served
+        while it's revalidated in background.
+    :param stale_if_error: Seconds a stale response can be served when
+        the app fails.
+    :param public: Whether shared caches can store responses of
+        authenticated requests too.
+    :param no_store: Forbids caching at all.
+    :param vary: Additional request headers which affect responses.
+
+    """
+    def __init__(self, max_age=None, s_maxage=None,
+                 stale_while_revalidate=None, stale_if_error=None,
+                 public=None, no_store=False, vary=()):
+        self.max_age = max_age
+        self.s_maxage = s_maxage
+        self.stale_while_revalidate = stale_while_revalidate
+        self.stale_if_error = stale_if_error
+        self.public = public
+        self.no_store = no_store
+        self.vary = tuple(vary)
+
+    def __repr__(self):
+        return '<CachePolicy {0!r}>'.format(dict(
+            (name, value) for name, value in self.__dict__.items()
+            if value not in (None, False, ())
+        ))
+
+    def apply(self, response, authenticated=False):
+        """Sets ``Cache-Control`` and ``Vary`` of the response.
+
+        :param authenticated: Whether the request was authenticated.
+
+        """
+        for header in self.vary:
+            response.vary.add(header)
+        if ('Cache-Control' in response.headers or
+                response.status_code not in CACHEABLE_STATUSES):
+            return response
+
+        cache_control = response.cache_control
+        if self.no_store:
+            cache_control.no_store = True
+            return response
+
+        private = authenticated and not self.public
+        if private:
+            cache_control.private = True
+        elif self.public or self.s_maxage is not None:
+            cache_control.public = True
+        if self.max_age is not None:
+            cache_control.max_age = self.max_age
+        if self.s_maxage is not None and not private:
+            cache_control.s_maxage = self.s_maxage
+        if self.stale_while_revalidate is not None:
+            cache_control['stale-while-revalidate'] = str(
+                self.stale_while_revalidate
+            )
+        if self.stale_if_error is not None:
+            cache_control['stale-if-error'] = str(self.stale_if_error)
+        return response
+
+
+#: Policy of authenticated responses when app and view have none.
+PRIVATE_POLICY = CachePolicy()
+
+
+def cache_policy(**kwargs):
+    """Decorator that sets :class:`CachePolicy` of view's responses.
+    It takes the same arguments as :class:`CachePolicy`.
+
+    """
+    policy = CachePolicy(**kwargs)
+
+    def decorator(view_func):
+        view_func.cache_policy = policy
+        return view_func
+    return decorator
@@ -7,6 +7,18 @@ The compat module provides support for backwards compatibility with older
 versions of packages.
 
 """
+import importlib
+
+try:
+    from collections.abc import Iterator
+except ImportError:  # Python 2
+    from collections import Iterator
+
+try:
+    StopAsyncIteration = StopAsyncIteration
+except NameError:  # Python < 3.5, there are no async iterators
+    class StopAsyncIteration(Exception):
+        pass
 
 
 def is_user_authenticated(user):
@@ -20,3 +32,25 @@ def is_user_authenticated(user):
         return user.is_authenticated()
     else:
         return user.is_authenticated
+
+
+_optional_modules = {}
+
+
+def import_optional(name):
+    """Imports optional dependency on first use, so it doesn't slow down
+    startup of apps which don't need it.
+
+    Returns ``None`` if the module is not installed.
+
+    """
+    try:
+        return _optional_modules[name]
+    except KeyError:
+        pass
+    try:
+        module = importlib.import_module(name)
+    except ImportError:
+        module = None
+    _optional_modules[name] = module
+    return module
@@ -0,0 +1,232 @@
+# coding: utf-8
+"""
+api_utils.compression
+~~~~~~~~~~~~~~~~~~~~~
+
+This module compresses responses based on Accept-Encoding header.
+
+gzip and deflate are supported out of the box, zstd and br (Brotli)
+are used when ``zstandard`` and ``brotli`` packages are installed.
+
+"""
+import zlib
+from collections import OrderedDict
+
+from flask import request
+
+__all__ = ('compress_response', 'available_encodings')
+
+
+class Encoding(object):
+    """Base class of content codings.
+
+    Subclasses import their libraries in ``__init__``, so ``ImportError``
+    means the coding is not available.
+
+    """
+    name = None
+    default_level = None
+
+    def compress(self, data, level):
+        raise NotImplementedError()
+
+    def stream(self, chunks, level):
+        """Compresses byte chunks one by one. Every chunk is flushed,
+        so a client receives data as soon as it is produced.
+
+        """
+        raise NotImplementedError()
+
+
+class _ZlibEncoding(Encoding):
+    default_level = 6
+    wbits = None
+
+    def compress(self, data, level):
+        compressor = zlib.compressobj(level, zlib.DEFLATED, self.wbits)
+        return compressor.compress(data) + compressor.flush()
+
+    def stream(self, chunks, level):
+        compressor = zlib.compressobj(level, zlib.DEFLATED, self.wbits)
+        for chunk in chunks:
+            if chunk:
+                yield (compressor.compress(chunk) +
+                       compressor.flush(zlib.Z_SYNC_FLUSH))
+        yield compressor.flush()
+
+
+class GzipEncoding(_ZlibEncoding):
+    name = 'gzip'
+    wbits = 16 + zlib.MAX_WBITS
+
+
+class DeflateEncoding(_ZlibEncoding):
+    """HTTP deflate coding is zlib format (RFC 1950)."""
+    name = 'deflate'
+    wbits = zlib.MAX_WBITS
+
+
+class ZstdEncoding(Encoding):
+    name = 'zstd'
+    default_level = 3
+
+    def __init__(self):
+        import zstandard
+        self._zstandard = zstandard
+
+    def compress(self, data, level):
+        return self._zstandard.ZstdCompressor(level=level).compress(data)
+
+    def stream(self, chunks, level):
+        compressor = self._zstandard.ZstdCompressor(level=level).compressobj()
+        flush_block = self._zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        for chunk in chunks:
+            if chunk:
+                yield (compressor.compress(chunk) +
+                       compressor.flush(flush_block))
+        yield compressor.flush()
+
+
+class BrotliEncoding(Encoding):
+    name = 'br'
+    default_level = 4
+
+    def __init__(self):
+        import brotli
+        self._brotli = brotli
+
+    def compress(self, data, level):
+        return self._brotli.compress(data, quality=level)
+
+    def stream(self, chunks, level):
+        compressor = self._brotli.Compressor(quality=level)
+        for chunk in chunks:
+            if chunk:
+                yield compressor.process(chunk) + compressor.flush()
+        yield compressor.finish()
+
+
+def _load_encodings():
+    encodings = OrderedDict()
+    for encoding_class in (ZstdEncoding, BrotliEncoding, GzipEncoding,
+                           DeflateEncoding):
+        try:
+            encodings[encoding_class.name] = encoding_class()
+        except ImportError:
+            continue
+    return encodings
+
+
+_encodings = None
+
+
+def _installed_encodings():
+    """Returns installed content codings. Compression libraries are
+    imported on first call, so they don't slow down app startup.
+
+    """
+    global _encodings
+    if _encodings is None:
+        _encodings = _load_encodings()
+    return _encodings
+
+
+def available_encodings():
+    """Returns names of installed content codings."""
+    return list(_installed_encodings())
+
+
+def _is_excluded(mimetype, excluded_mimetypes):
+    for excluded in excluded_mimetypes:
+        if mimetype == excluded:
+            return True
+        if excluded.endswith('/') and mimetype.startswith(excluded):
+            return True
+    return False
+
+
+def _negotiate_encoding(encodings):
+    """Returns the first of ``encodings`` with the highest quality."""
+    best_encoding = None
+    best_quality = 0
+    for name in encodings:
+        quality = request.accept_encodings[name]
+        if quality > best_quality:
+            best_encoding = name
+            best_quality = quality
+    return best_encoding
+
+
+def _close_after(app_iter, chunks):
+    try:
+        for chunk in chunks:
+            yield chunk
+    finally:
+        if hasattr(app_iter, 'close'):
+            app_iter.close()
+
+
+def compress_response(response, config):
+    """Compresses response in place by coding the client accepts.
+
+    Used config keys are:
+
+    - ``RESPONSE_COMPRESSION_ENCODINGS`` -- codings in order of preference
+    - ``RESPONSE_COMPRESSION_LEVELS`` -- dict of compression levels
+      by coding, defaults are used for missing ones
+    - ``RESPONSE_COMPRESSION_MIN_SIZE`` -- bodies which are smaller
+      are not compressed, streamed bodies are always compressed
+    - ``RESPONSE_COMPRESSION_EXCLUDED_MIMETYPES`` -- already compressed
+      mimetypes, items which end with ``/`` match all subtypes
+
+    ``Vary: Accept-Encoding`` is added to every response which could be
+    compressed, even if it wasn't, so caches don't mix the codings up.
+    Strong ETag becomes weak when a coding is negotiated, because it was
+    computed for uncompressed body. 304 responses get the same Vary and
+    ETag as the full response would have (RFC 7232, section 4.1), so ETag
+    is weakened regardless of body size.
+
+    """
+    if (response.status_code < 200 or
+            response.status_code in (204, 206) or
+            response.direct_passthrough or
+            'Content-Encoding' in response.headers):
+        return response
+    excluded_mimetypes = config['RESPONSE_COMPRESSION_EXCLUDED_MIMETYPES']
+    if _is_excluded(response.mimetype, excluded_mimetypes):
+        return response
+
+    response.vary.add('Accept-Encoding')
+
+    encodings = _installed_encodings()
+    encoding_name = _negotiate_encoding(
+        name for name in config['RESPONSE_COMPRESSION_ENCODINGS']
+        if name in encodings
+    )
+    if encoding_name is None:
+        return response
+
+    etag, is_weak = response.get_etag()
+    if etag is not None and not is_weak:
+        response.set_etag(etag, weak=True)
+    if response.status_code == 304:
+        return response
+
+    encoding = encodings[encoding_name]
+    levels = config['RESPONSE_COMPRESSION_LEVELS'] or {}
+    level = levels.get(encoding_name, encoding.default_level)
+
+    if response.is_streamed:
+        app_iter = response.response
+        response.response = _close_after(
+            app_iter, encoding.stream(response.iter_encoded(), level)
+        )
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < config['RESPONSE_COMPRESSION_MIN_SIZE']:
+            return response
+        response.set_data(encoding.compress(data, level))
+
+    response.headers['Content-Encoding'] = encoding_name
+    return response
@@ -0,0 +1,70 @@
+# coding: utf-8
+"""
+api_utils.coroutines
+~~~~~~~~~~~~~~~~~~~~
+
+This module runs coroutines of async views and credential loaders
+on an event loop of the current thread.
+
+WSGI servers call apps synchronously, so a worker thread still waits
+for the coroutine. The gain is that I/O which the coroutine awaits
+concurrently (e.g. by ``asyncio.gather``) overlaps.
+
+asyncio is imported on first coroutine, so sync apps don't load it.
+
+"""
+import threading
+
+from . import compat
+
+__all__ = ('is_awaitable', 'is_async_iterator', 'run_sync', 'iterate_sync')
+
+_local = threading.local()
+
+
+def is_awaitable(obj):
+    """Returns ``True`` if ``obj`` is a coroutine or other awaitable."""
+    return hasattr(type(obj), '__await__')
+
+
+def is_async_iterator(obj):
+    """Returns ``True`` if ``obj`` is an async generator or iterator."""
+    return hasattr(type(obj), '__anext__')
+
+
+def _event_loop():
+    """Returns event loop of the current thread, it is created once."""
+    loop = getattr(_local, 'loop', None)
+    if loop is None or loop.is_closed():
+        import asyncio
+        loop = _local.loop = asyncio.new_event_loop()
+    return loop
+
+
+def run_sync(awaitable):
+    """Runs awaitable until it's done and returns its result."""
+    loop = _event_loop()
+    if loop.is_running():
+        raise RuntimeError(
+            'Coroutine can not be run while event loop of the thread '
+            'is running'
+        )
+    return loop.run_until_complete(awaitable)
+
+
+def iterate_sync(async_iterator):
+    """Converts async iterator to iterator, items are awaited one by one
+    on event loop of the thread which iterates.
+
+    """
+    try:
+        while True:
+            try:
+                item = run_sync(async_iterator.__anext__())
+            except compat.StopAsyncIteration:
+                return
+            yield item
+    finally:
+        aclose = getattr(async_iterator, 'aclose', None)
+        if aclose is not None:
+            run_sync(aclose())
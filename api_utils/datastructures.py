@@ -0,0 +1,131 @@
+# coding: utf-8
+"""
+api_utils.datastructures
+~~~~~~~~~~~~~~~~~~~~~~~~
+
+This module provides data structures used by the library internally.
+
+"""
+import time
+from collections import OrderedDict
+from threading import Lock
+
+__all__ = ('LRUCache', 'FormatterRegistry')
+
+_missing = object()
+
+
+class LRUCache(object):
+    """Thread-safe mapping which holds at most ``maxsize`` items.
+
+    When the cache is full, the least recently used item is evicted.
+    Items might have time to live. Cache hits and misses are counted,
+    so the cache efficiency can be checked under load.
+
+    :param clock: Function which returns current time in seconds.
+
+    """
+    def __init__(self, maxsize=128, clock=time.time):
+        self.maxsize = maxsize
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        """Returns cached value and marks it as recently used."""
+        with self._lock:
+            item = self._data.pop(key, _missing)
+            if item is _missing:
+                self.misses += 1
+                return default
+            expires, value = item
+            if expires is not None and expires <= self.clock():
+                self.misses += 1
+                return default
+            self._data[key] = item
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Caches value for ``ttl`` seconds or until it is evicted."""
+        expires = None if ttl is None else self.clock() + ttl
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (expires, value)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Removes all items. Counters are kept."""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+        }
+
+
+class FormatterRegistry(dict):
+    """Dict of response formatters which reports its modifications.
+
+    ``on_change`` callback is called without arguments every time
+    the registry is modified.
+
+    """
+    def __init__(self, *args, **kwargs):
+        self.on_change = None
+        super(FormatterRegistry, self).__init__(*args, **kwargs)
+
+    def _changed(self):
+        if self.on_change is not None:
+            self.on_change()
+
+    def __setitem__(self, key, value):
+        super(FormatterRegistry, self).__setitem__(key, value)
+        self._changed()
+
+    def __delitem__(self, key):
+        super(FormatterRegistry, self).__delitem__(key)
+        self._changed()
+
+    def clear(self):
+        super(FormatterRegistry, self).clear()
+        self._changed()
+
+    def pop(self, *args):
+        rv = super(FormatterRegistry, self).pop(*args)
+        self._changed()
+        return rv
+
+    def popitem(self):
+        rv = super(FormatterRegistry, self).popitem()
+        self._changed()
+        return rv
+
+    def setdefault(self, key, default=None):
+        rv = super(FormatterRegistry, self).setdefault(key, default)
+        self._changed()
+        return rv
+
+    def update(self, *args, **kwargs):
+        super(FormatterRegistry, self).update(*args, **kwargs)
+        self._changed()
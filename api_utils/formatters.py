@@ -5,13 +5,148 @@ api_utils.formatters
 
 The aim of formatter is to convert dict to needed string representation.
 
+Formatter might have ``stream`` attribute. It is a function which
+converts iterable of records to an iterable of byte chunks. It's used
+when a view returns generator, so response is streamed.
+
+Formatter might also have ``iterencode`` attribute. It is a function which
+converts large dict to an iterable of byte chunks, so the whole body is not
+kept in memory, see ``RESPONSE_STREAMING_THRESHOLD`` setting.
+
 """
-from flask import request, current_app, json as flask_json
+from flask import request, current_app
 
+from .compat import import_optional
+from .json_backends import StdlibBackend
 
-def json(*args, **kwargs):
-    indent = None
+_stdlib_json_backend = StdlibBackend()
+
+
+def _json_indent():
     if (current_app.config['JSONIFY_PRETTYPRINT_REGULAR'] and
             not request.is_xhr):
-        indent = 2
-    return flask_json.dumps(dict(*args, **kwargs), indent=indent)
+        return 2
+    return None
+
+
+def _json_backend():
+    return getattr(current_app, 'json_backend', _stdlib_json_backend)
+
+
+def _to_bytes(s):
+    if isinstance(s, bytes):
+        return s
+    return s.encode('utf-8')
+
+
+def json(*args, **kwargs):
+    """Formats dict to JSON by app's ``json_backend``.
+
+    Note that result is bytes when backend encodes to bytes directly.
+
+    """
+    return _json_backend().dumps(dict(*args, **kwargs), indent=_json_indent())
+
+
+def json_stream(records):
+    """Formats records to JSON array one record per chunk."""
+    backend = _json_backend()
+    indent = _json_indent()
+    separator = b',\n' if indent else b','
+
+    def generate():
+        yield b'['
+        for i, record in enumerate(records):
+            if i:
+                yield separator + _to_bytes(backend.dumps(record, indent))
+            else:
+                yield _to_bytes(backend.dumps(record, indent))
+        yield b']'
+
+    return generate()
+json.stream = json_stream
+
+
+def json_iterencode(obj, chunk_size=64 * 1024):
+    """Encodes dict to JSON incrementally by Flask's JSON encoder.
+
+    Encoded pieces are joined to chunks of about ``chunk_size`` characters.
+
+    """
+    encoder = current_app.json_encoder(
+        indent=_json_indent(),
+        sort_keys=current_app.config['JSON_SORT_KEYS'],
+        ensure_ascii=current_app.config['JSON_AS_ASCII'],
+    )
+
+    def generate():
+        chunk = []
+        chunk_length = 0
+        for piece in encoder.iterencode(obj):
+            chunk.append(piece)
+            chunk_length += len(piece)
+            if chunk_length >= chunk_size:
+                yield _to_bytes(''.join(chunk))
+                chunk = []
+                chunk_length = 0
+        if chunk:
+            yield _to_bytes(''.join(chunk))
+
+    return generate()
+json.iterencode = json_iterencode
+
+
+def ndjson(*args, **kwargs):
+    """Formats dict to newline delimited JSON (http://ndjson.org)."""
+    return _to_bytes(_json_backend().dumps(dict(*args, **kwargs))) + b'\n'
+
+
+def ndjson_stream(records):
+    """Formats records to newline delimited JSON one line per chunk."""
+    backend = _json_backend()
+    return (_to_bytes(backend.dumps(record)) + b'\n' for record in records)
+ndjson.stream = ndjson_stream
+
+
+def _json_default():
+    return current_app.json_encoder().default
+
+
+def msgpack(*args, **kwargs):
+    """Formats dict to MessagePack.
+
+    ``msgpack`` package uses its C extension when it is available and
+    falls back to pure Python implementation otherwise.
+
+    """
+    _msgpack = import_optional('msgpack')
+    if _msgpack is None:
+        raise RuntimeError('msgpack package is not installed')
+    return _msgpack.packb(
+        dict(*args, **kwargs), use_bin_type=True, default=_json_default()
+    )
+
+
+def cbor(*args, **kwargs):
+    """Formats dict to CBOR (RFC 7049).
+
+    ``cbor2`` package uses its C extension when it is available and
+    falls back to pure Python implementation otherwise.
+
+    Datetimes are encoded with CBOR datetime tag, naive ones are
+    considered to be in UTC.
+
+    """
+    _cbor2 = import_optional('cbor2')
+    if _cbor2 is None:
+        raise RuntimeError('cbor2 package is not installed')
+    # cbor2 requires Python 3.
+    from datetime import timezone
+    json_default = _json_default()
+
+    def default(encoder, value):
+        encoder.encode(json_default(value))
+
+    return _cbor2.dumps(
+        dict(*args, **kwargs), default=default, timezone=timezone.utc
+    )
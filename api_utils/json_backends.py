@@ -0,0 +1,175 @@
+# coding: utf-8
+"""
+api_utils.json_backends
+~~~~~~~~~~~~~~~~~~~~~~~
+
+This module provides interchangeable JSON encoding libraries which are
+used by :func:`api_utils.formatters.json`.
+
+Backend is picked when application is created:
+
+.. code-block:: python
+
+    app = ResponsiveFlask(__name__, json_backend=('orjson', 'ujson'))
+
+The first installed backend is used. Flask's JSON encoder (stdlib ``json``)
+is used when none of them is installed.
+
+"""
+import re
+from collections import OrderedDict
+
+from flask import current_app, json as flask_json
+
+__all__ = ('JSONBackend', 'StdlibBackend', 'OrjsonBackend', 'UjsonBackend',
+           'RapidjsonBackend', 'get_json_backend')
+
+
+class JSONBackend(object):
+    """Base class of JSON backends.
+
+    Backends respect ``JSON_SORT_KEYS`` and ``JSON_AS_ASCII`` configuration
+    and call ``default`` method of the app's
+    :attr:`~flask.Flask.json_encoder` for objects they can't serialize,
+    so Flask's custom encoder hooks keep working.
+
+    """
+    #: Name which is used to pick the backend.
+    name = None
+    #: Whether :meth:`dumps` returns bytes, so there is no need to encode
+    #: the result once more.
+    returns_bytes = False
+
+    def dumps(self, obj, indent=None):
+        """Serializes ``obj`` to JSON.
+
+        :param indent: Either ``None`` for compact representation or ``2``
+            to pretty print.
+
+        """
+        raise NotImplementedError()
+
+    def _default(self):
+        return current_app.json_encoder().default
+
+
+class StdlibBackend(JSONBackend):
+    """Encodes by ``flask.json`` which is based on stdlib ``json``."""
+    name = 'stdlib'
+
+    def dumps(self, obj, indent=None):
+        return flask_json.dumps(obj, indent=indent)
+
+
+_non_ascii_re = re.compile(u'[^\x00-\x7f]')
+
+
+def _escape_non_ascii(match):
+    """Returns ``\\uXXXX`` escape of the character like stdlib ``json``
+    does, characters out of BMP are escaped as surrogate pairs.
+
+    """
+    code = ord(match.group())
+    if code > 0xffff:
+        code -= 0x10000
+        return u'\\u{0:04x}\\u{1:04x}'.format(
+            0xd800 | (code >> 10), 0xdc00 | (code & 0x3ff)
+        )
+    return u'\\u{0:04x}'.format(code)
+
+
+class OrjsonBackend(JSONBackend):
+    """orjson doesn't escape non-ASCII characters, so they are escaped
+    after encoding when ``JSON_AS_ASCII`` is set.
+
+    """
+    name = 'orjson'
+    returns_bytes = True
+
+    def __init__(self):
+        import orjson
+        self._orjson = orjson
+        # Datetimes are passed to Flask's encoder to be formatted
+        # the same way as by stdlib backend.
+        self._base_option = (
+            orjson.OPT_PASSTHROUGH_DATETIME |
+            orjson.OPT_NON_STR_KEYS
+        )
+
+    def dumps(self, obj, indent=None):
+        option = self._base_option
+        if indent:
+            option |= self._orjson.OPT_INDENT_2
+        if current_app.config['JSON_SORT_KEYS']:
+            option |= self._orjson.OPT_SORT_KEYS
+        rv = self._orjson.dumps(obj, default=self._default(), option=option)
+        if current_app.config['JSON_AS_ASCII'] and not rv.isascii():
+            # Non-ASCII characters can only appear inside of strings.
+            rv = _non_ascii_re.sub(
+                _escape_non_ascii, rv.decode('utf-8')
+            ).encode('ascii')
+        return rv
+
+
+class UjsonBackend(JSONBackend):
+    name = 'ujson'
+
+    def __init__(self):
+        import ujson
+        self._ujson = ujson
+
+    def dumps(self, obj, indent=None):
+        return self._ujson.dumps(
+            obj,
+            indent=indent or 0,
+            sort_keys=current_app.config['JSON_SORT_KEYS'],
+            ensure_ascii=current_app.config['JSON_AS_ASCII'],
+            escape_forward_slashes=False,
+            default=self._default(),
+        )
+
+
+class RapidjsonBackend(JSONBackend):
+    name = 'rapidjson'
+
+    def __init__(self):
+        import rapidjson
+        self._rapidjson = rapidjson
+
+    def dumps(self, obj, indent=None):
+        return self._rapidjson.dumps(
+            obj,
+            indent=indent,
+            sort_keys=current_app.config['JSON_SORT_KEYS'],
+            ensure_ascii=current_app.config['JSON_AS_ASCII'],
+            default=self._default(),
+        )
+
+
+BACKENDS = OrderedDict(
+    (backend_class.name, backend_class) for backend_class in (
+        OrjsonBackend, RapidjsonBackend, UjsonBackend, StdlibBackend
+    )
+)
+
+
+def get_json_backend(names=None):
+    """Returns the first backend which can be imported.
+
+    :param names: Backend name or sequence of names in order of preference,
+        e.g. ``('orjson', 'ujson')``. Stdlib backend is used as a fallback.
+
+    """
+    if names is None:
+        names = ()
+    elif isinstance(names, str):
+        names = (names,)
+
+    for name in names:
+        if name not in BACKENDS:
+            raise ValueError('Unknown JSON backend {0!r}'.format(name))
+        try:
+            return BACKENDS[name]()
+        except ImportError:
+            continue
+    return StdlibBackend()
@@ -0,0 +1,319 @@
+# coding: utf-8
+"""
+api_utils.metrics
+~~~~~~~~~~~~~~~~~
+
+This module aggregates request metrics in process.
+
+Metrics are updated by a thread in its own shard, so threads don't
+contend for a lock. Shards are merged when metrics are read. Shards of
+finished threads are folded into one, so servers which start a thread
+per request don't accumulate them.
+
+"""
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from flask import request, request_finished, _request_ctx_stack
+
+from .signals import phase_timed, hawk_auth_failed
+
+__all__ = ('Metrics', 'Histogram')
+
+#: Upper bounds of latency buckets in seconds.
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5,
+)
+#: Upper bounds of payload size buckets in bytes.
+SIZE_BUCKETS = (
+    256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216,
+)
+
+
+class Histogram(object):
+    """Counts observed values in fixed buckets.
+
+    A value goes to the first bucket which upper bound is greater than
+    or equal to it, the last bucket counts values over all bounds.
+
+    """
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def to_dict(self):
+        return {
+            'bounds': list(self.bounds),
+            'counts': list(self.counts),
+            'count': self.count,
+            'sum': self.sum,
+        }
+
+
+class _Shard(object):
+    """Metrics of a thread."""
+    def __init__(self, thread=None):
+        self.thread = thread
+        self.requests = defaultdict(int)
+        self.histograms = {}
+        self.not_acceptable = defaultdict(int)
+        self.hawk_failures = defaultdict(int)
+
+    def histogram(self, key, bounds):
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram(bounds)
+        return histogram
+
+    def merge(self, other):
+        """Adds metrics of ``other`` shard which is not updated anymore."""
+        for key, count in other.requests.items():
+            self.requests[key] += count
+        for key, histogram in other.histograms.items():
+            target = self.histogram(key, histogram.bounds)
+            target.counts = [
+                a + b for a, b in zip(target.counts, histogram.counts)
+            ]
+            target.count += histogram.count
+            target.sum += histogram.sum
+        for key, count in other.not_acceptable.items():
+            self.not_acceptable[key] += count
+        for key, count in other.hawk_failures.items():
+            self.hawk_failures[key] += count
+
+
+def _merge_into(target, source):
+    for key, value in source.items():
+        if isinstance(value, dict) and isinstance(value.get('bounds'), list):
+            histogram = target.get(key)
+            if histogram is None:
+                target[key] = dict(value, counts=list(value['counts']))
+                continue
+            if histogram['bounds'] != value['bounds']:
+                raise ValueError('Histograms have different buckets')
+            histogram['counts'] = [
+                a + b for a, b in zip(histogram['counts'], value['counts'])
+            ]
+            histogram['count'] += value['count']
+            histogram['sum'] += value['sum']
+        elif isinstance(value, dict):
+            _merge_into(target.setdefault(key, {}), value)
+        else:
+            target[key] = target.get(key, 0) + value
+
+
+class Metrics(object):
+    """Aggregates request counts, phase latencies and payload sizes
+    by endpoint and response mimetype, 406 responses by endpoint
+    and Hawk authentication failures by reason.
+
+    .. code-block:: python
+
+        metrics = Metrics(app)
+        metrics.register_endpoint(app, decorators=[hawk.auth_required])
+
+    Phase latencies come from :data:`~api_utils.signals.phase_timed`
+    signal, so blinker library is required.
+
+    Every worker process has its own metrics. When ``snapshot_dir`` is
+    given, processes write their snapshots there at most once per
+    ``flush_interval`` seconds, and the endpoint returns merged snapshots
+    of all processes.
+
+    Instances are *not* bound to specific apps.
+
+    """
+    def __init__(self, app=None, snapshot_dir=None, flush_interval=10):
+        self.snapshot_dir = snapshot_dir
+        self.flush_interval = flush_interval
+        self._local = threading.local()
+        self._shards = []
+        self._shards_lock = threading.Lock()
+        # Metrics of finished threads.
+        self._retired_shard = _Shard()
+        self._flushed_at = 0
+
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        # Strong references, so receivers live as long as the app.
+        phase_timed.connect(self._phase_timed, sender=app, weak=False)
+        hawk_auth_failed.connect(
+            self._hawk_auth_failed, sender=app, weak=False
+        )
+        request_finished.connect(
+            self._request_finished, sender=app, weak=False
+        )
+
+    def register_endpoint(self, app, rule='/metrics', endpoint='metrics',
+                          decorators=()):
+        """Adds view which returns :meth:`collect` dict. The dict is
+        rendered by formatters of :class:`~api_utils.ResponsiveFlask`.
+
+        :param decorators: View decorators, e.g. ``hawk.auth_required``.
+
+        """
+        view_func = self.collect
+        for decorator in decorators:
+            view_func = decorator(view_func)
+        app.add_url_rule(rule, endpoint, view_func)
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = _Shard(threading.current_thread())
+            with self._shards_lock:
+                self._retire_shards()
+                self._shards.append(shard)
+        return shard
+
+    def _retire_shards(self):
+        """Folds shards of finished threads into the retired shard.
+        The caller must hold the shards lock.
+
+        """
+        alive = []
+        for shard in self._shards:
+            if shard.thread.is_alive():
+                alive.append(shard)
+            else:
+                self._retired_shard.merge(shard)
+        self._shards = alive
+
+    def _phase_timed(self, app, phase, duration):
+        ctx = _request_ctx_stack.top
+        if ctx is None:
+            return
+        timings = getattr(ctx, 'metrics_timings', None)
+        if timings is None:
+            timings = ctx.metrics_timings = []
+        timings.append((phase, duration))
+
+    def _hawk_auth_failed(self, app, reason):
+        self._shard().hawk_failures[reason] += 1
+
+    def _request_finished(self, app, response):
+        shard = self._shard()
+        endpoint = request.endpoint or '<none>'
+        mimetype = response.mimetype or ''
+        status = response.status_code
+
+        shard.requests[(endpoint, mimetype, status)] += 1
+        if status == 406:
+            shard.not_acceptable[endpoint] += 1
+        for phase, duration in getattr(
+                _request_ctx_stack.top, 'metrics_timings', ()):
+            shard.histogram(
+                (endpoint, mimetype, phase), LATENCY_BUCKETS
+            ).observe(duration)
+        if not response.is_streamed:
+            shard.histogram(
+                (endpoint, mimetype, 'size'), SIZE_BUCKETS
+            ).observe(len(response.get_data()))
+
+        if (self.snapshot_dir is not None and
+                time.time() - self._flushed_at >= self.flush_interval):
+            self.flush()
+
+    def snapshot(self):
+        """Returns metrics of the process as JSON serializable dict::
+
+            {
+                'routes': {
+                    endpoint: {
+                        mimetype: {
+                            'requests': {'200': 10, ...},
+                            'phases': {'format': histogram, ...},
+                            'size': histogram,
+                        },
+                    },
+                },
+                'not_acceptable': {endpoint: 1},
+                'hawk_failures': {'MacMismatch': 2},
+            }
+
+        """
+        rv = {'routes': {}, 'not_acceptable': {}, 'hawk_failures': {}}
+        with self._shards_lock:
+            self._retire_shards()
+            shards = self._shards + [self._retired_shard]
+        for shard in shards:
+            # Copies of dicts are made at once, so they can't be changed
+            # by the owning thread during iteration.
+            routes = {}
+            for (endpoint, mimetype, status), count in list(
+                    shard.requests.items()):
+                route = routes.setdefault(endpoint, {}).setdefault(
+                    mimetype, {}
+                )
+                route.setdefault('requests', {})[str(status)] = count
+            for (endpoint, mimetype, name), histogram in list(
+                    shard.histograms.items()):
+                route = routes.setdefault(endpoint, {}).setdefault(
+                    mimetype, {}
+                )
+                if name == 'size':
+                    route['size'] = histogram.to_dict()
+                else:
+                    route.setdefault('phases', {})[name] = histogram.to_dict()
+
+            _merge_into(rv, {
+                'routes': routes,
+                'not_acceptable': dict(list(shard.not_acceptable.items())),
+                'hawk_failures': dict(list(shard.hawk_failures.items())),
+            })
+        return rv
+
+    @staticmethod
+    def merge(snapshots):
+        """Returns sum of snapshots, e.g. of worker processes."""
+        rv = {'routes': {}, 'not_acceptable': {}, 'hawk_failures': {}}
+        for snapshot in snapshots:
+            _merge_into(rv, snapshot)
+        return rv
+
+    def reset(self):
+        with self._shards_lock:
+            self._shards = []
+            self._retired_shard = _Shard()
+        self._local = threading.local()
+
+    def flush(self):
+        """Writes snapshot of the process to ``snapshot_dir``."""
+        self._flushed_at = time.time()
+        path = os.path.join(
+            self.snapshot_dir, 'metrics-{0}.json'.format(os.getpid())
+        )
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.rename(tmp_path, path)
+
+    def collect(self):
+        """Returns snapshot of the process or merged snapshots
+        of all processes if ``snapshot_dir`` is set.
+
+        """
+        if self.snapshot_dir is None:
+            return self.snapshot()
+
+        self.flush()
+        snapshots = []
+        for path in glob.glob(os.path.join(self.snapshot_dir, '*.json')):
+            with open(path) as f:
+                snapshots.append(json.load(f))
+        return self.merge(snapshots)
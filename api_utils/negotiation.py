@@ -0,0 +1,152 @@
+# coding: utf-8
+"""
+api_utils.negotiation
+~~~~~~~~~~~~~~~~~~~~~
+
+This module selects response mimetype based on Accept header.
+
+"""
+from werkzeug.http import parse_accept_header
+
+__all__ = ('NegotiationTable',)
+
+#: Structured syntax suffixes (RFC 6839) which can be served by
+#: a formatter of the base format, e.g. ``application/vnd.company+json``
+#: by ``application/json`` formatter.
+STRUCTURED_SYNTAX_SUFFIXES = ('json', 'xml')
+
+ALL_MEDIA_TYPES = '*/*'
+
+
+def _split_mimetype(mimetype):
+    type_, _, subtype = mimetype.partition('/')
+    return type_, subtype
+
+
+def _suffix(subtype):
+    if '+' in subtype:
+        return subtype.rsplit('+', 1)[1]
+    if subtype in STRUCTURED_SYNTAX_SUFFIXES:
+        return subtype
+    return None
+
+
+def _specificity(media_range):
+    type_, subtype = _split_mimetype(media_range)
+    return (type_ != '*', subtype != '*')
+
+
+class NegotiationTable(object):
+    """Index of available mimetypes which is compiled once, so
+    negotiation takes a few dict lookups per media range of Accept header.
+
+    Mimetypes are indexed by type (``application/*`` ranges) and by
+    structured syntax suffix (``+json``, ``+xml``). Quality values are
+    honoured, including ``q=0`` exclusions.
+
+    :param mimetypes: Mimetypes which have formatters.
+    :param default_mimetype: Mimetype to respond with when client accepts
+        all media types.
+
+    """
+    def __init__(self, mimetypes, default_mimetype):
+        self.default_mimetype = default_mimetype
+        self.mimetypes = {}
+        self.by_type = {}
+        self.by_suffix = {}
+
+        ordered = list(mimetypes)
+        if default_mimetype in ordered:
+            ordered.remove(default_mimetype)
+            ordered.insert(0, default_mimetype)
+        self.preferred = [default_mimetype] + [
+            mimetype for mimetype in ordered if mimetype != default_mimetype
+        ]
+
+        for mimetype in ordered:
+            normalized = mimetype.lower()
+            self.mimetypes[normalized] = mimetype
+            type_, subtype = _split_mimetype(normalized)
+            self.by_type.setdefault(type_, []).append(mimetype)
+
+            suffix = _suffix(subtype)
+            if suffix is None:
+                continue
+            # application/json serves +json better than a vendor type does.
+            if subtype == suffix:
+                self.by_suffix[suffix] = mimetype
+            else:
+                self.by_suffix.setdefault(suffix, mimetype)
+
+    def formatter_mimetype(self, mimetype):
+        """Returns mimetype of formatter which serves given ``mimetype``."""
+        normalized = mimetype.lower()
+        if normalized in self.mimetypes:
+            return self.mimetypes[normalized]
+        return self.by_suffix.get(_suffix(_split_mimetype(normalized)[1]))
+
+    def select(self, accept_header):
+        """Returns mimetype to respond with or ``None`` if nothing
+        is acceptable.
+
+        Note that a structured syntax match returns the requested
+        mimetype, use :meth:`formatter_mimetype` to find its formatter.
+
+        """
+        media_ranges = self._parse(accept_header)
+        if not media_ranges:
+            return self.default_mimetype
+
+        qualities = dict(media_ranges)
+        for media_range, quality in media_ranges:
+            if quality <= 0:
+                break
+            mimetype = self._match(media_range, quality, qualities)
+            if mimetype is not None:
+                return mimetype
+        return None
+
+    def _parse(self, accept_header):
+        """Returns media ranges without parameters ordered by quality
+        and specificity.
+
+        """
+        media_ranges = []
+        for value, quality in parse_accept_header(accept_header):
+            media_range = value.split(';', 1)[0].strip().lower()
+            if media_range == '*':
+                media_range = ALL_MEDIA_TYPES
+            media_ranges.append((media_range, quality))
+        media_ranges.sort(
+            key=lambda item: (item[1], _specificity(item[0])),
+            reverse=True
+        )
+        return media_ranges
+
+    def _match(self, media_range, quality, qualities):
+        if media_range == ALL_MEDIA_TYPES:
+            candidates = self.preferred
+        else:
+            type_, subtype = _split_mimetype(media_range)
+            if subtype == '*':
+                candidates = self.by_type.get(type_, ())
+            elif media_range in self.mimetypes:
+                return self.mimetypes[media_range]
+            elif _suffix(subtype) in self.by_suffix:
+                return media_range
+            else:
+                return None
+
+        # Candidate is acceptable by the range only if there is no more
+        # specific range with another quality, e.g. "application/json;q=0".
+        for mimetype in candidates:
+            if self._quality(mimetype.lower(), qualities) == quality:
+                return mimetype
+        return None
+
+    def _quality(self, mimetype, qualities):
+        type_ = _split_mimetype(mimetype)[0]
+        for media_range in (mimetype, type_ + '/*', ALL_MEDIA_TYPES):
+            if media_range in qualities:
+                return qualities[media_range]
+        return 0
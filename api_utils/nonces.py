@@ -0,0 +1,142 @@
+# coding: utf-8
+"""
+api_utils.nonces
+~~~~~~~~~~~~~~~~
+
+This module provides nonce stores which protect Hawk authentication
+against replay attacks.
+
+Nonces are bucketed by their timestamps. A request is accepted only
+within ``HAWK_TIMESTAMP_SKEW_IN_SECONDS`` of server time, so buckets which
+are older than that are dropped whole. Memory is proportional to request
+rate multiplied by the skew window.
+
+"""
+import threading
+import time
+
+from .sqlite import SQLiteConnector
+
+__all__ = ('NonceStore', 'MemoryNonceStore', 'SQLiteNonceStore')
+
+
+class NonceStore(object):
+    """Base class of nonce stores.
+
+    :param clock: Function which returns current time in seconds.
+
+    """
+    def __init__(self, clock=time.time):
+        self.clock = clock
+
+    def seen(self, sender_id, nonce, timestamp, skew):
+        """Remembers the nonce and returns ``True`` if it was seen before.
+
+        Nonces with timestamps outside of ``skew`` seconds window are not
+        stored, because such requests are rejected anyway.
+
+        """
+        raise NotImplementedError()
+
+    def _bucket_bounds(self, timestamp, skew):
+        """Returns bucket of the timestamp and the oldest bucket which
+        must be kept, or ``None`` if the timestamp is outside the window.
+
+        """
+        timestamp = int(timestamp)
+        now = self.clock()
+        if abs(timestamp - now) > skew:
+            return None
+        width = max(int(skew), 1)
+        return timestamp // width, int(now - skew) // width
+
+
+class MemoryNonceStore(NonceStore):
+    """In-process nonce store. Each worker process has its own one,
+    so it protects from replays only when there is a single worker.
+
+    """
+    def __init__(self, clock=time.time):
+        super(MemoryNonceStore, self).__init__(clock=clock)
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return sum(len(bucket) for bucket in self._buckets.values())
+
+    def seen(self, sender_id, nonce, timestamp, skew):
+        bounds = self._bucket_bounds(timestamp, skew)
+        if bounds is None:
+            return False
+        bucket_id, oldest_bucket_id = bounds
+        key = (sender_id, nonce, str(timestamp))
+
+        with self._lock:
+            # There are at most a few buckets within the window.
+            for stale_bucket_id in [b for b in self._buckets
+                                    if b < oldest_bucket_id]:
+                del self._buckets[stale_bucket_id]
+
+            bucket = self._buckets.setdefault(bucket_id, set())
+            if key in bucket:
+                return True
+            bucket.add(key)
+            return False
+
+
+class SQLiteNonceStore(NonceStore):
+    """Nonce store in SQLite database which is shared by worker processes
+    of a host.
+
+    Stale buckets are deleted by indexed range delete once per bucket.
+
+    :param path: Path to database file.
+
+    """
+    #: Statements which are run on every new connection.
+    schema = (
+        'PRAGMA journal_mode=WAL',
+        'PRAGMA synchronous=NORMAL',
+        'CREATE TABLE IF NOT EXISTS hawk_nonces ('
+        'bucket INTEGER, sender_id TEXT, nonce TEXT, ts TEXT, '
+        'PRIMARY KEY (sender_id, nonce, ts))',
+        'CREATE INDEX IF NOT EXISTS hawk_nonces_bucket '
+        'ON hawk_nonces (bucket)',
+    )
+
+    def __init__(self, path, timeout=5.0, clock=time.time):
+        super(SQLiteNonceStore, self).__init__(clock=clock)
+        self.path = path
+        self.timeout = timeout
+        self._connector = SQLiteConnector(path, self.schema, timeout)
+        # Stale buckets were deleted by the thread up to this one.
+        self._local = threading.local()
+
+    def _connection(self):
+        return self._connector.connection()
+
+    def __len__(self):
+        return self._connection().execute(
+            'SELECT count(*) FROM hawk_nonces'
+        ).fetchone()[0]
+
+    def seen(self, sender_id, nonce, timestamp, skew):
+        bounds = self._bucket_bounds(timestamp, skew)
+        if bounds is None:
+            return False
+        bucket_id, oldest_bucket_id = bounds
+
+        connection = self._connection()
+        if getattr(self._local, 'oldest_bucket_id', None) != oldest_bucket_id:
+            connection.execute(
+                'DELETE FROM hawk_nonces WHERE bucket < ?',
+                (oldest_bucket_id,)
+            )
+            self._local.oldest_bucket_id = oldest_bucket_id
+
+        cursor = connection.execute(
+            'INSERT OR IGNORE INTO hawk_nonces '
+            '(bucket, sender_id, nonce, ts) VALUES (?, ?, ?, ?)',
+            (bucket_id, sender_id, nonce, str(timestamp))
+        )
+        return cursor.rowcount == 0
@@ -0,0 +1,42 @@
+# coding: utf-8
+"""
+api_utils.parsers
+~~~~~~~~~~~~~~~~~
+
+The aim of parser is to convert request body to Python objects.
+It takes bytes and raises ``ValueError`` if they are malformed.
+
+Parser might have ``stream`` attribute. It is a function which converts
+an iterable of lines of the body to an iterable of records, so a large
+body is parsed record by record as it's read.
+
+"""
+from flask import json as _json
+
+from .compat import import_optional
+
+
+def json(data):
+    """Parses JSON by app's JSON decoder."""
+    return _json.loads(data)
+
+
+def ndjson(data):
+    """Parses newline delimited JSON (http://ndjson.org) to list."""
+    return list(ndjson_stream(data.splitlines()))
+
+
+def ndjson_stream(lines):
+    """Parses lines of newline delimited JSON one record per line."""
+    for line in lines:
+        if line.strip():
+            yield _json.loads(line)
+ndjson.stream = ndjson_stream
+
+
+def msgpack(data):
+    """Parses MessagePack, strings are decoded to unicode."""
+    _msgpack = import_optional('msgpack')
+    if _msgpack is None:
+        raise RuntimeError('msgpack package is not installed')
+    return _msgpack.unpackb(data, raw=False)
@@ -0,0 +1,98 @@
+# coding: utf-8
+"""
+api_utils.payload
+~~~~~~~~~~~~~~~~~
+
+This module computes Hawk payload hash while request body is copied to
+a temporary file, so large uploads are not loaded into memory.
+
+"""
+import hashlib
+from base64 import b64encode
+from functools import partial
+from tempfile import SpooledTemporaryFile
+
+import mohawk
+from mohawk.util import parse_content_type
+
+__all__ = ('spool_request_body', 'hash_payload', 'StreamingReceiver')
+
+CHUNK_SIZE = 64 * 1024
+
+
+def spool_request_body(request, max_size, chunk_size=CHUNK_SIZE,
+                       callback=None):
+    """Copies request body to a temporary file which is kept in memory
+    until it exceeds ``max_size`` bytes.
+
+    The body is replaced with the rewound file, so it's still readable
+    by a view. ``callback`` is called with every chunk of the body.
+
+    """
+    spool = SpooledTemporaryFile(max_size=max_size)
+    stream = request.stream
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        if callback is not None:
+            callback(chunk)
+        spool.write(chunk)
+    spool.seek(0)
+
+    request.environ['wsgi.input'] = spool
+    # Stream is cached by the request, so it is created again
+    # from the new input.
+    request.__dict__.pop('stream', None)
+    return spool
+
+
+def hash_payload(request, algorithm, max_size):
+    """Returns Hawk payload hash of request body, see
+    :func:`mohawk.util.calculate_payload_hash`.
+
+    """
+    payload_hash = hashlib.new(algorithm)
+    payload_hash.update(b'hawk.1.payload\n')
+    payload_hash.update(
+        parse_content_type(request.mimetype).encode('utf-8') + b'\n'
+    )
+    if '_cached_data' in request.__dict__:
+        payload_hash.update(request._cached_data)
+    else:
+        spool_request_body(request, max_size, callback=payload_hash.update)
+    payload_hash.update(b'\n')
+    return b64encode(payload_hash.digest())
+
+
+class StreamingReceiver(mohawk.Receiver):
+    """Receiver which hashes request body while it is spooled.
+
+    The body is read only after MAC of the request was verified, and
+    the hash is compared by mohawk in constant time. Note that it relies
+    on ``_authorize`` method of :class:`mohawk.Receiver`.
+
+    :param request: Request which body is hashed.
+    :param spool_max_size: Bodies which are larger are spooled to disk.
+
+    """
+    def __init__(self, request, spool_max_size, **kwargs):
+        self._request = request
+        self._spool_max_size = spool_max_size
+        super(StreamingReceiver, self).__init__(
+            content=None, content_type=None, **kwargs
+        )
+
+    def _authorize(self, mac_type, parsed_header, resource, **kwargs):
+        resource.gen_content_hash = partial(self._gen_content_hash, resource)
+        return super(StreamingReceiver, self)._authorize(
+            mac_type, parsed_header, resource, **kwargs
+        )
+
+    def _gen_content_hash(self, resource):
+        resource._content_hash = hash_payload(
+            self._request,
+            resource.credentials['algorithm'],
+            self._spool_max_size
+        )
+        return resource._content_hash
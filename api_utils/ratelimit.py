@@ -0,0 +1,179 @@
+# coding: utf-8
+"""
+api_utils.ratelimit
+~~~~~~~~~~~~~~~~~~~
+
+This module limits request rate of authenticated clients by token bucket
+algorithm.
+
+Every client has a bucket of ``burst`` tokens which is refilled with
+``rate`` tokens per second. A request takes one token, and it is rejected
+when the bucket is empty. Bucket state is a pair of token count and time
+of the last update, so it takes constant space per client.
+
+"""
+import math
+import threading
+import time
+
+from werkzeug.exceptions import TooManyRequests
+
+from .datastructures import LRUCache
+from .sqlite import SQLiteConnector
+
+__all__ = ('RateLimitExceeded', 'RateLimitBackend',
+           'MemoryRateLimitBackend', 'SQLiteRateLimitBackend')
+
+
+class RateLimitExceeded(TooManyRequests):
+    """*429* `Too Many Requests` with ``Retry-After`` header.
+
+    :param retry_after: Seconds until the next request is allowed.
+
+    """
+    def __init__(self, retry_after, description=None):
+        super(RateLimitExceeded, self).__init__(description)
+        self.retry_after = retry_after
+
+    @property
+    def retry_after_header(self):
+        return str(max(int(math.ceil(self.retry_after)), 1))
+
+    def get_headers(self, environ=None):
+        headers = super(RateLimitExceeded, self).get_headers(environ)
+        headers.append(('Retry-After', self.retry_after_header))
+        return headers
+
+
+def _take_token(tokens, updated, now, rate, burst):
+    """Refills the bucket and takes a token from it.
+
+    Returns new ``(tokens, updated)`` state of the bucket and seconds to
+    wait, which are ``0`` if the token was taken.
+
+    """
+    if tokens is None:
+        tokens = burst
+    else:
+        tokens = min(burst, tokens + max(now - updated, 0) * rate)
+    if tokens >= 1:
+        return tokens - 1, now, 0
+    return tokens, now, (1 - tokens) / float(rate)
+
+
+class RateLimitBackend(object):
+    """Base class of token bucket storages.
+
+    :param clock: Function which returns current time in seconds.
+
+    """
+    def __init__(self, clock=time.time):
+        self.clock = clock
+
+    def consume(self, key, rate, burst):
+        """Takes a token from the bucket of ``key``.
+
+        Returns ``0`` if the token was taken, otherwise seconds until
+        the bucket has a token.
+
+        :param rate: Tokens per second which are added to the bucket.
+        :param burst: Capacity of the bucket.
+
+        """
+        raise NotImplementedError()
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """In-process token buckets. Each worker process has its own ones,
+    so a client gets ``rate`` per worker.
+
+    Buckets of ``maxsize`` recently seen clients are kept, an evicted
+    bucket becomes full.
+
+    """
+    def __init__(self, maxsize=10000, clock=time.time):
+        super(MemoryRateLimitBackend, self).__init__(clock=clock)
+        self._buckets = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    def consume(self, key, rate, burst):
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (None, None))
+            tokens, updated, wait = _take_token(
+                tokens, updated, self.clock(), rate, burst
+            )
+            self._buckets.set(key, (tokens, updated))
+        return wait
+
+
+class SQLiteRateLimitBackend(RateLimitBackend):
+    """Token buckets in SQLite database which are shared by worker
+    processes of a host.
+
+    Buckets which have been full for a while are deleted every
+    ``cleanup_interval`` requests of a process.
+
+    :param path: Path to database file.
+
+    """
+    cleanup_interval = 1000
+
+    #: Statements which are run on every new connection.
+    schema = (
+        'PRAGMA journal_mode=WAL',
+        'PRAGMA synchronous=NORMAL',
+        'CREATE TABLE IF NOT EXISTS rate_limits ('
+        'key TEXT PRIMARY KEY, tokens REAL, updated REAL)',
+        'CREATE INDEX IF NOT EXISTS rate_limits_updated '
+        'ON rate_limits (updated)',
+    )
+
+    def __init__(self, path, timeout=5.0, clock=time.time):
+        super(SQLiteRateLimitBackend, self).__init__(clock=clock)
+        self.path = path
+        self.timeout = timeout
+        self._connector = SQLiteConnector(path, self.schema, timeout)
+        # Requests of the thread since it deleted full buckets.
+        self._local = threading.local()
+
+    def _connection(self):
+        return self._connector.connection()
+
+    def __len__(self):
+        return self._connection().execute(
+            'SELECT count(*) FROM rate_limits'
+        ).fetchone()[0]
+
+    def consume(self, key, rate, burst):
+        connection = self._connection()
+        now = self.clock()
+
+        # Write lock is taken at once, so concurrent requests of a client
+        # don't take the same token.
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                'SELECT tokens, updated FROM rate_limits WHERE key = ?',
+                (key,)
+            ).fetchone()
+            tokens, updated = row if row is not None else (None, None)
+            tokens, updated, wait = _take_token(
+                tokens, updated, now, rate, burst
+            )
+            connection.execute(
+                'INSERT OR REPLACE INTO rate_limits (key, tokens, updated) '
+                'VALUES (?, ?, ?)', (key, tokens, updated)
+            )
+
+            self._local.requests = getattr(self._local, 'requests', 0) + 1
+            if self._local.requests % self.cleanup_interval == 0:
+                # Bucket is full in burst / rate seconds after its update.
+                connection.execute(
+                    'DELETE FROM rate_limits WHERE updated < ?',
+                    (now - float(burst) / rate,)
+                )
+        except Exception:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return wait
@@ -0,0 +1,292 @@
+# coding: utf-8
+"""
+api_utils.schema
+~~~~~~~~~~~~~~~~
+
+This module compiles JSON serializers for declared shapes of responses.
+
+Generic encoder checks type of every value on every call. When a view
+always returns the same shape, Python code which serializes exactly that
+shape is generated once, so values are formatted without type dispatch:
+
+.. code-block:: python
+
+    from api_utils.schema import Optional, output_schema
+
+    product_schema = {
+        'id': int,
+        'title': str,
+        'price': float,
+        'tags': [str],
+        'owner': Optional({'id': int, 'name': str}),
+    }
+
+
+    @app.route('/products')
+    @output_schema({'count': int, 'objects': [product_schema]})
+    def product_list():
+        return {'count': 1, 'objects': [...]}
+
+Schema is built of ``int``, ``float``, ``str``, ``bool``, ``datetime``,
+lists of one schema, dicts of schemas, :class:`Optional` and :data:`Any`
+which is serialized by the app's JSON encoder.
+
+Output is the same as of :func:`api_utils.formatters.json` with stdlib
+backend. Responses are validated against the schema only in debug mode.
+
+"""
+import json
+from datetime import datetime
+from json.encoder import encode_basestring, encode_basestring_ascii
+
+from flask import current_app, json as flask_json
+from werkzeug.http import http_date
+
+from . import formatters
+from .formatters import _json_indent
+
+__all__ = ('SchemaSerializer', 'SchemaError', 'Optional', 'Any',
+           'output_schema')
+
+_string_types = (str, type(u''))
+
+
+class SchemaError(ValueError):
+    """Schema is malformed or a value doesn't match the schema."""
+
+
+class Optional(object):
+    """Value of the schema or ``None``."""
+    def __init__(self, schema):
+        self.schema = schema
+
+    def __repr__(self):
+        return 'Optional({0!r})'.format(self.schema)
+
+
+class _Any(object):
+    def __repr__(self):
+        return 'Any'
+
+
+#: Any value which is serialized by the app's JSON encoder.
+Any = _Any()
+
+_SCALARS = (int, float, bool, datetime) + _string_types
+
+
+def _float_repr(value):
+    return repr(float(value))
+
+
+def _dumps(value):
+    return flask_json.dumps(value)
+
+
+class SchemaSerializer(object):
+    """Formatter which serializes dicts of the given schema to JSON.
+
+    Serializer is generated when the instance is created, another one is
+    generated on first use if ``JSON_SORT_KEYS`` or ``JSON_AS_ASCII``
+    differ from Flask defaults. Pretty printed responses are formatted by
+    :func:`api_utils.formatters.json`, as well as error responses and
+    responses of non-200 statuses, see :attr:`error_formatter`.
+
+    .. code-block:: python
+
+        app.response_formatters['application/vnd.product+json'] = (
+            SchemaSerializer(product_schema)
+        )
+
+    :param schema: Schema of a dict.
+
+    """
+    def __init__(self, schema):
+        if not isinstance(schema, dict):
+            raise SchemaError('Schema of response must be a dict')
+        self._check_schema(schema, 'response')
+        self.schema = schema
+        self._serializers = {}
+        self._compile(sort_keys=True, ensure_ascii=True)
+
+    def __call__(self, *args, **kwargs):
+        if _json_indent():
+            return formatters.json(*args, **kwargs)
+        return self.dumps(dict(*args, **kwargs))
+
+    def stream(self, records):
+        return formatters.json.stream(records)
+
+    @property
+    def error_formatter(self):
+        """Formatter of bodies which are not of the schema, e.g. errors."""
+        return formatters.json
+
+    def dumps(self, obj):
+        """Serializes ``obj`` to JSON. It is validated in debug mode."""
+        if current_app.debug:
+            self.validate(obj)
+        config = current_app.config
+        key = (config['JSON_SORT_KEYS'], config['JSON_AS_ASCII'])
+        serializer = self._serializers.get(key)
+        if serializer is None:
+            serializer = self._compile(*key)
+        return serializer(obj)
+
+    def validate(self, obj):
+        """Raises :class:`SchemaError` if ``obj`` doesn't match the schema."""
+        self._validate(self.schema, obj, 'response')
+
+    def _check_schema(self, schema, path):
+        if schema in _SCALARS or schema is Any:
+            return
+        if isinstance(schema, Optional):
+            self._check_schema(schema.schema, path)
+        elif isinstance(schema, list):
+            if len(schema) != 1:
+                raise SchemaError(
+                    '{0}: list schema must have one item'.format(path)
+                )
+            self._check_schema(schema[0], path + '[]')
+        elif isinstance(schema, dict):
+            for key, value in schema.items():
+                if not isinstance(key, _string_types):
+                    raise SchemaError(
+                        '{0}: keys must be strings'.format(path)
+                    )
+                self._check_schema(value, '{0}.{1}'.format(path, key))
+        else:
+            raise SchemaError(
+                '{0}: unsupported schema {1!r}'.format(path, schema)
+            )
+
+    def _validate(self, schema, value, path):
+        if schema is Any:
+            return
+        if isinstance(schema, Optional):
+            if value is not None:
+                self._validate(schema.schema, value, path)
+            return
+
+        if schema is float:
+            valid = (isinstance(value, (int, float)) and
+                     not isinstance(value, bool) and
+                     value == value and value not in (
+                         float('inf'), float('-inf')))
+        elif schema is int:
+            valid = isinstance(value, int) and not isinstance(value, bool)
+        elif schema in _string_types:
+            valid = isinstance(value, _string_types)
+        elif isinstance(schema, list):
+            valid = isinstance(value, (list, tuple))
+        elif isinstance(schema, dict):
+            valid = isinstance(value, dict)
+        else:
+            valid = isinstance(value, schema)
+        if not valid:
+            raise SchemaError('{0}: expected {1!r}, got {2!r}'.format(
+                path, schema, value
+            ))
+
+        if isinstance(schema, list):
+            for i, item in enumerate(value):
+                self._validate(schema[0], item, '{0}[{1}]'.format(path, i))
+        elif isinstance(schema, dict):
+            if set(value) != set(schema):
+                raise SchemaError('{0}: expected keys {1}, got {2}'.format(
+                    path, sorted(schema), sorted(value)
+                ))
+            for key, item_schema in schema.items():
+                self._validate(
+                    item_schema, value[key], '{0}.{1}'.format(path, key)
+                )
+
+    def _compile(self, sort_keys, ensure_ascii):
+        """Generates serializer function and caches it.
+
+        State of generation is passed by arguments, so concurrent requests
+        can compile serializers of one instance.
+
+        """
+        encode_key = json.JSONEncoder(ensure_ascii=ensure_ascii).encode
+        source = 'def serialize(obj):\n    return {0}\n'.format(
+            self._expression(self.schema, 'obj', encode_key, sort_keys)
+        )
+        namespace = {
+            '_encode_str': (encode_basestring_ascii if ensure_ascii
+                            else encode_basestring),
+            '_float_repr': _float_repr,
+            '_http_date': http_date,
+            '_dumps': _dumps,
+        }
+        exec(compile(source, '<schema serializer>', 'exec'), namespace)
+        serializer = namespace['serialize']
+        serializer.source = source
+        self._serializers[(sort_keys, ensure_ascii)] = serializer
+        return serializer
+
+    def _expression(self, schema, var, encode_key, sort_keys, depth=0):
+        """Returns Python expression which serializes ``var``."""
+        if schema is Any:
+            return '_dumps({0})'.format(var)
+        if isinstance(schema, Optional):
+            return "('null' if {0} is None else {1})".format(
+                var, self._expression(
+                    schema.schema, var, encode_key, sort_keys, depth
+                )
+            )
+        if schema is bool:
+            return "('true' if {0} else 'false')".format(var)
+        if schema is int:
+            return 'str({0})'.format(var)
+        if schema is float:
+            return '_float_repr({0})'.format(var)
+        if schema is datetime:
+            return '_encode_str(_http_date({0}))'.format(var)
+        if schema in _string_types:
+            return '_encode_str({0})'.format(var)
+
+        if isinstance(schema, list):
+            # Nested lists need distinct names of loop variables.
+            item = 'item{0}'.format(depth + 1)
+            return "('[' + ', '.join([{0} for {1} in {2}]) + ']')".format(
+                self._expression(
+                    schema[0], item, encode_key, sort_keys, depth + 1
+                ),
+                item, var
+            )
+
+        keys = sorted(schema) if sort_keys else list(schema)
+        if not keys:
+            return "'{}'"
+        # Keys are encoded into a template once, values are substituted.
+        template = '{' + ', '.join(
+            encode_key(key).replace('%', '%%') + ': %s' for key in keys
+        ) + '}'
+        values = [
+            self._expression(
+                schema[key], '{0}[{1!r}]'.format(var, key),
+                encode_key, sort_keys, depth
+            )
+            for key in keys
+        ]
+        return '({0!r} % ({1},))'.format(template, ', '.join(values))
+
+
+def output_schema(schema):
+    """Decorator that serializes view's dict responses by
+    :class:`SchemaSerializer` when JSON is negotiated.
+
+    Only successful (200) responses returned by the view itself are
+    serialized by schema. Error responses, e.g. of error handlers or of
+    ``return {...}, 404``, are formatted by :func:`api_utils.formatters.json`.
+
+    The serializer is generated when the view is decorated.
+
+    """
+    serializer = SchemaSerializer(schema)
+
+    def decorator(view_func):
+        view_func.output_serializer = serializer
+        return view_func
+    return decorator
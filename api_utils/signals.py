@@ -0,0 +1,24 @@
+# coding: utf-8
+"""
+api_utils.signals
+~~~~~~~~~~~~~~~~~
+
+This module provides signals of the library. They require blinker
+library like Flask signals do.
+
+"""
+from flask.signals import Namespace
+
+__all__ = ('phase_timed', 'hawk_auth_failed')
+
+_signals = Namespace()
+
+#: Sent by the app when a phase of request processing was timed,
+#: with ``phase`` name and ``duration`` in seconds.
+#: See :mod:`api_utils.timing` for phase names.
+phase_timed = _signals.signal('phase-timed')
+
+#: Sent by the app when Hawk signature authentication failed, with
+#: ``reason`` which is a name of mohawk exception, e.g. ``MacMismatch``,
+#: or ``MissingAuthorization`` when there is no Authorization header.
+hawk_auth_failed = _signals.signal('hawk-auth-failed')
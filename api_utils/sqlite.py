@@ -0,0 +1,45 @@
+# coding: utf-8
+"""
+api_utils.sqlite
+~~~~~~~~~~~~~~~~
+
+This module opens SQLite connections of stores which are shared by worker
+processes of a host, e.g. nonce stores and rate limit backends.
+
+"""
+import os
+import sqlite3
+import threading
+
+__all__ = ('SQLiteConnector',)
+
+
+class SQLiteConnector(object):
+    """Returns SQLite connection of the current thread.
+
+    Connections can't be shared by threads and forked processes, so one is
+    opened per thread and opened again after fork.
+
+    :param path: Path to database file.
+    :param schema: Statements which are run on every new connection,
+        e.g. ``PRAGMA`` and ``CREATE TABLE IF NOT EXISTS``.
+    :param timeout: Seconds to wait for a lock of the database.
+
+    """
+    def __init__(self, path, schema=(), timeout=5.0):
+        self.path = path
+        self.schema = schema
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def connection(self):
+        pid = os.getpid()
+        if getattr(self._local, 'pid', None) != pid:
+            connection = sqlite3.connect(
+                self.path, timeout=self.timeout, isolation_level=None
+            )
+            for statement in self.schema:
+                connection.execute(statement)
+            self._local.connection = connection
+            self._local.pid = pid
+        return self._local.connection
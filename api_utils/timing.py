@@ -0,0 +1,81 @@
+# coding: utf-8
+"""
+api_utils.timing
+~~~~~~~~~~~~~~~~
+
+This module measures phases of request processing.
+
+Timed phases are:
+
+- ``negotiation`` -- Accept header negotiation
+- ``format`` -- formatter execution, for streamed responses only
+  a stream is created
+- ``hawk-credentials`` -- client key lookup
+- ``hawk-verify`` -- Hawk request verification including client key lookup
+- ``hawk-sign`` -- Hawk response signing
+
+Phases are timed only when ``SERVER_TIMING_ENABLED`` is set or
+:data:`~api_utils.signals.phase_timed` signal has receivers, otherwise
+a timer costs a config lookup.
+
+"""
+import time
+from collections import OrderedDict
+
+from flask import _request_ctx_stack
+
+from .signals import phase_timed
+
+__all__ = ('start_timer', 'stop_timer', 'server_timing_header')
+
+#: Monotonic clock when it is available.
+clock = getattr(time, 'perf_counter', time.time)
+
+
+def _has_receivers():
+    # Fake signal which is used without blinker has no receivers.
+    return bool(getattr(phase_timed, 'receivers', None))
+
+
+def start_timer(app):
+    """Returns start time of a phase or ``None`` if timing is disabled."""
+    if app.config.get('SERVER_TIMING_ENABLED') or _has_receivers():
+        return clock()
+    return None
+
+
+def stop_timer(app, phase, started_at):
+    """Records duration of a phase which was started by
+    :func:`start_timer`.
+
+    """
+    if started_at is None:
+        return
+    duration = clock() - started_at
+
+    if app.config.get('SERVER_TIMING_ENABLED'):
+        ctx = _request_ctx_stack.top
+        if ctx is not None:
+            timings = getattr(ctx, 'server_timings', None)
+            if timings is None:
+                timings = ctx.server_timings = []
+            timings.append((phase, duration))
+    phase_timed.send(app, phase=phase, duration=duration)
+
+
+def server_timing_header():
+    """Returns ``Server-Timing`` header value of current request
+    or ``None`` if nothing was timed. Durations of repeated phases
+    are summed up.
+
+    """
+    timings = getattr(_request_ctx_stack.top, 'server_timings', None)
+    if not timings:
+        return None
+    durations = OrderedDict()
+    for phase, duration in timings:
+        durations[phase] = durations.get(phase, 0) + duration
+    return ', '.join(
+        '{0};dur={1:.3f}'.format(phase, duration * 1000)
+        for phase, duration in durations.items()
+    )
@@ -0,0 +1,121 @@
+# coding: utf-8
+"""
+api_utils.wrappers
+~~~~~~~~~~~~~~~~~~
+
+This module provides request which parses its body by Content-Type.
+
+"""
+from io import BytesIO
+
+from flask import Request as _Request, current_app
+from werkzeug.exceptions import (
+    BadRequest, RequestEntityTooLarge, UnsupportedMediaType
+)
+from werkzeug.utils import cached_property
+
+from .timing import start_timer, stop_timer
+
+__all__ = ('Request',)
+
+
+class Request(_Request):
+    """Request of :class:`~api_utils.ResponsiveFlask` which body is parsed
+    by a parser of its Content-Type, see
+    :attr:`~api_utils.ResponsiveFlask.request_parsers`.
+
+    Body is read once and kept as ``get_data()`` does, so it's shared
+    with Hawk payload hashing. Bodies larger than
+    ``REQUEST_PAYLOAD_MAX_SIZE`` bytes are rejected with 413.
+
+    """
+    @cached_property
+    def payload(self):
+        """Parsed body or ``None`` if it's empty. It is parsed on first
+        access.
+
+        Unknown Content-Type is answered with 415, malformed body
+        with 400.
+
+        """
+        parser = self._payload_parser()
+        data = self._read_payload()
+        if not data:
+            return None
+        if parser is None:
+            raise UnsupportedMediaType()
+
+        app = current_app._get_current_object()
+        started_at = start_timer(app)
+        try:
+            return parser(data)
+        except ValueError as e:
+            raise BadRequest('Malformed payload: {0}'.format(e))
+        finally:
+            stop_timer(app, 'parse', started_at)
+
+    def iter_payload(self):
+        """Returns iterator of records of the body.
+
+        Records are parsed as lines of the body are read if the parser
+        has ``stream`` function, e.g. NDJSON parser. Then
+        ``REQUEST_PAYLOAD_MAX_SIZE`` limits size of a line. Otherwise
+        the parsed body has to be a list.
+
+        """
+        parser = self._payload_parser()
+        stream = getattr(parser, 'stream', None)
+        if stream is None or 'payload' in self.__dict__:
+            payload = self.payload
+            if payload is None:
+                return iter(())
+            if not isinstance(payload, list):
+                raise BadRequest('Payload must be a list of records')
+            return iter(payload)
+        return self._iter_records(stream(self._iter_lines()))
+
+    def _payload_parser(self):
+        parser = current_app._request_parser(self.mimetype)
+        if parser is None and self.mimetype:
+            raise UnsupportedMediaType()
+        return parser
+
+    def _read_payload(self):
+        limit = current_app.config['REQUEST_PAYLOAD_MAX_SIZE']
+        if '_cached_data' in self.__dict__:
+            data = self._cached_data
+        elif limit is None:
+            return self.get_data()
+        elif self.content_length is not None and self.content_length > limit:
+            raise RequestEntityTooLarge()
+        else:
+            data = self.stream.read(limit + 1)
+            # Body is kept, so get_data() doesn't read it again.
+            self._cached_data = data
+        if limit is not None and len(data) > limit:
+            raise RequestEntityTooLarge()
+        return data
+
+    def _iter_lines(self):
+        if '_cached_data' in self.__dict__:
+            stream = BytesIO(self._cached_data)
+        else:
+            stream = self.stream
+        limit = current_app.config['REQUEST_PAYLOAD_MAX_SIZE']
+        while True:
+            if limit is None:
+                line = stream.readline()
+            else:
+                line = stream.readline(limit + 1)
+                if len(line) > limit:
+                    raise RequestEntityTooLarge()
+            if not line:
+                break
+            yield line
+
+    def _iter_records(self, records):
+        try:
+            for record in records:
+                yield record
+        except ValueError as e:
+            raise BadRequest('Malformed payload: {0}'.format(e))
@@ -0,0 +1,124 @@
+# coding: utf-8
+"""
+Compares sync and async views under simulated I/O latency.
+
+Every request makes ``--calls`` I/O calls of ``--latency`` seconds
+and loads Hawk credentials with the same latency. Sync view makes calls
+one by one, async view awaits them concurrently. Requests are made
+by ``--concurrency`` threads in process. Python 3.5+ is required:
+
+.. code-block:: console
+
+    $ python benchmarks/async_views.py --calls 5 --latency 0.01
+
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+import mohawk  # noqa
+
+from api_utils import ResponsiveFlask, Hawk  # noqa
+
+CREDENTIALS = {
+    'id': 'Alice',
+    'key': 'werxhqb98rpaxn39848xrunpaw3489ruxnpa98w4rxn',
+    'algorithm': 'sha256'
+}
+
+
+def make_app(mode, calls, latency):
+    app = ResponsiveFlask(__name__)
+    app.config['JSONIFY_PRETTYPRINT_REGULAR'] = False
+    hawk = Hawk(app)
+
+    if mode == 'async':
+        async def get_client_key(client_id):
+            await asyncio.sleep(latency)
+            return CREDENTIALS['key']
+
+        async def product_list():
+            objects = await asyncio.gather(*[
+                asyncio.sleep(latency, result={'id': i})
+                for i in range(calls)
+            ])
+            return {'objects': objects}
+    else:
+        def get_client_key(client_id):
+            time.sleep(latency)
+            return CREDENTIALS['key']
+
+        def product_list():
+            objects = []
+            for i in range(calls):
+                time.sleep(latency)
+                objects.append({'id': i})
+            return {'objects': objects}
+
+    hawk.client_key_loader(get_client_key)
+    app.add_url_rule('/products', 'product_list',
+                     hawk.auth_required(product_list))
+    return app
+
+
+def client(app, requests, latencies):
+    test_client = app.test_client()
+    for _ in range(requests):
+        sender = mohawk.Sender(
+            CREDENTIALS, 'http://localhost/products', 'GET', '', ''
+        )
+        started_at = time.time()
+        r = test_client.get('/products', headers={
+            'Authorization': sender.request_header
+        })
+        latencies.append(time.time() - started_at)
+        assert r.status_code == 200, r.status_code
+
+
+def run(app, concurrency, requests):
+    latencies = []
+    threads = [
+        threading.Thread(target=client, args=(app, requests, latencies))
+        for _ in range(concurrency)
+    ]
+    started_at = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - started_at
+    latencies.sort()
+    return len(latencies) / elapsed, latencies[len(latencies) // 2] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--calls', type=int, default=5,
+                        help='I/O calls per request')
+    parser.add_argument('--latency', type=float, default=0.01,
+                        help='seconds per I/O call')
+    parser.add_argument('--concurrency', type=int, default=8,
+                        help='client threads')
+    parser.add_argument('--requests', type=int, default=20,
+                        help='requests per client thread')
+    args = parser.parse_args()
+    # mohawk warns about missing nonce check on every request.
+    logging.getLogger('mohawk').setLevel(logging.ERROR)
+
+    print('view\treq/s\tp50, ms')
+    for mode in ('sync', 'async'):
+        rps, p50 = run(
+            make_app(mode, args.calls, args.latency),
+            args.concurrency, args.requests
+        )
+        print('{0}\t{1:.0f}\t{2:.1f}'.format(mode, rps, p50))
+
+
+if __name__ == '__main__':
+    main()
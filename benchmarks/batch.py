@@ -0,0 +1,106 @@
+# coding: utf-8
+"""
+Compares separate Hawk signed requests with one batch of the same calls.
+
+Requests are dispatched by the app in process, so network round trips
+are not counted, only server time of verification and WSGI overhead:
+
+.. code-block:: console
+
+    $ python benchmarks/batch.py --calls 5 20 --workers 4
+
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+import mohawk  # noqa
+
+from api_utils import ResponsiveFlask, Hawk  # noqa
+
+CREDENTIALS = {
+    'id': 'Alice',
+    'key': 'werxhqb98rpaxn39848xrunpaw3489ruxnpa98w4rxn',
+    'algorithm': 'sha256'
+}
+
+
+def make_app(workers):
+    app = ResponsiveFlask(__name__)
+    app.config['JSONIFY_PRETTYPRINT_REGULAR'] = False
+    hawk = Hawk(app)
+
+    @hawk.client_key_loader
+    def get_client_key(client_id):
+        return CREDENTIALS['key']
+
+    @app.route('/products/<int:product_id>')
+    @hawk.auth_required
+    def product_detail(product_id):
+        return {'id': product_id, 'title': u'Product {0}'.format(product_id)}
+
+    app.add_batch_url_rule(max_workers=workers,
+                           decorators=[hawk.auth_required])
+    return app
+
+
+def signed_get(client, path):
+    sender = mohawk.Sender(
+        CREDENTIALS, 'http://localhost' + path, 'GET', '', ''
+    )
+    return client.get(path, headers={'Authorization': sender.request_header})
+
+
+def signed_batch(client, paths):
+    content = json.dumps({'requests': [{'path': path} for path in paths]})
+    sender = mohawk.Sender(
+        CREDENTIALS, 'http://localhost/batch', 'POST', content,
+        'application/json'
+    )
+    return client.post(
+        '/batch', data=content, content_type='application/json',
+        headers={'Authorization': sender.request_header}
+    )
+
+
+def measure(f, repeat):
+    timings = []
+    for _ in range(repeat):
+        started_at = time.time()
+        f()
+        timings.append(time.time() - started_at)
+    return min(timings) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--calls', type=int, nargs='+', default=[5, 20])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    # mohawk warns about missing nonce check on every request.
+    logging.getLogger('mohawk').setLevel(logging.ERROR)
+
+    print('calls\tseparate, ms\tbatch, ms\tbatch on {0} threads, ms'.format(
+        args.workers
+    ))
+    sequential = make_app(None).test_client()
+    concurrent = make_app(args.workers).test_client()
+    for calls in args.calls:
+        paths = ['/products/{0}'.format(i) for i in range(calls)]
+        print('{0}\t{1:.2f}\t{2:.2f}\t{3:.2f}'.format(
+            calls,
+            measure(lambda: [signed_get(sequential, path) for path in paths],
+                    args.repeat),
+            measure(lambda: signed_batch(sequential, paths), args.repeat),
+            measure(lambda: signed_batch(concurrent, paths), args.repeat),
+        ))
+
+
+if __name__ == '__main__':
+    main()
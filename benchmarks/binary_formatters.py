@@ -0,0 +1,64 @@
+# coding: utf-8
+"""
+Compares size and speed of MessagePack and CBOR formatters with
+JSON formatter on a typical list payload.
+
+.. code-block:: console
+
+    $ python benchmarks/binary_formatters.py --records 1000
+
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from api_utils import ResponsiveFlask, formatters  # noqa
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--records', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--number', type=int, default=20)
+    args = parser.parse_args()
+
+    app = ResponsiveFlask(__name__)
+    app.config['JSONIFY_PRETTYPRINT_REGULAR'] = False
+    payload = {
+        'count': args.records,
+        'objects': [
+            {
+                'id': i,
+                'title': u'Product {0}'.format(i),
+                'price': i * 1.5,
+                'available': i % 2 == 0,
+                'tags': ['new', 'sale'],
+            }
+            for i in range(args.records)
+        ],
+    }
+
+    print('formatter\tbytes\tbest of {0}, ms'.format(args.repeat))
+    with app.test_request_context():
+        for name in ('json', 'msgpack', 'cbor'):
+            formatter = getattr(formatters, name)
+            try:
+                size = len(formatter(**payload))
+            except RuntimeError as e:
+                print('{0}\t{1}'.format(name, e))
+                continue
+            timings = timeit.repeat(
+                lambda: formatter(**payload),
+                repeat=args.repeat,
+                number=args.number
+            )
+            print('{0}\t{1}\t{2:.3f}'.format(
+                name, size, min(timings) / args.number * 1000
+            ))
+
+
+if __name__ == '__main__':
+    main()
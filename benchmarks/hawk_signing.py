@@ -0,0 +1,90 @@
+# coding: utf-8
+"""
+Measures per-request cost of Hawk authentication with and without
+response signing.
+
+Signed responses reuse receiver which verified the request, so signing
+should cost about one HMAC of response body:
+
+.. code-block:: console
+
+    $ python benchmarks/hawk_signing.py --requests 5000
+
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+import mohawk  # noqa
+from flask import Flask  # noqa
+
+from api_utils import Hawk  # noqa
+
+CREDENTIALS = {
+    'id': 'Alice',
+    'key': 'werxhqb98rpaxn39848xrunpaw3489ruxnpa98w4rxn',
+    'algorithm': 'sha256'
+}
+
+
+def make_app(sign_response):
+    app = Flask(__name__)
+    app.config['HAWK_SIGN_RESPONSE'] = sign_response
+    hawk = Hawk(app)
+
+    @hawk.client_key_loader
+    def get_client_key(client_id):
+        return CREDENTIALS['key']
+
+    @app.route('/', methods=['POST'])
+    @hawk.auth_required
+    def index():
+        return 'hello world'
+
+    return app
+
+
+def run(app, requests, content):
+    client = app.test_client()
+    headers = []
+    for _ in range(requests):
+        sender = mohawk.Sender(
+            CREDENTIALS, 'http://localhost/', 'POST', content,
+            'application/json'
+        )
+        headers.append({'Authorization': sender.request_header})
+
+    started_at = time.time()
+    for request_headers in headers:
+        r = client.post('/', headers=request_headers, data=content,
+                        content_type='application/json')
+        if r.status_code != 200:
+            raise AssertionError('Request was not authenticated')
+    elapsed = time.time() - started_at
+    return elapsed / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--payload-size', type=int, default=1024,
+                        help='request body size in bytes')
+    args = parser.parse_args()
+    # mohawk warns about missing nonce check on every request.
+    logging.getLogger('mohawk').setLevel(logging.ERROR)
+
+    content = '"{0}"'.format('x' * max(args.payload_size - 2, 0))
+    print('signing\tus/request')
+    for sign_response in (False, True):
+        print('{0}\t{1:.1f}'.format(
+            'on' if sign_response else 'off',
+            run(make_app(sign_response), args.requests, content)
+        ))
+
+
+if __name__ == '__main__':
+    main()
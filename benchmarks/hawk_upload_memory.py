@@ -0,0 +1,130 @@
+# coding: utf-8
+"""
+Compares peak RSS of Hawk authentication of a large upload which is
+loaded into memory with the one which is hashed while spooled.
+
+Each mode is measured in a separate process:
+
+.. code-block:: console
+
+    $ python benchmarks/hawk_upload_memory.py --size 64
+
+"""
+import argparse
+import logging
+import os
+import resource
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+CREDENTIALS = {
+    'id': 'Alice',
+    'key': 'werxhqb98rpaxn39848xrunpaw3489ruxnpa98w4rxn',
+    'algorithm': 'sha256'
+}
+
+
+def peak_rss_kb():
+    # ru_maxrss is in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class RepeatedInput(object):
+    """WSGI input of ``size`` bytes which are produced on read."""
+    def __init__(self, size):
+        self.remaining = size
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        self.remaining -= size
+        return b'x' * size
+
+    def readline(self, size=-1):
+        return self.read(size)
+
+
+def sign(size):
+    import mohawk
+
+    sender = mohawk.Sender(
+        CREDENTIALS, 'http://localhost/', 'POST', b'x' * size,
+        'application/octet-stream'
+    )
+    return sender.request_header
+
+
+def measure(mode, size, authorization):
+    from flask import Flask, request
+    from werkzeug.test import EnvironBuilder
+    from api_utils import Hawk
+
+    app = Flask(__name__)
+    app.config['HAWK_STREAMING_PAYLOAD_HASH'] = mode == 'stream'
+    hawk = Hawk(app)
+
+    @hawk.client_key_loader
+    def get_client_key(client_id):
+        return CREDENTIALS['key']
+
+    @app.route('/', methods=['POST'])
+    @hawk.auth_required
+    def upload():
+        if mode == 'buffer':
+            return str(len(request.get_data()))
+        body_size = 0
+        while True:
+            chunk = request.stream.read(64 * 1024)
+            if not chunk:
+                break
+            body_size += len(chunk)
+        return str(body_size)
+
+    environ = EnvironBuilder(
+        path='/', method='POST',
+        headers={'Authorization': authorization},
+        content_type='application/octet-stream',
+        content_length=size
+    ).get_environ()
+    environ['wsgi.input'] = RepeatedInput(size)
+
+    statuses = []
+    before = peak_rss_kb()
+    app_iter = app(environ, lambda status, headers, exc_info=None:
+                   statuses.append(status))
+    body = b''.join(app_iter)
+    print('{0}\t{1}\t{2}\t{3}'.format(
+        mode, statuses[0], body.decode('ascii'), peak_rss_kb() - before
+    ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--size', type=int, default=64,
+                        help='upload size in MiB')
+    parser.add_argument('--mode', choices=('buffer', 'stream'))
+    parser.add_argument('--authorization')
+    args = parser.parse_args()
+    # mohawk warns about missing nonce check on every request.
+    logging.getLogger('mohawk').setLevel(logging.ERROR)
+
+    size = args.size * 1024 * 1024
+    if args.mode:
+        measure(args.mode, size, args.authorization)
+        return
+
+    # Upload is signed here, so it's not in memory of measured processes.
+    authorization = sign(size)
+    print('mode\tstatus\tbody bytes\tpeak RSS growth, KiB')
+    for mode in ('buffer', 'stream'):
+        subprocess.check_call([
+            sys.executable, __file__,
+            '--mode', mode, '--size', str(args.size),
+            '--authorization', authorization
+        ])
+
+
+if __name__ == '__main__':
+    main()
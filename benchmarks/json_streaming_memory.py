@@ -0,0 +1,78 @@
+# coding: utf-8
+"""
+Compares peak RSS of a large dict response which is built at once
+with the one which is encoded incrementally.
+
+Each path is measured in a separate process:
+
+.. code-block:: console
+
+    $ python benchmarks/json_streaming_memory.py --records 200000
+
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+
+def peak_rss_kb():
+    # ru_maxrss is in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def measure(mode, records):
+    from werkzeug.test import EnvironBuilder
+    from api_utils import ResponsiveFlask
+
+    app = ResponsiveFlask(__name__)
+    app.config['JSONIFY_PRETTYPRINT_REGULAR'] = False
+    if mode == 'stream':
+        app.config['RESPONSE_STREAMING_THRESHOLD'] = 1000
+
+    payload = {
+        'count': records,
+        'objects': [
+            {'id': i, 'title': 'Product {0}'.format(i), 'price': i * 1.5}
+            for i in range(records)
+        ],
+    }
+
+    @app.route('/')
+    def product_list():
+        return payload
+
+    environ = EnvironBuilder(path='/').get_environ()
+    before = peak_rss_kb()
+    body_size = 0
+    app_iter = app(environ, lambda status, headers, exc_info=None: None)
+    for chunk in app_iter:
+        body_size += len(chunk)
+    if hasattr(app_iter, 'close'):
+        app_iter.close()
+    print('{0}\t{1}\t{2}'.format(mode, body_size, peak_rss_kb() - before))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--records', type=int, default=200000)
+    parser.add_argument('--mode', choices=('buffer', 'stream'))
+    args = parser.parse_args()
+
+    if args.mode:
+        measure(args.mode, args.records)
+        return
+
+    print('mode\tbody bytes\tpeak RSS growth, KiB')
+    for mode in ('buffer', 'stream'):
+        subprocess.check_call([
+            sys.executable, __file__,
+            '--mode', mode, '--records', str(args.records)
+        ])
+
+
+if __name__ == '__main__':
+    main()
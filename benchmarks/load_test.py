@@ -0,0 +1,241 @@
+# coding: utf-8
+"""
+Load tests ResponsiveFlask and plain Flask with jsonify under local
+pre-forked WSGI server.
+
+Every scenario binds a listening socket and forks ``--processes`` workers
+which accept connections from it, like sync workers of gunicorn do.
+A worker builds the app once and serves requests one by one by Werkzeug
+server, so fork cost is not measured. The server is driven by
+``--clients`` threads for ``--duration`` seconds. Hawk requests are signed
+by clients before they are timed. Everything runs on localhost:
+
+.. code-block:: console
+
+    $ python benchmarks/load_test.py --processes 4 --clients 16 --duration 10
+
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+import mohawk  # noqa
+from flask import Flask, jsonify  # noqa
+from werkzeug.serving import make_server  # noqa
+
+from api_utils import ResponsiveFlask, Hawk  # noqa
+
+try:
+    from http.client import HTTPConnection
+except ImportError:
+    from httplib import HTTPConnection
+
+CREDENTIALS = {
+    'id': 'Alice',
+    'key': 'werxhqb98rpaxn39848xrunpaw3489ruxnpa98w4rxn',
+    'algorithm': 'sha256'
+}
+
+SCENARIOS = ('flask', 'flask+hawk', 'responsive', 'responsive+hawk')
+
+try:
+    # Workers inherit the listening socket, so they must be forked.
+    Process = multiprocessing.get_context('fork').Process
+    Event = multiprocessing.get_context('fork').Event
+except AttributeError:
+    # Python 2 always forks.
+    Process = multiprocessing.Process
+    Event = multiprocessing.Event
+
+
+def make_payload(records):
+    return {
+        'count': records,
+        'objects': [
+            {'id': i, 'title': u'Product {0}'.format(i), 'price': i * 1.5}
+            for i in range(records)
+        ],
+    }
+
+
+def make_app(scenario, records):
+    """Returns app of the scenario, e.g. ``responsive+hawk``."""
+    kind, _, auth = scenario.partition('+')
+    payload = make_payload(records)
+
+    if kind == 'responsive':
+        app = ResponsiveFlask(__name__)
+        app.config['RESPONSE_COMPRESSION_ENABLED'] = False
+
+        def product_list():
+            return payload
+    else:
+        app = Flask(__name__)
+
+        def product_list():
+            return jsonify(**payload)
+    app.config['JSONIFY_PRETTYPRINT_REGULAR'] = False
+
+    if auth == 'hawk':
+        hawk = Hawk(app)
+
+        @hawk.client_key_loader
+        def get_client_key(client_id):
+            if client_id == CREDENTIALS['id']:
+                return CREDENTIALS['key']
+            raise LookupError()
+
+        product_list = hawk.auth_required(product_list)
+
+    app.add_url_rule('/products', 'product_list', product_list)
+    return app
+
+
+def listen(port):
+    """Returns listening socket which is shared by workers."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(('127.0.0.1', port))
+    sock.listen(128)
+    return sock
+
+
+def serve(scenario, records, port, fd, ready):
+    """Serves requests of the shared socket in a worker process."""
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    logging.getLogger('mohawk').setLevel(logging.ERROR)
+    server = make_server(
+        '127.0.0.1', port, make_app(scenario, records), fd=fd
+    )
+    ready.set()
+    server.serve_forever()
+
+
+def start_workers(scenario, records, port, processes, timeout=10):
+    sock = listen(port)
+    workers = []
+    for _ in range(processes):
+        ready = Event()
+        worker = Process(
+            target=serve,
+            args=(scenario, records, port, sock.fileno(), ready)
+        )
+        worker.daemon = True
+        worker.start()
+        workers.append((worker, ready))
+    # Workers have their copies of the socket.
+    sock.close()
+
+    for worker, ready in workers:
+        if not ready.wait(timeout):
+            stop_workers(workers)
+            raise RuntimeError('Worker did not start on port {0}'.format(
+                port
+            ))
+    return workers
+
+
+def stop_workers(workers):
+    for worker, _ in workers:
+        worker.terminate()
+    for worker, _ in workers:
+        worker.join()
+
+
+def client(port, signed, deadline, latencies, errors):
+    url = 'http://127.0.0.1:{0}/products'.format(port)
+    while time.time() < deadline:
+        headers = {'Accept': 'application/json'}
+        if signed:
+            sender = mohawk.Sender(CREDENTIALS, url, 'GET', '', '')
+            headers['Authorization'] = sender.request_header
+
+        started_at = time.time()
+        try:
+            connection = HTTPConnection('127.0.0.1', port, timeout=30)
+            connection.request('GET', '/products', headers=headers)
+            response = connection.getresponse()
+            response.read()
+            connection.close()
+        except (socket.error, IOError):
+            errors.append(1)
+            continue
+        if response.status != 200:
+            errors.append(1)
+            continue
+        latencies.append(time.time() - started_at)
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return float('nan')
+    index = min(int(len(sorted_values) * p / 100.0), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def run_scenario(scenario, args, port):
+    workers = start_workers(scenario, args.records, port, args.processes)
+    try:
+        latencies = []
+        errors = []
+        deadline = time.time() + args.duration
+        threads = [
+            threading.Thread(
+                target=client,
+                args=(port, scenario.endswith('+hawk'), deadline,
+                      latencies, errors)
+            )
+            for _ in range(args.clients)
+        ]
+        started_at = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.time() - started_at
+    finally:
+        stop_workers(workers)
+
+    latencies.sort()
+    return {
+        'rps': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'errors': len(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--processes', type=int, default=4,
+                        help='pre-forked server workers')
+    parser.add_argument('--clients', type=int, default=16,
+                        help='concurrent client threads')
+    parser.add_argument('--duration', type=float, default=10,
+                        help='seconds per scenario')
+    parser.add_argument('--records', type=int, default=20,
+                        help='records in response payload')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS,
+                        default=SCENARIOS)
+    args = parser.parse_args()
+
+    print('scenario\treq/s\tp50, ms\tp99, ms\terrors')
+    for i, scenario in enumerate(args.scenarios):
+        # Every server gets a new port, so a closing one doesn't clash.
+        result = run_scenario(scenario, args, args.port + i)
+        print('{0}\t{1:.0f}\t{2:.2f}\t{3:.2f}\t{4}'.format(
+            scenario, result['rps'], result['p50_ms'], result['p99_ms'],
+            result['errors']
+        ))
+
+
+if __name__ == '__main__':
+    main()
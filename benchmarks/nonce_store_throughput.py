@@ -0,0 +1,79 @@
+# coding: utf-8
+"""
+Measures throughput and size of nonce stores under synthetic load
+of 10k requests per second.
+
+Time is simulated, so the run takes as long as the stores need to process
+``--seconds`` worth of nonces:
+
+.. code-block:: console
+
+    $ python benchmarks/nonce_store_throughput.py --rate 10000 --seconds 180
+
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from api_utils.nonces import MemoryNonceStore, SQLiteNonceStore  # noqa
+
+
+class SimulatedClock(object):
+    def __init__(self):
+        self.now = time.time()
+
+    def __call__(self):
+        return self.now
+
+
+def run(store, clock, rate, seconds, skew):
+    max_size = 0
+    started_at = time.time()
+    for _ in range(seconds):
+        ts = str(int(clock.now))
+        for _ in range(rate):
+            if store.seen('client', uuid.uuid4().hex, ts, skew):
+                raise AssertionError('Unique nonce was considered replayed')
+        clock.now += 1
+        max_size = max(max_size, len(store))
+    elapsed = time.time() - started_at
+    return rate * seconds / elapsed, max_size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rate', type=int, default=10000,
+                        help='nonces per simulated second')
+    parser.add_argument('--seconds', type=int, default=180)
+    parser.add_argument('--skew', type=int, default=60)
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    stores = (
+        ('memory', lambda clock: MemoryNonceStore(clock=clock)),
+        ('sqlite', lambda clock: SQLiteNonceStore(
+            os.path.join(tmp_dir, 'nonces.db'), clock=clock
+        )),
+    )
+    print('store\tnonces/s\tmax stored nonces\tupper bound')
+    try:
+        for name, make_store in stores:
+            clock = SimulatedClock()
+            throughput, max_size = run(
+                make_store(clock), clock, args.rate, args.seconds, args.skew
+            )
+            print('{0}\t{1:.0f}\t{2}\t{3}'.format(
+                name, throughput, max_size, args.rate * 3 * args.skew
+            ))
+    finally:
+        shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    main()
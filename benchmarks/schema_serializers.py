@@ -0,0 +1,100 @@
+# coding: utf-8
+"""
+Compares schema-compiled serializers with JSON formatter on nested payloads.
+
+Every payload is a list of records with a nested owner and list of tags.
+Minimal time of one formatting is printed in microseconds:
+
+.. code-block:: console
+
+    $ python benchmarks/schema_serializers.py --records 10 100 1000
+
+"""
+import argparse
+import os
+import sys
+import timeit
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from api_utils import ResponsiveFlask, formatters  # noqa
+from api_utils.schema import SchemaSerializer, Optional  # noqa
+
+SCHEMA = {
+    'count': int,
+    'objects': [{
+        'id': int,
+        'title': str,
+        'price': float,
+        'available': bool,
+        'created': datetime,
+        'tags': [str],
+        'owner': Optional({'id': int, 'name': str}),
+    }],
+}
+
+
+def make_payload(records):
+    return {
+        'count': records,
+        'objects': [
+            {
+                'id': i,
+                'title': u'Product {0}'.format(i),
+                'price': i * 1.5,
+                'available': i % 2 == 0,
+                'created': datetime(2014, 1, 1),
+                'tags': ['new', 'sale'],
+                'owner': {'id': i, 'name': 'Bob'} if i % 2 else None,
+            }
+            for i in range(records)
+        ],
+    }
+
+
+def measure(functions, repeat):
+    """Returns minimal time of every function in microseconds.
+
+    Rounds of the functions are interleaved, so noise of a shared machine
+    affects them equally.
+
+    """
+    timers = [timeit.Timer(f) for f in functions]
+    number = 1
+    while timers[0].timeit(number) < 0.05:
+        number *= 2
+    best = [float('inf')] * len(timers)
+    for _ in range(repeat):
+        for i, timer in enumerate(timers):
+            best[i] = min(best[i], timer.timeit(number) / number * 1e6)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--records', type=int, nargs='+',
+                        default=[10, 100, 1000])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    app = ResponsiveFlask(__name__)
+    app.config['JSONIFY_PRETTYPRINT_REGULAR'] = False
+    serializer = SchemaSerializer(SCHEMA)
+
+    print('records\tjson, us\tschema, us\tspeedup')
+    with app.test_request_context():
+        for records in args.records:
+            payload = make_payload(records)
+            assert serializer(**payload) == formatters.json(**payload)
+            json_us, schema_us = measure([
+                lambda: formatters.json(**payload),
+                lambda: serializer(**payload),
+            ], args.repeat)
+            print('{0}\t{1:.1f}\t{2:.1f}\t{3:.2f}x'.format(
+                records, json_us, schema_us, json_us / schema_us
+            ))
+
+
+if __name__ == '__main__':
+    main()
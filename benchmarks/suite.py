@@ -0,0 +1,316 @@
+# coding: utf-8
+"""
+Runs benchmarks of response and authentication hot paths.
+
+Results are written to JSON file, and two result files can be compared,
+so a release can be checked for regressions:
+
+.. code-block:: console
+
+    $ python benchmarks/suite.py run --output baseline.json
+    $ git checkout develop
+    $ python benchmarks/suite.py run --output results.json
+    $ python benchmarks/suite.py compare baseline.json results.json
+
+``compare`` exits with status 1 when a benchmark became slower by more
+than ``--threshold`` (10% by default). Best of repeats is compared,
+because it is the least noisy.
+
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import re
+import sys
+import time
+import timeit
+from collections import OrderedDict
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+import mohawk  # noqa
+from werkzeug.exceptions import BadRequest  # noqa
+
+from api_utils import ResponsiveFlask, Hawk, formatters  # noqa
+
+CREDENTIALS = {
+    'id': 'Alice',
+    'key': 'werxhqb98rpaxn39848xrunpaw3489ruxnpa98w4rxn',
+    'algorithm': 'sha256'
+}
+
+PAYLOAD_SIZES = OrderedDict((
+    ('small', 10),
+    ('medium', 1000),
+    ('large', 10000),
+))
+
+ACCEPT_HEADERS = OrderedDict((
+    ('none', None),
+    ('json', 'application/json'),
+    ('any', '*/*'),
+    ('browser', 'text/html,application/xhtml+xml,application/xml;q=0.9,'
+                '*/*;q=0.8'),
+    ('suffix', 'application/vnd.company+json'),
+))
+
+BODY_SIZES = OrderedDict((
+    ('0b', 0),
+    ('1kb', 1024),
+    ('64kb', 64 * 1024),
+    ('1mb', 1024 * 1024),
+))
+
+#: Registered benchmarks: name -> function which returns
+#: ``(context_manager, callable)``.
+BENCHMARKS = OrderedDict()
+
+
+def benchmark(name):
+    def decorator(f):
+        BENCHMARKS[name] = f
+        return f
+    return decorator
+
+
+def make_payload(records):
+    return {
+        'count': records,
+        'objects': [
+            {
+                'id': i,
+                'title': u'Product {0}'.format(i),
+                'price': i * 1.5,
+                'available': i % 2 == 0,
+                'tags': ['new', 'sale'],
+            }
+            for i in range(records)
+        ],
+    }
+
+
+def make_app():
+    app = ResponsiveFlask(__name__)
+    app.config['JSONIFY_PRETTYPRINT_REGULAR'] = False
+    app.config['RESPONSE_COMPRESSION_ENABLED'] = False
+    return app
+
+
+def make_hawk_app():
+    app = make_app()
+    hawk = Hawk(app)
+
+    @hawk.client_key_loader
+    def get_client_key(client_id):
+        return CREDENTIALS['key']
+
+    return app, hawk
+
+
+def _register_make_response_benchmarks():
+    for size_name, records in PAYLOAD_SIZES.items():
+        for accept_name, accept in ACCEPT_HEADERS.items():
+            def make_benchmark(records=records, accept=accept):
+                app = make_app()
+                payload = make_payload(records)
+                headers = {'Accept': accept} if accept else {}
+                ctx = app.test_request_context(headers=headers)
+                return ctx, lambda: app.make_response(payload)
+
+            benchmark('make_response.{0}.accept_{1}'.format(
+                size_name, accept_name
+            ))(make_benchmark)
+_register_make_response_benchmarks()
+
+
+@benchmark('make_response.406')
+def make_not_acceptable():
+    app = make_app()
+    ctx = app.test_request_context(headers={'Accept': 'text/html'})
+    return ctx, lambda: app.make_response({'hello': 'world'})
+
+
+def _register_error_benchmarks():
+    for static in (False, True):
+        def make_benchmark(static=static):
+            app = make_app()
+
+            @app.default_errorhandler(static=static)
+            def error_handler(error):
+                return {'code': error.code, 'message': str(error)}, error.code
+
+            error = BadRequest()
+            return app.test_request_context(), lambda: app.make_response(
+                app.handle_http_exception(error)
+            )
+
+        benchmark('errors.{0}'.format(
+            'static' if static else 'dynamic'
+        ))(make_benchmark)
+_register_error_benchmarks()
+
+
+def _register_json_benchmarks():
+    for size_name, records in PAYLOAD_SIZES.items():
+        for pretty in (False, True):
+            def make_benchmark(records=records, pretty=pretty):
+                app = make_app()
+                app.config['JSONIFY_PRETTYPRINT_REGULAR'] = pretty
+                payload = make_payload(records)
+                return (app.test_request_context(),
+                        lambda: formatters.json(**payload))
+
+            benchmark('formatters.json.{0}.{1}'.format(
+                size_name, 'pretty' if pretty else 'compact'
+            ))(make_benchmark)
+_register_json_benchmarks()
+
+
+def _register_hawk_benchmarks():
+    for size_name, size in BODY_SIZES.items():
+        def make_verify_benchmark(size=size):
+            app, hawk = make_hawk_app()
+            content = b'x' * size
+            sender = mohawk.Sender(
+                CREDENTIALS, 'http://localhost/', 'POST', content,
+                'application/octet-stream'
+            )
+            ctx = app.test_request_context(
+                '/', method='POST', data=content,
+                content_type='application/octet-stream',
+                headers={'Authorization': sender.request_header}
+            )
+            return ctx, hawk._auth_by_signature
+
+        def make_sign_benchmark(size=size):
+            app, hawk = make_hawk_app()
+            sender = mohawk.Sender(
+                CREDENTIALS, 'http://localhost/', 'GET', '', ''
+            )
+            # Verified receiver is reused for signing.
+            receiver = mohawk.Receiver(
+                lambda client_id: CREDENTIALS, sender.request_header,
+                'http://localhost/', 'GET', '', ''
+            )
+            response = app.response_class(
+                b'x' * size, mimetype='application/octet-stream'
+            )
+            return (
+                app.test_request_context(),
+                lambda: hawk._set_server_authorization(response, receiver)
+            )
+
+        benchmark('hawk.verify.{0}'.format(size_name))(make_verify_benchmark)
+        benchmark('hawk.sign.{0}'.format(size_name))(make_sign_benchmark)
+_register_hawk_benchmarks()
+
+
+def measure(make_benchmark, repeat, min_time):
+    """Returns best and median time of a call in microseconds."""
+    ctx, f = make_benchmark()
+    with ctx:
+        f()
+        timer = timeit.Timer(f)
+        number = 1
+        while timer.timeit(number) < min_time:
+            number *= 10
+        timings = sorted(
+            t / number * 1e6 for t in timer.repeat(repeat, number)
+        )
+    return {
+        'best_us': timings[0],
+        'median_us': timings[len(timings) // 2],
+        'number': number,
+        'repeat': repeat,
+    }
+
+
+def run(args):
+    pattern = re.compile(args.filter) if args.filter else None
+    results = OrderedDict()
+    for name, make_benchmark in BENCHMARKS.items():
+        if pattern is not None and not pattern.search(name):
+            continue
+        results[name] = measure(make_benchmark, args.repeat, args.min_time)
+        print('{0:<45}{1:>12.2f} us'.format(name, results[name]['best_us']))
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'meta': {
+                'python': platform.python_version(),
+                'implementation': platform.python_implementation(),
+                'platform': platform.platform(),
+                'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            },
+            'results': results,
+        }, f, indent=2)
+    return 0
+
+
+def compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)['results']
+    with open(args.results) as f:
+        results = json.load(f)['results']
+
+    regressions = []
+    print('{0:<45}{1:>12}{2:>12}{3:>9}'.format(
+        'benchmark', 'baseline', 'result', 'change'
+    ))
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]['best_us']
+        after = result['best_us']
+        change = (after - before) / before
+        mark = ''
+        if change > args.threshold:
+            regressions.append(name)
+            mark = ' !'
+        print('{0:<45}{1:>12.2f}{2:>12.2f}{3:>+8.1%}{4}'.format(
+            name, before, after, change, mark
+        ))
+
+    if regressions:
+        print('\n{0} benchmarks regressed by more than {1:.0%}'.format(
+            len(regressions), args.threshold
+        ))
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    subparsers = parser.add_subparsers(dest='command')
+
+    run_parser = subparsers.add_parser('run', help='run benchmarks')
+    run_parser.add_argument('--output', default='benchmark-results.json')
+    run_parser.add_argument('--filter', help='regexp of benchmark names')
+    run_parser.add_argument('--repeat', type=int, default=5)
+    run_parser.add_argument('--min-time', type=float, default=0.1,
+                            help='minimum seconds of a repeat')
+
+    compare_parser = subparsers.add_parser(
+        'compare', help='compare results with baseline'
+    )
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('results')
+    compare_parser.add_argument('--threshold', type=float, default=0.1,
+                                help='allowed slowdown, 0.1 is 10%%')
+
+    args = parser.parse_args()
+    # mohawk warns about missing nonce check on every request.
+    logging.getLogger('mohawk').setLevel(logging.ERROR)
+
+    if args.command == 'run':
+        sys.exit(run(args))
+    elif args.command == 'compare':
+        sys.exit(compare(args))
+    parser.print_help()
+    sys.exit(2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+# coding: utf-8
+"""
+Measures overhead of phase timing on requests to ResponsiveFlask.
+
+Timing is measured disabled, with Server-Timing header and with
+a phase_timed signal receiver:
+
+.. code-block:: console
+
+    $ python benchmarks/timing_overhead.py --requests 20000
+
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from werkzeug.test import EnvironBuilder  # noqa
+
+from api_utils import ResponsiveFlask  # noqa
+from api_utils.signals import phase_timed  # noqa
+from api_utils.timing import start_timer, stop_timer  # noqa
+
+
+def make_app(server_timing):
+    app = ResponsiveFlask(__name__)
+    app.config['SERVER_TIMING_ENABLED'] = server_timing
+
+    @app.route('/')
+    def hello_world():
+        return {'hello': 'world'}
+
+    return app
+
+
+def run_requests(app, requests):
+    environ = EnvironBuilder(path='/').get_environ()
+
+    def start_response(status, headers, exc_info=None):
+        pass
+
+    started_at = time.time()
+    for _ in range(requests):
+        b''.join(app(dict(environ), start_response))
+    return (time.time() - started_at) / requests * 1e6
+
+
+def run_timers(app, timers):
+    started_at = time.time()
+    for _ in range(timers):
+        stop_timer(app, 'phase', start_timer(app))
+    return (time.time() - started_at) / timers * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--timers', type=int, default=1000000)
+    args = parser.parse_args()
+
+    def receiver(sender, phase, duration):
+        pass
+
+    print('mode\tus/request\tns/disabled timer')
+    for mode in ('disabled', 'header', 'signal'):
+        app = make_app(server_timing=mode == 'header')
+        if mode == 'signal':
+            phase_timed.connect(receiver, sender=app)
+        print('{0}\t{1:.1f}\t{2}'.format(
+            mode,
+            run_requests(app, args.requests),
+            '{0:.0f}'.format(run_timers(app, args.timers))
+            if mode == 'disabled' else '-'
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+# coding: utf-8
+"""Async views of tests which require Python 3.6+ syntax, so the module
+is imported only when it's supported.
+
+"""
+import asyncio
+
+from flask import abort
+
+CLIENT_KEYS = {
+    'Alice': 'werxhqb98rpaxn39848xrunpaw3489ruxnpa98w4rxn',
+}
+
+
+async def product_detail():
+    await asyncio.sleep(0)
+    return {'id': 1}
+
+
+async def create_product():
+    await asyncio.sleep(0)
+    return {'id': 1}, 201, {'Location': '/products/1'}
+
+
+async def missing_product():
+    await asyncio.sleep(0)
+    abort(404)
+
+
+async def product_list():
+    for i in range(3):
+        await asyncio.sleep(0)
+        yield {'id': i}
+
+
+async def concurrent_products():
+    return {'objects': await asyncio.gather(
+        product_detail(), product_detail()
+    )}
+
+
+async def get_client_key(client_id):
+    await asyncio.sleep(0)
+    try:
+        return CLIENT_KEYS[client_id]
+    except KeyError:
+        raise LookupError()
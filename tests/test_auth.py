@@ -2,12 +2,14 @@
 import mock
 from unittest import TestCase
 
-from flask import Flask
+from flask import Flask, request
 from werkzeug.exceptions import BadRequest, Unauthorized
 from api_utils import Hawk
+from api_utils.nonces import MemoryNonceStore
+from api_utils.ratelimit import MemoryRateLimitBackend
 from flask.ext.login import LoginManager
 
-from .utils import HawkTestMixin
+from .utils import HawkTestMixin, make_sender
 
 app = Flask(__name__)
 hawk = Hawk(app)
@@ -34,6 +36,19 @@ def protected_view():
     return 'hello world'
 
 
+@app.route('/public')
+def public_view():
+    return 'hello world'
+
+
+@app.route('/upload', methods=['POST'])
+@hawk.auth_required
+def upload_view():
+    spooled_types.append(type(request.environ['wsgi.input']).__name__)
+    return request.get_data()
+spooled_types = []
+
+
 class HawkDisabledAuthTest(TestCase):
     def setUp(self):
         app.config['HAWK_ENABLED'] = False
@@ -122,6 +137,212 @@ class HawkAuthBySignatureTest(TestCase, HawkTestMixin):
                 hawk._auth_by_signature()
 
 
+class HawkCredentialsCacheTest(TestCase, HawkTestMixin):
+    def setUp(self):
+        app.config['HAWK_CREDENTIALS_CACHE_TTL'] = 60
+        self.client = app.test_client()
+        self.lookups = []
+
+        @hawk.client_key_loader
+        def counting_client_key_loader(client_id):
+            self.lookups.append(client_id)
+            return get_client_key(client_id)['key']
+
+    def tearDown(self):
+        app.config['HAWK_CREDENTIALS_CACHE_TTL'] = None
+        hawk.invalidate_client_key()
+        hawk._client_key_loader_func = get_client_key
+
+    def test_client_key_is_loaded_once(self):
+        self.signed_request(CREDENTIALS)
+        r = self.signed_request(CREDENTIALS)
+
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(self.lookups, ['Alice'])
+
+    def test_client_key_is_loaded_every_time_when_cache_is_disabled(self):
+        app.config['HAWK_CREDENTIALS_CACHE_TTL'] = None
+
+        self.signed_request(CREDENTIALS)
+        self.signed_request(CREDENTIALS)
+
+        self.assertEqual(self.lookups, ['Alice', 'Alice'])
+
+    def test_unknown_client_is_cached(self):
+        credentials = dict(CREDENTIALS, id='Bob')
+
+        self.signed_request(credentials)
+        r = self.signed_request(credentials)
+
+        self.assertEqual(r.status_code, 401)
+        self.assertEqual(self.lookups, ['Bob'])
+
+    def test_unknown_client_is_not_cached_when_negative_ttl_is_zero(self):
+        app.config['HAWK_CREDENTIALS_NEGATIVE_CACHE_TTL'] = 0
+        credentials = dict(CREDENTIALS, id='Bob')
+
+        try:
+            self.signed_request(credentials)
+            self.signed_request(credentials)
+        finally:
+            app.config['HAWK_CREDENTIALS_NEGATIVE_CACHE_TTL'] = 5
+
+        self.assertEqual(self.lookups, ['Bob', 'Bob'])
+
+    def test_client_key_is_loaded_again_after_invalidation(self):
+        self.signed_request(CREDENTIALS)
+        hawk.invalidate_client_key('Alice')
+        self.signed_request(CREDENTIALS)
+
+        self.assertEqual(self.lookups, ['Alice', 'Alice'])
+
+
+class HawkReplayProtectionTest(TestCase):
+    def setUp(self):
+        hawk.nonce_store = MemoryNonceStore()
+        self.client = app.test_client()
+
+    def tearDown(self):
+        hawk.nonce_store = None
+
+    def replay(self, sender):
+        return self.client.get(
+            '/', headers={'Authorization': sender.request_header}
+        )
+
+    def test_401_when_request_is_replayed(self):
+        sender = make_sender(CREDENTIALS)
+
+        first = self.replay(sender)
+        second = self.replay(sender)
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 401)
+
+    def test_request_can_be_replayed_without_nonce_store(self):
+        hawk.nonce_store = None
+        sender = make_sender(CREDENTIALS)
+
+        self.replay(sender)
+        r = self.replay(sender)
+
+        self.assertEqual(r.status_code, 200)
+
+
+class HawkStreamingPayloadHashTest(TestCase):
+    def setUp(self):
+        app.config['HAWK_STREAMING_PAYLOAD_HASH'] = True
+        app.config['HAWK_PAYLOAD_SPOOL_MAX_SIZE'] = 16
+        self.client = app.test_client()
+        del spooled_types[:]
+
+    def tearDown(self):
+        app.config['HAWK_STREAMING_PAYLOAD_HASH'] = False
+        app.config['HAWK_PAYLOAD_SPOOL_MAX_SIZE'] = 1024 * 1024
+
+    def upload(self, content, signed_content=None):
+        if signed_content is None:
+            signed_content = content
+        sender = make_sender(
+            CREDENTIALS, method='POST', path='/upload',
+            content=signed_content, content_type='text/plain; charset=utf-8'
+        )
+        return self.client.post(
+            '/upload',
+            headers={'Authorization': sender.request_header},
+            data=content,
+            content_type='text/plain; charset=utf-8'
+        )
+
+    def test_body_is_readable_by_view(self):
+        content = 'x' * 100000
+        r = self.upload(content)
+
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.data, content.encode('utf-8'))
+        self.assertEqual(spooled_types, ['SpooledTemporaryFile'])
+
+    def test_empty_body(self):
+        r = self.upload('')
+
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.data, b'')
+
+    def test_401_when_body_was_tampered_with(self):
+        r = self.upload('hello world', signed_content='hello there')
+
+        self.assertEqual(r.status_code, 401)
+        self.assertEqual(spooled_types, [])
+
+    def test_body_is_not_read_when_mac_is_wrong(self):
+        sender = make_sender(
+            dict(CREDENTIALS, key='wrong'), method='POST', path='/upload',
+            content='hello world', content_type='text/plain'
+        )
+        with app.test_request_context(
+                '/upload', method='POST', data='hello world',
+                content_type='text/plain',
+                headers={'Authorization': sender.request_header}):
+            with self.assertRaises(Unauthorized):
+                hawk._auth_by_signature()
+            self.assertNotIn('SpooledTemporaryFile',
+                             repr(request.environ['wsgi.input']))
+
+
+class HawkRateLimitTest(TestCase, HawkTestMixin):
+    def setUp(self):
+        app.config['HAWK_RATE_LIMIT'] = 1
+        app.config['HAWK_RATE_LIMIT_BURST'] = 2
+        hawk.rate_limit_backend = MemoryRateLimitBackend()
+        self.client = app.test_client()
+
+    def tearDown(self):
+        app.config['HAWK_RATE_LIMIT'] = None
+        app.config['HAWK_RATE_LIMIT_BURST'] = None
+        hawk.rate_limit_backend = None
+
+    def test_429_when_client_exceeded_rate_limit(self):
+        statuses = [self.signed_request(CREDENTIALS).status_code
+                    for _ in range(3)]
+
+        self.assertEqual(statuses, [200, 200, 429])
+
+    def test_retry_after_header(self):
+        for _ in range(2):
+            self.signed_request(CREDENTIALS)
+        r = self.signed_request(CREDENTIALS)
+
+        self.assertEqual(r.headers['Retry-After'], '1')
+
+    def test_rate_is_not_limited_by_default(self):
+        app.config['HAWK_RATE_LIMIT'] = None
+
+        statuses = [self.signed_request(CREDENTIALS).status_code
+                    for _ in range(3)]
+
+        self.assertEqual(statuses, [200, 200, 200])
+
+    def test_unauthenticated_requests_dont_take_tokens(self):
+        for _ in range(3):
+            self.signed_request(dict(CREDENTIALS, key='wrong'))
+
+        r = self.signed_request(CREDENTIALS)
+        self.assertEqual(r.status_code, 200)
+
+    def test_retry_after_is_added_to_response_of_error_handler(self):
+        app.error_handler_spec[None][429] = lambda e: ('slow down', 429)
+
+        try:
+            for _ in range(2):
+                self.signed_request(CREDENTIALS)
+            r = self.signed_request(CREDENTIALS)
+        finally:
+            del app.error_handler_spec[None][429]
+
+        self.assertEqual(r.data, b'slow down')
+        self.assertEqual(r.headers['Retry-After'], '1')
+
+
 class HawkAuthByCookieTest(TestCase):
     def setUp(self):
         app.config['SECRET_KEY'] = 'secret'
@@ -145,6 +366,10 @@ class HawkSignResponseTest(TestCase, HawkTestMixin):
 
     def tearDown(self):
         app.config['HAWK_SIGN_RESPONSE'] = False
+        app.after_request_funcs[None] = [
+            f for f in app.after_request_funcs.get(None, [])
+            if f != hawk._sign_response
+        ]
 
     def test_responses_are_signed_when_hawk_was_configured_to_sign(self):
         app.config['HAWK_SIGN_RESPONSE'] = True
@@ -154,6 +379,45 @@ class HawkSignResponseTest(TestCase, HawkTestMixin):
         self.assertEqual(r.status_code, 200)
         self.assertIn('Server-Authorization', r.headers)
 
+    def test_request_is_verified_once_when_response_is_signed(self):
+        app.config['HAWK_SIGN_RESPONSE'] = True
+        hawk.init_app(app)
+        lookups = []
+
+        @hawk.client_key_loader
+        def counting_client_key_loader(client_id):
+            lookups.append(client_id)
+            return get_client_key(client_id)['key']
+
+        try:
+            r = self.signed_request(CREDENTIALS)
+        finally:
+            hawk._client_key_loader_func = get_client_key
+        self.assertIn('Server-Authorization', r.headers)
+        self.assertEqual(lookups, ['Alice'])
+
+    def test_responses_of_unprotected_views_are_signed(self):
+        app.config['HAWK_SIGN_RESPONSE'] = True
+        hawk.init_app(app)
+
+        r = self.signed_request(CREDENTIALS, path='/public')
+        self.assertEqual(r.status_code, 200)
+        self.assertIn('Server-Authorization', r.headers)
+
+    def test_signature_of_response_is_valid(self):
+        app.config['HAWK_SIGN_RESPONSE'] = True
+        hawk.init_app(app)
+        sender = make_sender(CREDENTIALS)
+
+        r = self.client.get('/', headers={
+            'Authorization': sender.request_header,
+        })
+        sender.accept_response(
+            r.headers['Server-Authorization'],
+            content=r.data,
+            content_type=r.headers['Content-Type']
+        )
+
     def test_responses_are_not_signed_by_default(self):
         r = self.signed_request(CREDENTIALS)
         self.assertEqual(r.status_code, 200)
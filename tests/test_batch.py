@@ -0,0 +1,236 @@
+# coding: utf-8
+import json
+import threading
+
+from flask import request
+from flask.testsuite import FlaskTestCase
+from api_utils import ResponsiveFlask, Hawk
+
+from .utils import make_sender
+
+CREDENTIALS = {
+    'id': 'Alice',
+    'key': 'werxhqb98rpaxn39848xrunpaw3489ruxnpa98w4rxn',
+    'algorithm': 'sha256'
+}
+
+
+class BatchTest(FlaskTestCase):
+    def setUp(self):
+        self.app = ResponsiveFlask(__name__)
+        self.app.config['JSONIFY_PRETTYPRINT_REGULAR'] = False
+        self.carts = []
+        self.threads = set()
+
+        @self.app.route('/products/<int:product_id>')
+        def product_detail(product_id):
+            self.threads.add(threading.current_thread().name)
+            return {'id': product_id, 'page': request.args.get('page')}
+
+        @self.app.route('/carts', methods=['GET', 'POST'])
+        def carts():
+            if request.method == 'POST':
+                self.carts.append(request.get_json()['product_id'])
+                return {'count': len(self.carts)}, 201
+            return {'count': len(self.carts)}
+
+        @self.app.route('/text')
+        def text():
+            return 'hello'
+
+        @self.app.route('/large')
+        def large():
+            return {'objects': [{'id': i} for i in range(100)]}
+
+        @self.app.route('/cookies')
+        def cookies():
+            return {}, 200, [('Set-Cookie', 'a=1'), ('Set-Cookie', 'b=2')]
+
+        self.client = self.app.test_client()
+
+    def batch(self, sub_requests, **kwargs):
+        return self.client.post(
+            '/batch', data=json.dumps({'requests': sub_requests}),
+            content_type='application/json', **kwargs
+        )
+
+    def test_responses_are_returned_in_order(self):
+        self.app.add_batch_url_rule()
+
+        r = self.batch([
+            {'path': '/products/1?page=2'},
+            {'method': 'POST', 'path': '/carts', 'body': {'product_id': 1}},
+            {'path': '/carts'},
+            {'path': '/text'},
+            {'path': '/missing'},
+        ])
+
+        self.assertEqual(r.status_code, 200)
+        responses = json.loads(r.data.decode('utf-8'))['responses']
+        self.assertEqual([(sub['status'], sub['body']) for sub in responses], [
+            (200, {'id': 1, 'page': '2'}),
+            (201, {'count': 1}),
+            (200, {'count': 1}),
+            (200, 'hello'),
+            (404, responses[4]['body']),
+        ])
+        self.assertEqual(responses[0]['headers']['Content-Type'],
+                         'application/json')
+
+    def test_safe_requests_run_on_thread_pool(self):
+        self.app.add_batch_url_rule(max_workers=4)
+
+        r = self.batch([
+            {'path': '/products/{0}'.format(i)} for i in range(8)
+        ])
+
+        responses = json.loads(r.data.decode('utf-8'))['responses']
+        self.assertEqual([sub['body']['id'] for sub in responses],
+                         list(range(8)))
+        self.assertNotIn(threading.current_thread().name, self.threads)
+
+    def test_unsafe_requests_run_in_order(self):
+        self.app.add_batch_url_rule(max_workers=4)
+
+        r = self.batch([
+            {'path': '/carts'},
+            {'method': 'POST', 'path': '/carts', 'body': {'product_id': 1}},
+            {'path': '/carts'},
+            {'method': 'POST', 'path': '/carts', 'body': {'product_id': 2}},
+            {'path': '/carts'},
+        ])
+
+        responses = json.loads(r.data.decode('utf-8'))['responses']
+        self.assertEqual([sub['body']['count'] for sub in responses],
+                         [0, 1, 1, 2, 2])
+
+    def test_too_many_requests_are_rejected(self):
+        self.app.add_batch_url_rule(max_requests=2)
+
+        r = self.batch([{'path': '/carts'}] * 3)
+
+        self.assertEqual(r.status_code, 413)
+
+    def test_malformed_batch_is_rejected(self):
+        self.app.add_batch_url_rule()
+
+        self.assertEqual(self.client.post('/batch', data='{').status_code, 400)
+        self.assertEqual(self.batch([{'path': 'carts'}]).status_code, 400)
+        self.assertEqual(self.batch([{'path': '/carts', 'headers': []}])
+                         .status_code, 400)
+        self.assertEqual(self.batch([{'path': '/carts',
+                                      'headers': {'X-Page': 1}}])
+                         .status_code, 400)
+        self.assertEqual(self.batch([{'path': '/carts', 'method': 1}])
+                         .status_code, 400)
+
+    def test_sub_responses_are_not_compressed(self):
+        self.app.config['RESPONSE_COMPRESSION_ENABLED'] = True
+        self.app.add_batch_url_rule()
+
+        r = self.batch([{'path': '/large',
+                         'headers': {'Accept-Encoding': 'gzip'}}])
+
+        self.assertEqual(r.status_code, 200)
+        sub = json.loads(r.data.decode('utf-8'))['responses'][0]
+        self.assertEqual(len(sub['body']['objects']), 100)
+        self.assertNotIn('Content-Encoding', sub['headers'])
+
+    def test_binary_body_is_embedded_as_base64(self):
+        self.app.response_formatters['application/x-binary'] = (
+            lambda **kwargs: b'\xff\x00'
+        )
+        self.app.add_batch_url_rule()
+
+        r = self.batch([{'path': '/products/1',
+                         'headers': {'Accept': 'application/x-binary'}},
+                        {'path': '/text'}])
+
+        self.assertEqual(r.status_code, 200)
+        binary, text = json.loads(r.data.decode('utf-8'))['responses']
+        self.assertEqual(binary['body'], '/wA=')
+        self.assertEqual(binary['body_encoding'], 'base64')
+        self.assertEqual(text['body'], 'hello')
+        self.assertNotIn('body_encoding', text)
+
+    def test_repeated_headers_are_kept(self):
+        self.app.add_batch_url_rule()
+
+        r = self.batch([{'path': '/cookies'}])
+
+        sub = json.loads(r.data.decode('utf-8'))['responses'][0]
+        self.assertEqual(sub['headers']['Set-Cookie'], ['a=1', 'b=2'])
+        self.assertEqual(sub['headers']['Content-Type'], 'application/json')
+
+    def test_batches_can_not_be_nested(self):
+        self.app.add_batch_url_rule()
+
+        r = self.batch([{'method': 'POST', 'path': '/batch',
+                         'body': {'requests': []}}])
+
+        responses = json.loads(r.data.decode('utf-8'))['responses']
+        self.assertEqual(responses[0]['status'], 400)
+
+    def test_batch_response_is_negotiated(self):
+        self.app.add_batch_url_rule()
+
+        r = self.batch([{'path': '/carts'}], headers={'Accept': 'text/html'})
+
+        self.assertEqual(r.status_code, 406)
+
+
+class HawkBatchTest(FlaskTestCase):
+    def setUp(self):
+        self.app = ResponsiveFlask(__name__)
+        self.hawk = Hawk(self.app)
+        self.loaded_keys = []
+
+        @self.hawk.client_key_loader
+        def get_client_key(client_id):
+            self.loaded_keys.append(client_id)
+            return CREDENTIALS['key']
+
+        @self.app.route('/private')
+        @self.hawk.auth_required
+        def private():
+            return {'hello': 'world'}
+
+        self.client = self.app.test_client()
+
+    def signed_batch(self, sub_requests):
+        content = json.dumps({'requests': sub_requests})
+        sender = make_sender(CREDENTIALS, 'POST', '/batch', content,
+                             'application/json')
+        return self.client.post(
+            '/batch', data=content, content_type='application/json',
+            headers={'Authorization': sender.request_header}
+        )
+
+    def test_sub_requests_trust_batch_authentication(self):
+        self.app.add_batch_url_rule(decorators=[self.hawk.auth_required])
+
+        r = self.signed_batch([{'path': '/private'}] * 3)
+
+        self.assertEqual(r.status_code, 200)
+        responses = json.loads(r.data.decode('utf-8'))['responses']
+        self.assertEqual([sub['status'] for sub in responses], [200] * 3)
+        self.assertEqual(self.loaded_keys, ['Alice'])
+
+    def test_sub_requests_of_unprotected_batch_are_authenticated(self):
+        self.app.add_batch_url_rule()
+
+        r = self.signed_batch([{'path': '/private'}])
+
+        responses = json.loads(r.data.decode('utf-8'))['responses']
+        self.assertEqual(responses[0]['status'], 401)
+
+    def test_rate_limit_applies_to_sub_requests(self):
+        self.app.config['HAWK_RATE_LIMIT'] = 0.001
+        self.app.config['HAWK_RATE_LIMIT_BURST'] = 3
+        self.app.add_batch_url_rule(decorators=[self.hawk.auth_required])
+
+        r = self.signed_batch([{'path': '/private'}] * 3)
+
+        responses = json.loads(r.data.decode('utf-8'))['responses']
+        self.assertEqual([sub['status'] for sub in responses],
+                         [200, 200, 429])
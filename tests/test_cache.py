@@ -0,0 +1,219 @@
+# coding: utf-8
+import os
+import shutil
+import tempfile
+
+from flask.testsuite import FlaskTestCase
+from flask import json, request, _request_ctx_stack
+from api_utils import ResponsiveFlask, Hawk
+from api_utils.cache import (
+    ResponseCache, CacheBackend, MemoryCacheBackend, SQLiteCacheBackend
+)
+
+from .utils import Clock, make_sender
+
+CLIENT_KEYS = {
+    'Alice': 'werxhqb98rpaxn39848xrunpaw3489ruxnpa98w4rxn',
+    'Bob': 'ruxnpa98w4rxnwerxhqb98rpaxn39848xrunpaw3489',
+}
+
+
+def dummy_xml_formatter(*args, **kwargs):
+    return '<hello>world</hello>'
+
+
+class ResponseCacheTestMixin(object):
+    def make_backend(self, maxsize):
+        raise NotImplementedError()
+
+    def setUp(self):
+        self.clock = Clock()
+        self.app = ResponsiveFlask(__name__)
+        self.app.response_formatters['application/xml'] = dummy_xml_formatter
+        self.cache = ResponseCache(self.app, backend=self.make_backend(2))
+        self.client = self.app.test_client()
+        self.calls = []
+
+        @self.app.route('/products/<int:product_id>')
+        @self.cache.cached(ttl=60, query_args=('fields',))
+        def product_detail(product_id):
+            self.calls.append(product_id)
+            return {'id': product_id, 'page': request.args.get('page')}
+
+        @self.app.route('/missing')
+        @self.cache.cached()
+        def missing():
+            self.calls.append('missing')
+            return {'error': 'Not found'}, 404
+
+    def test_view_is_called_once(self):
+        first = self.client.get('/products/1')
+        second = self.client.get('/products/1')
+
+        self.assertEqual(self.calls, [1])
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(second.mimetype, 'application/json')
+        self.assertEqual(self.cache.stats()['hits'], 1)
+        self.assertEqual(self.cache.stats()['misses'], 1)
+
+    def test_view_args_are_part_of_key(self):
+        self.client.get('/products/1')
+        r = self.client.get('/products/2')
+
+        self.assertEqual(self.calls, [1, 2])
+        self.assertEqual(json.loads(r.data)['id'], 2)
+
+    def test_negotiated_mimetype_is_part_of_key(self):
+        self.client.get('/products/1')
+        r = self.client.get(
+            '/products/1', headers={'Accept': 'application/xml'}
+        )
+
+        self.assertEqual(self.calls, [1, 1])
+        self.assertEqual(r.mimetype, 'application/xml')
+
+    def test_selected_query_args_are_part_of_key(self):
+        self.client.get('/products/1?fields=id')
+        self.client.get('/products/1?fields=id&page=2')
+        self.client.get('/products/1?fields=title')
+
+        self.assertEqual(self.calls, [1, 1])
+
+    def test_entry_expires(self):
+        self.client.get('/products/1')
+        self.clock.now += 61
+        self.client.get('/products/1')
+
+        self.assertEqual(self.calls, [1, 1])
+
+    def test_least_recently_used_entry_is_evicted(self):
+        for product_id in (1, 2, 1, 3, 1):
+            self.clock.now += 1
+            self.client.get('/products/{0}'.format(product_id))
+
+        self.assertEqual(self.calls, [1, 2, 3])
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+
+    def test_error_response_is_not_cached(self):
+        self.client.get('/missing')
+        r = self.client.get('/missing')
+
+        self.assertEqual(r.status_code, 404)
+        self.assertEqual(self.calls, ['missing', 'missing'])
+
+    def test_post_request_is_not_cached(self):
+        with self.app.test_request_context('/products/1', method='POST'):
+            self.app.view_functions['product_detail'](product_id=1)
+            self.app.view_functions['product_detail'](product_id=1)
+
+        self.assertEqual(self.calls, [1, 1])
+
+    def test_cache_can_be_disabled(self):
+        self.app.config['RESPONSE_CACHE_ENABLED'] = False
+
+        self.client.get('/products/1')
+        self.client.get('/products/1')
+
+        self.assertEqual(self.calls, [1, 1])
+
+    def test_304_when_cached_etag_matches(self):
+        self.app.config['RESPONSE_ETAG_ENABLED'] = True
+        etag = self.client.get('/products/1').headers['ETag']
+
+        r = self.client.get('/products/1', headers={'If-None-Match': etag})
+
+        self.assertEqual(r.status_code, 304)
+        self.assertEqual(self.calls, [1])
+
+
+class MemoryCacheBackendTest(ResponseCacheTestMixin, FlaskTestCase):
+    def make_backend(self, maxsize):
+        return MemoryCacheBackend(maxsize=maxsize, clock=self.clock)
+
+
+class SQLiteCacheBackendTest(ResponseCacheTestMixin, FlaskTestCase):
+    def make_backend(self, maxsize):
+        self.tmp_dir = tempfile.mkdtemp()
+        return SQLiteCacheBackend(
+            os.path.join(self.tmp_dir, 'cache.db'),
+            maxsize=maxsize,
+            clock=self.clock
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_entries_are_shared_by_backend_instances(self):
+        self.client.get('/products/1')
+        self.cache.backend = SQLiteCacheBackend(
+            self.cache.backend.path, clock=self.clock
+        )
+
+        self.client.get('/products/1')
+
+        self.assertEqual(self.calls, [1])
+
+
+class AuthenticatedResponseCacheTest(FlaskTestCase):
+    def setUp(self):
+        self.app = ResponsiveFlask(__name__)
+        self.hawk = Hawk(self.app)
+        self.cache = ResponseCache(self.app)
+        self.client = self.app.test_client()
+        self.calls = []
+
+        @self.hawk.client_key_loader
+        def get_client_key(client_id):
+            return CLIENT_KEYS[client_id]
+
+        @self.app.route('/me')
+        @self.hawk.auth_required
+        @self.cache.cached()
+        def me():
+            client_id = _request_ctx_stack.top.hawk_receiver.parsed_header[
+                'id'
+            ]
+            self.calls.append(client_id)
+            return {'me': client_id}
+
+        @self.app.route('/misplaced')
+        @self.cache.cached()
+        @self.hawk.auth_required
+        def misplaced():
+            self.calls.append('misplaced')
+            return {'hello': 'world'}
+
+    def signed_get(self, client_id, path='/me'):
+        sender = make_sender({
+            'id': client_id,
+            'key': CLIENT_KEYS[client_id],
+            'algorithm': 'sha256',
+        }, path=path)
+        return self.client.get(path, headers={
+            'Authorization': sender.request_header
+        })
+
+    def test_responses_are_cached_per_client(self):
+        self.signed_get('Alice')
+        self.signed_get('Alice')
+        r = self.signed_get('Bob')
+
+        self.assertEqual(json.loads(r.data), {'me': 'Bob'})
+        self.assertEqual(self.calls, ['Alice', 'Bob'])
+
+    def test_response_is_not_cached_above_auth_required(self):
+        self.signed_get('Alice', path='/misplaced')
+        r = self.client.get('/misplaced')
+
+        self.assertEqual(r.status_code, 401)
+        self.assertEqual(self.calls, ['misplaced'])
+
+
+class CacheBackendTest(FlaskTestCase):
+    def test_value_is_converted_to_bytes_and_back(self):
+        value = (b'{"id": 1}', 200, [('Content-Type', 'application/json')])
+
+        data = CacheBackend.dumps(value)
+
+        self.assertIsInstance(data, bytes)
+        self.assertEqual(CacheBackend.loads(data), value)
@@ -0,0 +1,161 @@
+# coding: utf-8
+from flask.testsuite import FlaskTestCase
+from api_utils import ResponsiveFlask, Hawk
+from api_utils.cache_control import CachePolicy, cache_policy
+
+from .utils import make_sender
+
+CREDENTIALS = {
+    'id': 'Alice',
+    'key': 'werxhqb98rpaxn39848xrunpaw3489ruxnpa98w4rxn',
+    'algorithm': 'sha256'
+}
+
+
+class CachePolicyTest(FlaskTestCase):
+    def setUp(self):
+        self.app = ResponsiveFlask(__name__)
+
+        @self.app.route('/', methods=['GET', 'POST'])
+        def hello_world():
+            return {'hello': 'world'}
+
+        @self.app.route('/products')
+        @cache_policy(max_age=60, s_maxage=300, stale_while_revalidate=30,
+                      stale_if_error=600, vary=('Accept-Language',))
+        def product_list():
+            return {'objects': []}
+
+        @self.app.route('/custom')
+        @cache_policy(max_age=60)
+        def custom():
+            return {'hello': 'world'}, 200, {'Cache-Control': 'no-cache'}
+
+        @self.app.route('/missing')
+        @cache_policy(max_age=60)
+        def missing():
+            return {'error': 'missing'}, 404
+
+        self.client = self.app.test_client()
+
+    def test_vary_accept_is_set(self):
+        r = self.client.get('/')
+
+        self.assertIn('Accept', r.vary)
+        self.assertNotIn('Cache-Control', r.headers)
+
+    def test_vary_accept_is_set_when_not_acceptable(self):
+        r = self.client.get('/', headers={'Accept': 'text/html'})
+
+        self.assertEqual(r.status_code, 406)
+        self.assertIn('Accept', r.vary)
+
+    def test_app_wide_policy(self):
+        self.app.cache_policy = CachePolicy(max_age=10)
+
+        r = self.client.get('/')
+
+        self.assertEqual(r.headers['Cache-Control'], 'max-age=10')
+
+    def test_route_policy_overrides_app_wide_policy(self):
+        self.app.cache_policy = CachePolicy(max_age=10)
+
+        r = self.client.get('/products')
+
+        self.assertEqual(r.cache_control.max_age, 60)
+        self.assertEqual(r.cache_control['s-maxage'], '300')
+        self.assertTrue(r.cache_control.public)
+        self.assertEqual(r.cache_control['stale-while-revalidate'], '30')
+        self.assertEqual(r.cache_control['stale-if-error'], '600')
+        self.assertIn('Accept-Language', r.vary)
+
+    def test_cache_control_of_view_is_kept(self):
+        r = self.client.get('/custom')
+
+        self.assertEqual(r.headers['Cache-Control'], 'no-cache')
+
+    def test_errors_are_not_cached(self):
+        r = self.client.get('/missing')
+
+        self.assertNotIn('Cache-Control', r.headers)
+
+    def test_unsafe_requests_are_not_cached(self):
+        self.app.cache_policy = CachePolicy(max_age=10)
+
+        r = self.client.post('/')
+
+        self.assertNotIn('Cache-Control', r.headers)
+
+    def test_no_store(self):
+        self.app.cache_policy = CachePolicy(max_age=10, no_store=True)
+
+        r = self.client.get('/')
+
+        self.assertEqual(r.headers['Cache-Control'], 'no-store')
+
+
+class HawkCachePolicyTest(FlaskTestCase):
+    def setUp(self):
+        self.app = ResponsiveFlask(__name__)
+        self.hawk = Hawk(self.app)
+
+        @self.hawk.client_key_loader
+        def get_client_key(client_id):
+            return CREDENTIALS['key']
+
+        @self.app.route('/private')
+        @self.hawk.auth_required
+        def private():
+            return {'hello': 'world'}
+
+        @self.app.route('/products')
+        @self.hawk.auth_required
+        @cache_policy(max_age=60, s_maxage=300)
+        def product_list():
+            return {'objects': []}
+
+        @self.app.route('/catalog')
+        @self.hawk.auth_required
+        @cache_policy(max_age=60, public=True)
+        def catalog():
+            return {'objects': []}
+
+        self.client = self.app.test_client()
+
+    def signed_get(self, path):
+        sender = make_sender(CREDENTIALS, path=path)
+        return self.client.get(path, headers={
+            'Authorization': sender.request_header
+        })
+
+    def test_response_is_private_by_default(self):
+        r = self.signed_get('/private')
+
+        self.assertEqual(r.headers['Cache-Control'], 'private')
+        self.assertIn('Authorization', r.vary)
+        self.assertIn('Accept', r.vary)
+
+    def test_s_maxage_is_not_sent_with_private(self):
+        r = self.signed_get('/products')
+
+        self.assertEqual(r.headers['Cache-Control'], 'private, max-age=60')
+
+    def test_policy_can_make_response_public(self):
+        r = self.signed_get('/catalog')
+
+        self.assertTrue(r.cache_control.public)
+        self.assertIn('Authorization', r.vary)
+
+    def test_unauthorized_response_varies_by_authorization(self):
+        r = self.client.get('/private')
+
+        self.assertEqual(r.status_code, 401)
+        self.assertIn('Authorization', r.vary)
+        self.assertNotIn('Cache-Control', r.headers)
+
+    def test_cookie_is_in_vary_when_cookie_auth_is_allowed(self):
+        self.app.config['HAWK_ALLOW_COOKIE_AUTH'] = True
+
+        r = self.signed_get('/private')
+
+        self.assertIn('Cookie', r.vary)
@@ -0,0 +1,216 @@
+# coding: utf-8
+import gzip
+import io
+import zlib
+from unittest import skipUnless
+
+from flask.testsuite import FlaskTestCase
+from flask import json
+from api_utils import ResponsiveFlask
+from api_utils.compression import available_encodings
+
+
+def product_list():
+    return {
+        'objects': [{'id': i, 'title': 'Product'} for i in range(100)],
+    }
+
+
+def hello_world():
+    return {'hello': 'world'}
+
+
+def records():
+    for i in range(100):
+        yield {'id': i}
+
+
+def image():
+    return ResponsiveFlask.response_class(b'\x89PNG' * 1000,
+                                          mimetype='image/png')
+
+
+def gunzip(data):
+    return gzip.GzipFile(fileobj=io.BytesIO(data)).read()
+
+
+class CompressionTest(FlaskTestCase):
+    def setUp(self):
+        self.app = ResponsiveFlask(__name__)
+        self.app.config['RESPONSE_COMPRESSION_ENABLED'] = True
+        self.app.add_url_rule('/', view_func=product_list)
+        self.app.add_url_rule('/hello', view_func=hello_world)
+        self.app.add_url_rule('/records', view_func=records)
+        self.app.add_url_rule('/image', view_func=image)
+        self.client = self.app.test_client()
+
+    def get(self, path='/', accept_encoding='gzip'):
+        return self.client.get(
+            path, headers={'Accept-Encoding': accept_encoding}
+        )
+
+    def test_response_is_not_compressed_without_accept_encoding(self):
+        r = self.client.get('/')
+
+        self.assertNotIn('Content-Encoding', r.headers)
+        self.assertEqual(json.loads(r.data), product_list())
+
+    def test_vary_header_is_set_without_accept_encoding(self):
+        r = self.client.get('/')
+
+        self.assertIn('Accept-Encoding', r.vary)
+
+    def test_gzip_response(self):
+        r = self.get(accept_encoding='gzip')
+
+        self.assertEqual(r.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gunzip(r.data)), product_list())
+        self.assertEqual(int(r.headers['Content-Length']), len(r.data))
+        self.assertIn('Accept-Encoding', r.vary)
+
+    def test_deflate_response(self):
+        r = self.get(accept_encoding='deflate')
+
+        self.assertEqual(r.headers['Content-Encoding'], 'deflate')
+        self.assertEqual(
+            json.loads(zlib.decompress(r.data)), product_list()
+        )
+
+    def test_encoding_with_higher_quality_is_used(self):
+        self.app.config['RESPONSE_COMPRESSION_ENCODINGS'] = ('gzip', 'deflate')
+
+        r = self.get(accept_encoding='gzip;q=0.5, deflate')
+
+        self.assertEqual(r.headers['Content-Encoding'], 'deflate')
+
+    def test_excluded_encoding_is_not_used(self):
+        r = self.get(accept_encoding='gzip;q=0')
+
+        self.assertNotIn('Content-Encoding', r.headers)
+
+    def test_server_preference_is_used_for_wildcard(self):
+        self.app.config['RESPONSE_COMPRESSION_ENCODINGS'] = ('deflate', 'gzip')
+
+        r = self.get(accept_encoding='*')
+
+        self.assertEqual(r.headers['Content-Encoding'], 'deflate')
+
+    def test_small_response_is_not_compressed(self):
+        r = self.get('/hello')
+
+        self.assertNotIn('Content-Encoding', r.headers)
+        self.assertIn('Accept-Encoding', r.vary)
+
+    def test_compression_level_is_configurable(self):
+        self.app.config['RESPONSE_COMPRESSION_LEVELS'] = {'gzip': 1}
+        fast = self.get().data
+        self.app.config['RESPONSE_COMPRESSION_LEVELS'] = {'gzip': 9}
+        best = self.get().data
+
+        self.assertEqual(gunzip(fast), gunzip(best))
+        self.assertNotEqual(fast, best)
+
+    def test_streamed_response_is_compressed(self):
+        r = self.get('/records')
+
+        self.assertEqual(r.headers['Content-Encoding'], 'gzip')
+        self.assertNotIn('Content-Length', r.headers)
+        self.assertEqual(len(json.loads(gunzip(r.data))), 100)
+
+    def test_already_compressed_mimetype_is_skipped(self):
+        r = self.get('/image')
+
+        self.assertNotIn('Content-Encoding', r.headers)
+        self.assertNotIn('Accept-Encoding', r.vary)
+
+    def test_strong_etag_becomes_weak_when_response_is_compressed(self):
+        self.app.config['RESPONSE_ETAG_ENABLED'] = True
+
+        r = self.get()
+
+        self.assertTrue(r.get_etag()[1])
+
+    def test_304_when_weakened_etag_matches_if_none_match(self):
+        self.app.config['RESPONSE_ETAG_ENABLED'] = True
+        etag = self.get().headers['ETag']
+
+        r = self.client.get('/', headers={
+            'Accept-Encoding': 'gzip',
+            'If-None-Match': etag,
+        })
+
+        self.assertEqual(r.status_code, 304)
+
+    def test_304_has_etag_and_vary_of_compressed_response(self):
+        self.app.config['RESPONSE_ETAG_ENABLED'] = True
+        full = self.get()
+
+        r = self.client.get('/', headers={
+            'Accept-Encoding': 'gzip',
+            'If-None-Match': full.headers['ETag'],
+        })
+
+        self.assertEqual(r.status_code, 304)
+        self.assertEqual(r.headers['ETag'], full.headers['ETag'])
+        self.assertEqual(r.headers['Vary'], full.headers['Vary'])
+
+    def test_304_has_etag_of_small_response(self):
+        self.app.config['RESPONSE_ETAG_ENABLED'] = True
+        full = self.get('/hello')
+
+        r = self.client.get('/hello', headers={
+            'Accept-Encoding': 'gzip',
+            'If-None-Match': full.headers['ETag'],
+        })
+
+        self.assertEqual(r.status_code, 304)
+        self.assertEqual(r.headers['ETag'], full.headers['ETag'])
+
+    def test_304_of_versioned_view_has_vary(self):
+        @self.app.route('/versioned')
+        @self.app.versioned(lambda: 1)
+        def versioned():
+            return product_list()
+
+        full = self.get('/versioned')
+
+        r = self.client.get('/versioned', headers={
+            'Accept-Encoding': 'gzip',
+            'If-None-Match': full.headers['ETag'],
+        })
+
+        self.assertEqual(r.status_code, 304)
+        self.assertEqual(r.headers['ETag'], full.headers['ETag'])
+        self.assertEqual(r.headers['Vary'], full.headers['Vary'])
+
+    def test_compression_is_disabled_by_default(self):
+        self.app.config['RESPONSE_COMPRESSION_ENABLED'] = False
+
+        r = self.get()
+
+        self.assertNotIn('Content-Encoding', r.headers)
+        self.assertNotIn('Accept-Encoding', r.vary)
+        self.assertFalse(
+            ResponsiveFlask.default_config['RESPONSE_COMPRESSION_ENABLED']
+        )
+
+    @skipUnless('br' in available_encodings(), 'brotli is not installed')
+    def test_brotli_response(self):
+        import brotli
+
+        r = self.get(accept_encoding='br')
+
+        self.assertEqual(r.headers['Content-Encoding'], 'br')
+        self.assertEqual(
+            json.loads(brotli.decompress(r.data)), product_list()
+        )
+
+    @skipUnless('zstd' in available_encodings(), 'zstandard is not installed')
+    def test_zstd_streamed_response(self):
+        import zstandard
+
+        r = self.get('/records', accept_encoding='zstd')
+        data = zstandard.ZstdDecompressor().decompressobj().decompress(r.data)
+
+        self.assertEqual(r.headers['Content-Encoding'], 'zstd')
+        self.assertEqual(len(json.loads(data)), 100)
@@ -0,0 +1,163 @@
+# coding: utf-8
+import json
+from unittest import TestCase, skipIf
+
+from flask.testsuite import FlaskTestCase
+from api_utils import ResponsiveFlask, Hawk
+from api_utils.cache import ResponseCache
+from api_utils.coroutines import is_awaitable, run_sync, iterate_sync
+try:
+    from . import async_views
+except SyntaxError:
+    async_views = None
+
+from .utils import make_sender
+
+CREDENTIALS = {
+    'id': 'Alice',
+    'key': 'werxhqb98rpaxn39848xrunpaw3489ruxnpa98w4rxn',
+    'algorithm': 'sha256'
+}
+
+
+@skipIf(async_views is None, 'async syntax is not supported')
+class CoroutinesTest(TestCase):
+    def test_is_awaitable(self):
+        coroutine = async_views.product_detail()
+
+        self.assertTrue(is_awaitable(coroutine))
+        self.assertFalse(is_awaitable({'id': 1}))
+        run_sync(coroutine)
+
+    def test_run_sync(self):
+        self.assertEqual(run_sync(async_views.product_detail()), {'id': 1})
+
+    def test_iterate_sync(self):
+        self.assertEqual(list(iterate_sync(async_views.product_list())),
+                         [{'id': 0}, {'id': 1}, {'id': 2}])
+
+
+@skipIf(async_views is None, 'async syntax is not supported')
+class AsyncViewTest(FlaskTestCase):
+    def setUp(self):
+        self.app = ResponsiveFlask(__name__)
+        self.app.config['JSONIFY_PRETTYPRINT_REGULAR'] = False
+        self.app.add_url_rule('/products/1',
+                              view_func=async_views.product_detail)
+        self.app.add_url_rule('/products', view_func=async_views.product_list)
+        self.app.add_url_rule('/products/new',
+                              view_func=async_views.create_product)
+        self.app.add_url_rule('/concurrent',
+                              view_func=async_views.concurrent_products)
+        self.app.add_url_rule('/products/2',
+                              view_func=async_views.missing_product)
+        self.client = self.app.test_client()
+
+    def test_dict_is_formatted(self):
+        r = self.client.get('/products/1')
+
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(json.loads(r.data.decode('utf-8')), {'id': 1})
+
+    def test_tuple_is_unpacked(self):
+        r = self.client.get('/products/new')
+
+        self.assertEqual(r.status_code, 201)
+        self.assertEqual(r.headers['Location'], 'http://localhost/products/1')
+        self.assertEqual(json.loads(r.data.decode('utf-8')), {'id': 1})
+
+    def test_async_generator_is_streamed(self):
+        r = self.client.get('/products')
+
+        self.assertEqual(json.loads(r.data.decode('utf-8')),
+                         [{'id': 0}, {'id': 1}, {'id': 2}])
+
+    def test_awaited_coroutines_run_concurrently(self):
+        r = self.client.get('/concurrent')
+
+        self.assertEqual(json.loads(r.data.decode('utf-8')),
+                         {'objects': [{'id': 1}, {'id': 1}]})
+
+    def test_abort_is_handled_by_error_handler(self):
+        @self.app.errorhandler(404)
+        def not_found(error):
+            return {'message': 'not found'}, 404
+
+        r = self.client.get('/products/2')
+
+        self.assertEqual(r.status_code, 404)
+        self.assertEqual(json.loads(r.data.decode('utf-8')),
+                         {'message': 'not found'})
+
+    def test_cached_async_view(self):
+        cache = ResponseCache(self.app)
+        self.app.add_url_rule(
+            '/cached', 'cached', cache.cached()(async_views.product_detail)
+        )
+
+        first = self.client.get('/cached')
+        second = self.client.get('/cached')
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(json.loads(second.data.decode('utf-8')), {'id': 1})
+        self.assertEqual(cache.stats()['hits'], 1)
+
+
+@skipIf(async_views is None, 'async syntax is not supported')
+class AsyncClientKeyLoaderTest(FlaskTestCase):
+    def setUp(self):
+        self.app = ResponsiveFlask(__name__)
+        self.hawk = Hawk(self.app)
+        self.loaded_keys = []
+
+        @self.hawk.client_key_loader
+        def get_client_key(client_id):
+            self.loaded_keys.append(client_id)
+            return async_views.get_client_key(client_id)
+
+        @self.app.route('/')
+        @self.hawk.auth_required
+        def index():
+            return {'hello': 'world'}
+
+        self.client = self.app.test_client()
+
+    def signed_get(self, credentials):
+        sender = make_sender(credentials)
+        return self.client.get('/', headers={
+            'Authorization': sender.request_header
+        })
+
+    def test_coroutine_function_can_be_registered(self):
+        hawk = Hawk(self.app)
+        hawk.client_key_loader(async_views.get_client_key)
+
+        with self.app.test_request_context():
+            self.assertEqual(
+                hawk._client_key_loader_func('Alice')['key'],
+                CREDENTIALS['key']
+            )
+
+    def test_valid_signature(self):
+        r = self.signed_get(CREDENTIALS)
+
+        self.assertEqual(r.status_code, 200)
+
+    def test_401_when_key_is_wrong(self):
+        r = self.signed_get(dict(CREDENTIALS, key='wrong'))
+
+        self.assertEqual(r.status_code, 401)
+
+    def test_401_when_client_is_unknown(self):
+        r = self.signed_get(dict(CREDENTIALS, id='Bob'))
+
+        self.assertEqual(r.status_code, 401)
+
+    def test_key_is_cached(self):
+        self.app.config['HAWK_CREDENTIALS_CACHE_TTL'] = 60
+
+        self.signed_get(CREDENTIALS)
+        r = self.signed_get(CREDENTIALS)
+
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(self.loaded_keys, ['Alice'])
@@ -1,7 +1,7 @@
 # coding: utf-8
 from flask.testsuite import FlaskTestCase
 from flask import json, request
-from api_utils import ResponsiveFlask
+from api_utils import ResponsiveFlask, formatters
 
 
 def hello_world():
@@ -142,6 +142,324 @@ class ResponsiveFlaskTest(FlaskTestCase):
         self.assertEqual(r.mimetype, 'text/html')
 
 
+class NegotiationTest(FlaskTestCase):
+    def setUp(self):
+        self.app = ResponsiveFlask(__name__)
+        self.app.add_url_rule('/', view_func=hello_world)
+        self.client = self.app.test_client()
+
+    def test_json_response_when_type_wildcard_is_accepted(self):
+        headers = {
+            'Accept': 'application/*',
+        }
+        r = self.client.get('/', headers=headers)
+
+        self.assertEqual(json.loads(r.data), expected_json)
+        self.assertEqual(r.mimetype, 'application/json')
+
+    def test_default_mimetype_is_preferred_by_type_wildcard(self):
+        self.app.response_formatters['application/xml'] = dummy_xml_formatter
+        self.app.default_mimetype = 'application/xml'
+
+        headers = {
+            'Accept': 'application/*',
+        }
+        r = self.client.get('/', headers=headers)
+
+        self.assertEqual(r.data, expected_xml)
+
+    def test_structured_syntax_suffix_is_served_by_json_formatter(self):
+        headers = {
+            'Accept': 'application/vnd.company+json',
+        }
+        r = self.client.get('/', headers=headers)
+
+        self.assertEqual(json.loads(r.data), expected_json)
+        self.assertEqual(r.mimetype, 'application/vnd.company+json')
+
+    def test_registered_vendor_mimetype_is_preferred_to_suffix(self):
+        vnd_mimetype = 'application/vnd.company+xml'
+        self.app.response_formatters[vnd_mimetype] = dummy_xml_formatter
+
+        headers = {
+            'Accept': 'application/vnd.other+xml',
+        }
+        r = self.client.get('/', headers=headers)
+
+        self.assertEqual(r.data, expected_xml)
+        self.assertEqual(r.mimetype, 'application/vnd.other+xml')
+
+    def test_mimetype_excluded_by_zero_quality_is_not_used(self):
+        self.app.response_formatters['application/xml'] = dummy_xml_formatter
+
+        headers = {
+            'Accept': 'application/json;q=0, */*',
+        }
+        r = self.client.get('/', headers=headers)
+
+        self.assertEqual(r.data, expected_xml)
+
+    def test_406_when_all_media_types_are_excluded(self):
+        headers = {
+            'Accept': '*/*;q=0',
+        }
+        r = self.client.get('/', headers=headers)
+
+        self.assertEqual(r.status_code, 406)
+
+    def test_specific_range_overrides_excluded_type_wildcard(self):
+        headers = {
+            'Accept': 'application/*;q=0, application/json;q=0.1',
+        }
+        r = self.client.get('/', headers=headers)
+
+        self.assertEqual(json.loads(r.data), expected_json)
+
+    def test_less_specific_range_with_higher_quality_wins(self):
+        self.app.response_formatters['application/xml'] = dummy_xml_formatter
+
+        headers = {
+            'Accept': 'application/json;q=0.2, application/*;q=0.8',
+        }
+        r = self.client.get('/', headers=headers)
+
+        self.assertEqual(r.data, expected_xml)
+
+
+class NegotiationCacheTest(FlaskTestCase):
+    def setUp(self):
+        self.app = ResponsiveFlask(__name__)
+        self.app.add_url_rule('/', view_func=hello_world)
+        self.client = self.app.test_client()
+
+    def test_mimetype_is_negotiated_once_per_accept_header(self):
+        headers = {
+            'Accept': 'application/xml,application/json',
+        }
+        self.client.get('/', headers=headers)
+        self.client.get('/', headers=headers)
+
+        self.assertEqual(self.app.negotiation_cache.misses, 1)
+        self.assertEqual(self.app.negotiation_cache.hits, 1)
+
+    def test_cache_is_invalidated_when_formatter_is_registered(self):
+        headers = {
+            'Accept': 'application/xml,application/json',
+        }
+        self.client.get('/', headers=headers)
+        self.app.response_formatters['application/xml'] = dummy_xml_formatter
+        r = self.client.get('/', headers=headers)
+
+        self.assertEqual(r.data, expected_xml)
+        self.assertEqual(r.mimetype, 'application/xml')
+
+    def test_cache_is_invalidated_when_default_mimetype_is_changed(self):
+        self.app.response_formatters['application/xml'] = dummy_xml_formatter
+        self.client.get('/')
+        self.app.default_mimetype = 'application/xml'
+        r = self.client.get('/')
+
+        self.assertEqual(r.data, expected_xml)
+        self.assertEqual(r.mimetype, 'application/xml')
+
+    def test_least_recently_used_accept_header_is_evicted(self):
+        self.app.negotiation_cache.maxsize = 2
+        for accept in ('application/json', 'text/*', '*/*'):
+            self.client.get('/', headers={'Accept': accept})
+
+        self.assertEqual(len(self.app.negotiation_cache), 2)
+        self.assertNotIn('application/json', self.app.negotiation_cache)
+
+
+def records():
+    for i in range(3):
+        yield {'id': i}
+expected_records = [{'id': 0}, {'id': 1}, {'id': 2}]
+
+
+class StreamingTest(FlaskTestCase):
+    def setUp(self):
+        self.app = ResponsiveFlask(__name__)
+        self.app.add_url_rule('/', view_func=records)
+        self.client = self.app.test_client()
+
+    def test_records_are_streamed_as_json_array(self):
+        r = self.client.get('/')
+
+        self.assertTrue(r.is_streamed)
+        self.assertEqual(json.loads(r.data), expected_records)
+        self.assertEqual(r.mimetype, 'application/json')
+
+    def test_empty_json_array_when_there_are_no_records(self):
+        self.app.view_functions['records'] = lambda: iter([])
+
+        r = self.client.get('/')
+
+        self.assertEqual(json.loads(r.data), [])
+
+    def test_records_are_streamed_as_ndjson(self):
+        ndjson_mimetype = 'application/x-ndjson'
+        self.app.response_formatters[ndjson_mimetype] = formatters.ndjson
+
+        headers = {
+            'Accept': ndjson_mimetype,
+        }
+        r = self.client.get('/', headers=headers)
+        lines = r.data.decode('utf-8').splitlines()
+
+        self.assertEqual([json.loads(line) for line in lines], expected_records)
+        self.assertEqual(r.mimetype, ndjson_mimetype)
+
+    def test_records_are_streamed_with_status_code(self):
+        self.app.view_functions['records'] = lambda: (records(), 201)
+
+        r = self.client.get('/')
+
+        self.assertEqual(r.status_code, 201)
+        self.assertEqual(json.loads(r.data), expected_records)
+
+    def test_type_error_when_formatter_does_not_support_streaming(self):
+        self.app.response_formatters['application/xml'] = dummy_xml_formatter
+
+        headers = {
+            'Accept': 'application/xml',
+        }
+        with self.app.test_request_context(headers=headers):
+            with self.assertRaises(TypeError):
+                self.app.make_response(records())
+
+
+def product_list():
+    return {
+        'count': 100,
+        'objects': [{'id': i, 'title': 'Product'} for i in range(100)],
+    }
+
+
+class IncrementalEncodingTest(FlaskTestCase):
+    def setUp(self):
+        self.app = ResponsiveFlask(__name__)
+        self.app.add_url_rule('/', view_func=product_list)
+        self.client = self.app.test_client()
+
+    def test_response_is_not_streamed_by_default(self):
+        with self.app.test_request_context():
+            r = self.app.make_response(product_list())
+
+        self.assertFalse(r.is_streamed)
+
+    def test_response_is_not_streamed_when_it_is_below_threshold(self):
+        self.app.config['RESPONSE_STREAMING_THRESHOLD'] = 1000
+
+        with self.app.test_request_context():
+            r = self.app.make_response(product_list())
+
+        self.assertFalse(r.is_streamed)
+
+    def test_large_response_is_streamed_in_chunks(self):
+        self.app.config['RESPONSE_STREAMING_THRESHOLD'] = 100
+        self.app.config['RESPONSE_STREAMING_CHUNK_SIZE'] = 512
+
+        with self.app.test_request_context():
+            r = self.app.make_response(product_list())
+            chunks = list(r.response)
+
+        self.assertTrue(r.is_streamed)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(json.loads(b''.join(chunks)), product_list())
+
+    def test_streamed_body_equals_regular_body(self):
+        regular_body = self.client.get('/').data
+        self.app.config['RESPONSE_STREAMING_THRESHOLD'] = 1
+
+        r = self.client.get('/')
+
+        self.assertEqual(r.data, regular_body)
+
+
+class ConditionalRequestTest(FlaskTestCase):
+    def setUp(self):
+        self.app = ResponsiveFlask(__name__)
+        self.app.add_url_rule('/', view_func=hello_world)
+        self.client = self.app.test_client()
+        self.calls = []
+
+    def test_etag_is_not_set_by_default(self):
+        r = self.client.get('/')
+
+        self.assertNotIn('ETag', r.headers)
+
+    def test_etag_is_set_when_it_is_enabled(self):
+        self.app.config['RESPONSE_ETAG_ENABLED'] = True
+
+        r = self.client.get('/')
+        etag, is_weak = r.get_etag()
+
+        self.assertIsNotNone(etag)
+        self.assertFalse(is_weak)
+
+    def test_weak_etag_is_set(self):
+        self.app.config['RESPONSE_ETAG_ENABLED'] = True
+        self.app.config['RESPONSE_ETAG_WEAK'] = True
+
+        r = self.client.get('/')
+
+        self.assertTrue(r.get_etag()[1])
+
+    def test_304_when_etag_matches_if_none_match(self):
+        self.app.config['RESPONSE_ETAG_ENABLED'] = True
+        etag = self.client.get('/').headers['ETag']
+
+        r = self.client.get('/', headers={'If-None-Match': etag})
+
+        self.assertEqual(r.status_code, 304)
+        self.assertEqual(r.data, b'')
+        self.assertEqual(r.headers['ETag'], etag)
+
+    def test_200_when_etag_does_not_match_if_none_match(self):
+        self.app.config['RESPONSE_ETAG_ENABLED'] = True
+
+        r = self.client.get('/', headers={'If-None-Match': '"blah"'})
+
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(json.loads(r.data), expected_json)
+
+    def add_versioned_view(self, version):
+        @self.app.route('/products/<int:product_id>')
+        @self.app.versioned(lambda product_id: version)
+        def product_detail(product_id):
+            self.calls.append(product_id)
+            return {'id': product_id}
+
+    def test_etag_is_derived_from_version(self):
+        self.add_versioned_view(version=1)
+
+        r = self.client.get('/products/1')
+
+        self.assertIsNotNone(r.get_etag()[0])
+        self.assertEqual(json.loads(r.data), {'id': 1})
+
+    def test_view_is_not_called_when_version_did_not_change(self):
+        self.add_versioned_view(version=1)
+        etag = self.client.get('/products/1').headers['ETag']
+
+        r = self.client.get('/products/1', headers={'If-None-Match': etag})
+
+        self.assertEqual(r.status_code, 304)
+        self.assertEqual(self.calls, [1])
+
+    def test_etag_depends_on_negotiated_mimetype(self):
+        self.app.response_formatters['application/xml'] = dummy_xml_formatter
+        self.add_versioned_view(version=1)
+
+        json_etag = self.client.get('/products/1').headers['ETag']
+        xml_etag = self.client.get(
+            '/products/1', headers={'Accept': 'application/xml'}
+        ).headers['ETag']
+
+        self.assertNotEqual(json_etag, xml_etag)
+
+
 def hello_bad_request():
     request.args['bad-key']
 
@@ -204,3 +522,99 @@ class ErrorHandlingByResponsiveFlaskTest(FlaskTestCase):
 
         self.assertIn('code', r_json)
         self.assertIn('message', r_json)
+
+    def test_static_error_handler_can_be_registered_by_decorator(self):
+        self.app.add_url_rule('/', view_func=hello_bad_request)
+
+        @self.app.default_errorhandler(static=True)
+        def error_handler(error):
+            return code_and_message(error)
+
+        r = self.client.get('/')
+
+        self.assertEqual(r.status_code, 400)
+        self.assertEqual(json.loads(r.data)['code'], 400)
+        self.assertEqual(r.mimetype, 'application/json')
+
+
+class RenderedErrorsTest(FlaskTestCase):
+    def setUp(self):
+        self.app = ResponsiveFlask(__name__)
+        self.app.add_url_rule('/', view_func=hello_world)
+        self.app.add_url_rule('/bad', view_func=hello_bad_request)
+        self.client = self.app.test_client()
+        self.handled = []
+
+    def handle(self, error):
+        self.handled.append(error.code)
+        return code_and_message(error)
+
+    def test_406_body_is_rendered_once(self):
+        headers = {'Accept': 'text/html'}
+        first = self.client.get('/', headers=headers)
+        second = self.client.get('/', headers=headers)
+
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(json.loads(second.data),
+                         {'mimetypes': ['application/json']})
+        self.assertEqual(self.app.rendered_errors_cache.misses, 1)
+        self.assertEqual(self.app.rendered_errors_cache.hits, 1)
+
+    def test_406_body_is_rendered_again_when_formatter_is_registered(self):
+        headers = {'Accept': 'text/html'}
+        self.client.get('/', headers=headers)
+        self.app.response_formatters['application/xml'] = dummy_xml_formatter
+        r = self.client.get('/', headers=headers)
+
+        self.assertEqual(
+            sorted(json.loads(r.data)['mimetypes']),
+            ['application/json', 'application/xml']
+        )
+
+    def test_406_body_is_rendered_again_when_pretty_print_is_changed(self):
+        headers = {'Accept': 'text/html'}
+        self.app.config['JSONIFY_PRETTYPRINT_REGULAR'] = True
+        pretty = self.client.get('/', headers=headers)
+        self.app.config['JSONIFY_PRETTYPRINT_REGULAR'] = False
+        compact = self.client.get('/', headers=headers)
+
+        self.assertNotEqual(pretty.data, compact.data)
+
+    def test_static_error_body_is_rendered_once(self):
+        self.app.default_errorhandler(self.handle, static=True)
+
+        first = self.client.get('/bad')
+        second = self.client.get('/bad')
+
+        self.assertEqual(self.handled, [400])
+        self.assertEqual(second.status_code, 400)
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(second.mimetype, 'application/json')
+
+    def test_static_error_bodies_are_rendered_per_error(self):
+        self.app.default_errorhandler(self.handle, static=True)
+
+        self.client.get('/bad')
+        r = self.client.get('/missing')
+
+        self.assertEqual(self.handled, [400, 404])
+        self.assertEqual(r.status_code, 404)
+        self.assertEqual(json.loads(r.data)['code'], 404)
+
+    def test_static_error_body_is_rendered_per_mimetype(self):
+        self.app.response_formatters['application/xml'] = dummy_xml_formatter
+        self.app.default_errorhandler(self.handle, static=True)
+
+        self.client.get('/bad')
+        r = self.client.get('/bad', headers={'Accept': 'application/xml'})
+
+        self.assertEqual(self.handled, [400, 400])
+        self.assertEqual(r.data, expected_xml)
+
+    def test_error_handler_is_called_every_time_by_default(self):
+        self.app.default_errorhandler(self.handle)
+
+        self.client.get('/bad')
+        self.client.get('/bad')
+
+        self.assertEqual(self.handled, [400, 400])
@@ -0,0 +1,108 @@
+# coding: utf-8
+from datetime import datetime, timedelta, tzinfo
+from unittest import skipIf
+
+from flask.testsuite import FlaskTestCase
+from api_utils import ResponsiveFlask, formatters
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+
+def catalog():
+    return {
+        'title': u'Caf\xe9',
+        'price': 10.5,
+        'count': 2,
+        'available': True,
+        'tags': ['a', 'b'],
+        'thumbnail': b'\x89PNG',
+        'created': datetime(2014, 1, 1),
+        'parent': None,
+    }
+expected_catalog = {
+    'title': u'Caf\xe9',
+    'price': 10.5,
+    'count': 2,
+    'available': True,
+    'tags': ['a', 'b'],
+    'thumbnail': b'\x89PNG',
+    'created': 'Wed, 01 Jan 2014 00:00:00 GMT',
+    'parent': None,
+}
+
+
+class UTC(tzinfo):
+    def utcoffset(self, dt):
+        return timedelta(0)
+
+    def dst(self, dt):
+        return timedelta(0)
+
+
+def hello_world():
+    return {'hello': 'world'}
+
+
+class BinaryFormatterTestMixin(object):
+    mimetype = None
+    formatter = None
+    expected_catalog = expected_catalog
+
+    def loads(self, data):
+        raise NotImplementedError()
+
+    def setUp(self):
+        self.app = ResponsiveFlask(__name__)
+        self.app.response_formatters[self.mimetype] = self.formatter
+        self.app.add_url_rule('/', view_func=catalog)
+        self.app.add_url_rule('/hello', view_func=hello_world)
+        self.client = self.app.test_client()
+
+    def test_round_trip(self):
+        headers = {
+            'Accept': self.mimetype,
+        }
+        r = self.client.get('/', headers=headers)
+
+        self.assertEqual(self.loads(r.data), self.expected_catalog)
+        self.assertEqual(r.mimetype, self.mimetype)
+
+    def test_bytes_are_returned(self):
+        with self.app.test_request_context():
+            rv = self.formatter(hello='world')
+        self.assertIsInstance(rv, bytes)
+
+    def test_json_is_preferred_by_quality_factor(self):
+        headers = {
+            'Accept': '{0};q=0.5, application/json'.format(self.mimetype),
+        }
+        r = self.client.get('/hello', headers=headers)
+
+        self.assertEqual(r.mimetype, 'application/json')
+
+
+@skipIf(msgpack is None, 'msgpack is not installed')
+class MsgpackFormatterTest(BinaryFormatterTestMixin, FlaskTestCase):
+    mimetype = 'application/msgpack'
+    formatter = staticmethod(formatters.msgpack)
+
+    def loads(self, data):
+        return msgpack.unpackb(data, raw=False)
+
+
+@skipIf(cbor2 is None, 'cbor2 is not installed')
+class CborFormatterTest(BinaryFormatterTestMixin, FlaskTestCase):
+    mimetype = 'application/cbor'
+    formatter = staticmethod(formatters.cbor)
+    expected_catalog = dict(
+        expected_catalog, created=datetime(2014, 1, 1, tzinfo=UTC())
+    )
+
+    def loads(self, data):
+        return cbor2.loads(data)
@@ -0,0 +1,98 @@
+# coding: utf-8
+import ast
+import json
+import os
+import subprocess
+import sys
+from unittest import TestCase
+
+import api_utils
+
+ROOT_DIR = os.path.join(os.path.dirname(__file__), os.pardir)
+
+#: Budget of ``import api_utils`` and access of its public objects
+#: after Flask was imported. It is several times as much as the measured
+#: cost, so it catches eagerly imported dependencies, not noise.
+IMPORT_SECONDS_BUDGET = 0.25
+IMPORT_RSS_KB_BUDGET = 8 * 1024
+
+#: Optional dependencies which must not be imported on startup.
+LAZY_MODULES = (
+    'mohawk', 'flask_login', 'msgpack', 'cbor2',
+    'zstandard', 'brotli', 'orjson', 'ujson', 'rapidjson',
+    'api_utils.payload', 'api_utils.cache', 'api_utils.metrics',
+    'api_utils.nonces', 'api_utils.schema',
+)
+
+SCRIPT = '''
+import json, resource, sys, time
+import flask
+
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+started_at = time.time()
+import api_utils
+app = api_utils.ResponsiveFlask(__name__)
+api_utils.Hawk(app)
+print(json.dumps({
+    'seconds': time.time() - started_at,
+    'rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_kb,
+    'modules': sorted(sys.modules),
+}))
+'''
+
+
+class ImportBudgetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        output = subprocess.check_output(
+            [sys.executable, '-c', SCRIPT], cwd=ROOT_DIR
+        )
+        cls.startup = json.loads(output.decode('utf-8'))
+
+    def test_optional_dependencies_are_not_imported(self):
+        imported = [name for name in LAZY_MODULES
+                    if name in self.startup['modules']]
+
+        self.assertEqual(imported, [])
+
+    def test_import_time(self):
+        self.assertLess(self.startup['seconds'], IMPORT_SECONDS_BUDGET)
+
+    def test_import_memory(self):
+        self.assertLess(self.startup['rss_kb'], IMPORT_RSS_KB_BUDGET)
+
+
+class LazyAsyncioTest(TestCase):
+    # blinker>=1.6 imports asyncio on startup, so sys.modules can't tell
+    # whether api_utils imported it. Module-level imports are checked.
+    def test_coroutines_module_does_not_import_asyncio(self):
+        path = os.path.join(ROOT_DIR, 'api_utils', 'coroutines.py')
+        with open(path) as f:
+            tree = ast.parse(f.read())
+
+        imported = set()
+        for node in tree.body:
+            if isinstance(node, ast.Import):
+                imported.update(alias.name for alias in node.names)
+            elif isinstance(node, ast.ImportFrom):
+                imported.add(node.module)
+
+        self.assertNotIn('asyncio', imported)
+
+
+class LazyModuleTest(TestCase):
+    def test_public_objects(self):
+        from api_utils.app import ResponsiveFlask
+        from api_utils.auth import Hawk
+
+        self.assertIs(api_utils.ResponsiveFlask, ResponsiveFlask)
+        self.assertIs(api_utils.Hawk, Hawk)
+
+    def test_submodule_is_imported_on_attribute_access(self):
+        from api_utils import ratelimit
+
+        self.assertIs(api_utils.ratelimit, ratelimit)
+
+    def test_unknown_attribute(self):
+        with self.assertRaises(AttributeError):
+            api_utils.missing
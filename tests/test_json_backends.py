@@ -0,0 +1,206 @@
+# coding: utf-8
+from collections import OrderedDict, defaultdict
+from datetime import datetime
+from unittest import skipIf, skipUnless
+try:
+    from enum import Enum
+except ImportError:
+    Enum = None
+
+from flask.testsuite import FlaskTestCase
+from flask import json
+from flask.json import JSONEncoder
+from api_utils import ResponsiveFlask
+from api_utils.json_backends import (
+    BACKENDS, JSONBackend, StdlibBackend, get_json_backend
+)
+
+
+def is_installed(name):
+    try:
+        BACKENDS[name]()
+    except ImportError:
+        return False
+    return True
+
+
+class Money(object):
+    def __init__(self, amount):
+        self.amount = amount
+
+
+class MoneyJSONEncoder(JSONEncoder):
+    def default(self, o):
+        if isinstance(o, Money):
+            return '{0} USD'.format(o.amount)
+        return super(MoneyJSONEncoder, self).default(o)
+
+
+def catalog():
+    return {
+        'title': u'Caf\xe9',
+        'price': Money(10),
+        'created': datetime(2014, 1, 1),
+        'tags': ['a', 'b'],
+        'url': 'http://example.com/',
+    }
+
+
+expected_json = {
+    'title': u'Caf\xe9',
+    'price': '10 USD',
+    'created': 'Wed, 01 Jan 2014 00:00:00 GMT',
+    'tags': ['a', 'b'],
+    'url': 'http://example.com/',
+}
+
+if Enum is not None:
+    class Color(str, Enum):
+        red = 'red'
+
+    class Size(int, Enum):
+        small = 1
+
+
+def nested_subclasses():
+    rv = {
+        'ordered': OrderedDict([('b', 1), ('a', 2)]),
+        'counts': defaultdict(int, {'a': 1}),
+    }
+    if Enum is not None:
+        rv.update(color=Color.red, size=Size.small)
+    return rv
+
+
+class JSONBackendTestMixin(object):
+    backend_name = None
+
+    def setUp(self):
+        self.app = ResponsiveFlask(__name__, json_backend=self.backend_name)
+        self.app.json_encoder = MoneyJSONEncoder
+        self.app.add_url_rule('/', view_func=catalog)
+        self.app.add_url_rule('/subclasses', view_func=nested_subclasses)
+        self.client = self.app.test_client()
+
+    def test_backend_is_used(self):
+        self.assertEqual(self.app.json_backend.name, self.backend_name)
+
+    def test_custom_encoder_hook_is_used(self):
+        r = self.client.get('/')
+
+        self.assertEqual(json.loads(r.data), expected_json)
+        self.assertEqual(r.mimetype, 'application/json')
+
+    def test_response_is_pretty_printed(self):
+        self.app.config['JSONIFY_PRETTYPRINT_REGULAR'] = True
+
+        r = self.client.get('/')
+
+        self.assertIn(b'\n  "', r.data)
+
+    def test_response_is_compact_for_xhr(self):
+        self.app.config['JSONIFY_PRETTYPRINT_REGULAR'] = True
+
+        headers = {
+            'X-Requested-With': 'XMLHttpRequest',
+        }
+        r = self.client.get('/', headers=headers)
+
+        self.assertNotIn(b'\n', r.data)
+
+    def test_keys_are_sorted(self):
+        self.app.config['JSON_SORT_KEYS'] = True
+        self.app.config['JSONIFY_PRETTYPRINT_REGULAR'] = False
+
+        r = self.client.get('/')
+
+        self.assertTrue(r.data.startswith(b'{"created":'))
+
+    def test_dict_subclasses_are_serialized(self):
+        r = self.client.get('/subclasses')
+
+        self.assertEqual(r.status_code, 200)
+        data = json.loads(r.data)
+        self.assertEqual(data['ordered'], {'a': 2, 'b': 1})
+        self.assertEqual(data['counts'], {'a': 1})
+
+    @skipIf(Enum is None, 'enum is not supported')
+    def test_enums_are_serialized_by_value(self):
+        r = self.client.get('/subclasses')
+
+        self.assertEqual(r.status_code, 200)
+        data = json.loads(r.data)
+        self.assertEqual(data['color'], 'red')
+        self.assertEqual(data['size'], 1)
+
+    def test_non_ascii_is_escaped(self):
+        r = self.client.get('/')
+
+        # rapidjson escapes in upper case.
+        self.assertIn(b'"caf\\u00e9"', r.data.lower())
+
+    def test_non_ascii_is_kept_when_app_allows_it(self):
+        self.app.config['JSON_AS_ASCII'] = False
+
+        r = self.client.get('/')
+
+        self.assertIn(u'"Caf\xe9"'.encode('utf-8'), r.data)
+
+    def test_406_lists_available_mimetypes(self):
+        headers = {
+            'Accept': 'blah/*',
+        }
+        r = self.client.get('/', headers=headers)
+
+        self.assertEqual(r.status_code, 406)
+        self.assertEqual(
+            json.loads(r.data), {'mimetypes': ['application/json']}
+        )
+
+
+class StdlibBackendTest(JSONBackendTestMixin, FlaskTestCase):
+    backend_name = 'stdlib'
+
+
+@skipUnless(is_installed('orjson'), 'orjson is not installed')
+class OrjsonBackendTest(JSONBackendTestMixin, FlaskTestCase):
+    backend_name = 'orjson'
+
+    def test_bytes_are_returned(self):
+        with self.app.test_request_context():
+            rv = self.app.json_backend.dumps({'hello': 'world'})
+        self.assertIsInstance(rv, bytes)
+
+
+@skipUnless(is_installed('ujson'), 'ujson is not installed')
+class UjsonBackendTest(JSONBackendTestMixin, FlaskTestCase):
+    backend_name = 'ujson'
+
+
+@skipUnless(is_installed('rapidjson'), 'rapidjson is not installed')
+class RapidjsonBackendTest(JSONBackendTestMixin, FlaskTestCase):
+    backend_name = 'rapidjson'
+
+
+class NotInstalledBackend(JSONBackend):
+    name = 'missing'
+
+    def __init__(self):
+        raise ImportError()
+
+
+class GetJSONBackendTest(FlaskTestCase):
+    def test_stdlib_is_used_by_default(self):
+        self.assertIsInstance(get_json_backend(), StdlibBackend)
+
+    def test_stdlib_is_used_when_backends_are_not_installed(self):
+        BACKENDS['missing'] = NotInstalledBackend
+        try:
+            backend = get_json_backend(('missing', 'stdlib'))
+        finally:
+            del BACKENDS['missing']
+        self.assertIsInstance(backend, StdlibBackend)
+
+    def test_value_error_when_backend_is_unknown(self):
+        with self.assertRaises(ValueError):
+            get_json_backend('blah')
@@ -0,0 +1,209 @@
+# coding: utf-8
+import json
+import shutil
+import tempfile
+import threading
+from unittest import TestCase, skipUnless
+
+from flask.signals import signals_available
+from api_utils import ResponsiveFlask, Hawk
+from api_utils.metrics import Metrics, Histogram
+
+from .utils import make_sender
+
+CREDENTIALS = {
+    'id': 'Alice',
+    'key': 'werxhqb98rpaxn39848xrunpaw3489ruxnpa98w4rxn',
+    'algorithm': 'sha256'
+}
+
+
+class HistogramTest(TestCase):
+    def test_values_are_counted_in_buckets(self):
+        histogram = Histogram((1, 10))
+        for value in (0.5, 1, 5, 100):
+            histogram.observe(value)
+
+        self.assertEqual(histogram.to_dict(), {
+            'bounds': [1, 10],
+            'counts': [2, 1, 1],
+            'count': 4,
+            'sum': 106.5,
+        })
+
+
+@skipUnless(signals_available, 'blinker is not installed')
+class MetricsTest(TestCase):
+    def setUp(self):
+        self.app = ResponsiveFlask(__name__)
+        hawk = Hawk(self.app)
+
+        @hawk.client_key_loader
+        def get_client_key(client_id):
+            if client_id == CREDENTIALS['id']:
+                return CREDENTIALS['key']
+            raise LookupError()
+
+        @self.app.route('/')
+        def hello_world():
+            return {'hello': 'world'}
+
+        @self.app.route('/protected')
+        @hawk.auth_required
+        def protected_view():
+            return {'hello': 'world'}
+
+        self.metrics = Metrics(self.app)
+        self.metrics.register_endpoint(self.app)
+        self.client = self.app.test_client()
+
+    def test_requests_are_counted_by_endpoint_mimetype_and_status(self):
+        self.client.get('/')
+        self.client.get('/')
+
+        route = self.metrics.snapshot()['routes']['hello_world']
+        self.assertEqual(route['application/json']['requests'], {'200': 2})
+
+    def test_phase_latencies(self):
+        self.client.get('/')
+
+        phases = (self.metrics.snapshot()['routes']['hello_world']
+                  ['application/json']['phases'])
+        self.assertEqual(sorted(phases), ['format', 'negotiation'])
+        self.assertEqual(phases['format']['count'], 1)
+
+    def test_payload_sizes(self):
+        r = self.client.get('/')
+
+        size = (self.metrics.snapshot()['routes']['hello_world']
+                ['application/json']['size'])
+        self.assertEqual(size['count'], 1)
+        self.assertEqual(size['sum'], len(r.data))
+
+    def test_not_acceptable_responses_are_counted(self):
+        self.client.get('/', headers={'Accept': 'text/html'})
+
+        self.assertEqual(
+            self.metrics.snapshot()['not_acceptable'], {'hello_world': 1}
+        )
+
+    def test_hawk_failures_are_counted_by_reason(self):
+        self.client.get('/protected')
+        sender = make_sender(dict(CREDENTIALS, key='wrong'),
+                             path='/protected')
+        self.client.get('/protected', headers={
+            'Authorization': sender.request_header,
+        })
+        sender = make_sender(dict(CREDENTIALS, id='Bob'), path='/protected')
+        self.client.get('/protected', headers={
+            'Authorization': sender.request_header,
+        })
+
+        self.assertEqual(self.metrics.snapshot()['hawk_failures'], {
+            'MissingAuthorization': 1,
+            'MacMismatch': 1,
+            'CredentialsLookupError': 1,
+        })
+
+    def test_shards_of_threads_are_merged(self):
+        threads = [threading.Thread(target=self.client.get, args=('/',))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        route = self.metrics.snapshot()['routes']['hello_world']
+        self.assertEqual(route['application/json']['requests'], {'200': 4})
+
+    def test_shards_of_finished_threads_are_retired(self):
+        # Like a server which starts a thread per request.
+        for _ in range(200):
+            thread = threading.Thread(target=self.client.get, args=('/',))
+            thread.start()
+            thread.join()
+        self.client.get('/')
+
+        route = self.metrics.snapshot()['routes']['hello_world']
+        self.assertEqual(route['application/json']['requests'], {'200': 201})
+        self.assertEqual(route['application/json']['size']['count'], 201)
+        self.assertEqual(len(self.metrics._shards), 1)
+
+    def test_endpoint_renders_metrics(self):
+        self.client.get('/')
+
+        r = self.client.get('/metrics')
+        data = json.loads(r.data.decode('utf-8'))
+
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(
+            data['routes']['hello_world']['application/json']['requests'],
+            {'200': 1}
+        )
+
+    def test_reset(self):
+        self.client.get('/')
+        self.metrics.reset()
+
+        self.assertEqual(self.metrics.snapshot()['routes'], {})
+
+
+class MergeTest(TestCase):
+    def test_counters_and_histograms_are_summed(self):
+        histogram = {'bounds': [1], 'counts': [1, 0], 'count': 1, 'sum': 0.5}
+        snapshot = {
+            'routes': {'index': {'application/json': {
+                'requests': {'200': 1},
+                'size': histogram,
+            }}},
+            'not_acceptable': {},
+            'hawk_failures': {'MacMismatch': 1},
+        }
+
+        merged = Metrics.merge([snapshot, snapshot])
+
+        route = merged['routes']['index']['application/json']
+        self.assertEqual(route['requests'], {'200': 2})
+        self.assertEqual(route['size']['counts'], [2, 0])
+        self.assertEqual(route['size']['sum'], 1.0)
+        self.assertEqual(merged['hawk_failures'], {'MacMismatch': 2})
+        self.assertEqual(histogram['counts'], [1, 0])
+
+    def test_histograms_with_different_buckets_are_not_merged(self):
+        a = {'size': {'bounds': [1], 'counts': [1, 0], 'count': 1, 'sum': 1}}
+        b = {'size': {'bounds': [2], 'counts': [1, 0], 'count': 1, 'sum': 1}}
+
+        with self.assertRaises(ValueError):
+            Metrics.merge([a, b])
+
+
+@skipUnless(signals_available, 'blinker is not installed')
+class SnapshotDirTest(TestCase):
+    def setUp(self):
+        self.snapshot_dir = tempfile.mkdtemp()
+        self.app = ResponsiveFlask(__name__)
+
+        @self.app.route('/')
+        def hello_world():
+            return {'hello': 'world'}
+
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        shutil.rmtree(self.snapshot_dir)
+
+    def test_snapshots_of_processes_are_merged(self):
+        other_process = {
+            'routes': {'hello_world': {'application/json': {
+                'requests': {'200': 5},
+            }}},
+            'not_acceptable': {},
+            'hawk_failures': {},
+        }
+        with open(self.snapshot_dir + '/metrics-0.json', 'w') as f:
+            json.dump(other_process, f)
+        metrics = Metrics(self.app, snapshot_dir=self.snapshot_dir)
+        self.client.get('/')
+
+        route = metrics.collect()['routes']['hello_world']
+        self.assertEqual(route['application/json']['requests'], {'200': 6})
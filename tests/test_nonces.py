@@ -0,0 +1,77 @@
+# coding: utf-8
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from api_utils.nonces import MemoryNonceStore, SQLiteNonceStore
+
+from .utils import Clock
+
+SKEW = 60
+
+
+class NonceStoreTestMixin(object):
+    def make_store(self, clock):
+        raise NotImplementedError()
+
+    def setUp(self):
+        self.clock = Clock()
+        self.store = self.make_store(self.clock)
+        self.ts = str(int(self.clock.now))
+
+    def test_nonce_is_not_seen_first_time(self):
+        self.assertFalse(self.store.seen('Alice', 'abc', self.ts, SKEW))
+
+    def test_nonce_is_seen_second_time(self):
+        self.store.seen('Alice', 'abc', self.ts, SKEW)
+
+        self.assertTrue(self.store.seen('Alice', 'abc', self.ts, SKEW))
+
+    def test_nonces_of_different_senders_do_not_clash(self):
+        self.store.seen('Alice', 'abc', self.ts, SKEW)
+
+        self.assertFalse(self.store.seen('Bob', 'abc', self.ts, SKEW))
+
+    def test_nonce_outside_of_window_is_not_stored(self):
+        expired_ts = str(int(self.clock.now) - SKEW - 1)
+
+        self.store.seen('Alice', 'abc', expired_ts, SKEW)
+
+        self.assertEqual(len(self.store), 0)
+
+    def test_stale_buckets_are_dropped(self):
+        for i in range(10):
+            self.store.seen('Alice', str(i), self.ts, SKEW)
+        self.clock.now += 3 * SKEW
+        ts = str(int(self.clock.now))
+        self.store.seen('Alice', 'new', ts, SKEW)
+
+        self.assertEqual(len(self.store), 1)
+
+    def test_nonce_is_remembered_within_window(self):
+        self.store.seen('Alice', 'abc', self.ts, SKEW)
+        self.clock.now += SKEW
+
+        self.assertTrue(self.store.seen('Alice', 'abc', self.ts, SKEW))
+
+
+class MemoryNonceStoreTest(NonceStoreTestMixin, TestCase):
+    def make_store(self, clock):
+        return MemoryNonceStore(clock=clock)
+
+
+class SQLiteNonceStoreTest(NonceStoreTestMixin, TestCase):
+    def make_store(self, clock):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'nonces.db')
+        return SQLiteNonceStore(self.path, clock=clock)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_nonces_are_shared_by_store_instances(self):
+        self.store.seen('Alice', 'abc', self.ts, SKEW)
+        another_store = SQLiteNonceStore(self.path, clock=self.clock)
+
+        self.assertTrue(another_store.seen('Alice', 'abc', self.ts, SKEW))
@@ -0,0 +1,215 @@
+# coding: utf-8
+import json
+from unittest import TestCase, skipIf
+
+from flask import request
+from flask.testsuite import FlaskTestCase
+from api_utils import ResponsiveFlask, Hawk, parsers
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+from .utils import make_sender
+
+CREDENTIALS = {
+    'id': 'Alice',
+    'key': 'werxhqb98rpaxn39848xrunpaw3489ruxnpa98w4rxn',
+    'algorithm': 'sha256'
+}
+
+
+class ParsersTest(TestCase):
+    def setUp(self):
+        self.app = ResponsiveFlask(__name__)
+
+    def test_json(self):
+        with self.app.test_request_context():
+            self.assertEqual(parsers.json(b'{"a": [1, null]}'),
+                             {'a': [1, None]})
+
+    def test_ndjson(self):
+        with self.app.test_request_context():
+            self.assertEqual(parsers.ndjson(b'{"id": 1}\n\n{"id": 2}\n'),
+                             [{'id': 1}, {'id': 2}])
+
+    def test_ndjson_stream(self):
+        with self.app.test_request_context():
+            records = parsers.ndjson.stream(iter([b'{"id": 1}\n', b'[2]']))
+            self.assertEqual(next(records), {'id': 1})
+            self.assertEqual(next(records), [2])
+
+    @skipIf(msgpack is None, 'msgpack is not installed')
+    def test_msgpack(self):
+        data = msgpack.packb({'title': u'Caf\xe9'}, use_bin_type=True)
+        self.assertEqual(parsers.msgpack(data), {'title': u'Caf\xe9'})
+
+
+class RequestPayloadTest(FlaskTestCase):
+    def setUp(self):
+        self.app = ResponsiveFlask(__name__)
+        self.app.config['JSONIFY_PRETTYPRINT_REGULAR'] = False
+        self.parsed = []
+
+        @self.app.route('/products', methods=['POST'])
+        def create_product():
+            return {'payload': request.payload,
+                    'same': request.payload is request.payload}
+
+        @self.app.route('/records', methods=['POST'])
+        def create_records():
+            records = request.iter_payload()
+            self.parsed.append(next(records))
+            return {'count': 1 + len(list(records))}
+
+        self.client = self.app.test_client()
+
+    def post(self, path, data, content_type):
+        r = self.client.post(path, data=data, content_type=content_type)
+        if r.status_code != 200:
+            return r.status_code, None
+        return r.status_code, json.loads(r.data.decode('utf-8'))
+
+    def test_json_payload_is_parsed_once(self):
+        status, body = self.post('/products', '{"id": 1}', 'application/json')
+
+        self.assertEqual(status, 200)
+        self.assertEqual(body, {'payload': {'id': 1}, 'same': True})
+
+    def test_structured_syntax_suffix_is_parsed(self):
+        status, body = self.post(
+            '/products', '{"id": 1}', 'application/vnd.company+json'
+        )
+
+        self.assertEqual(body['payload'], {'id': 1})
+
+    def test_empty_body_is_none(self):
+        status, body = self.post('/products', '', None)
+
+        self.assertEqual(body['payload'], None)
+
+    def test_415_when_content_type_is_unknown(self):
+        status, _ = self.post('/products', '<id>1</id>', 'application/xml')
+
+        self.assertEqual(status, 415)
+
+    def test_415_when_content_type_is_missing(self):
+        status, _ = self.post('/products', '{"id": 1}', '')
+
+        self.assertEqual(status, 415)
+
+    def test_400_when_payload_is_malformed(self):
+        status, _ = self.post('/products', '{"id":', 'application/json')
+
+        self.assertEqual(status, 400)
+
+    def test_413_when_payload_is_too_large(self):
+        self.app.config['REQUEST_PAYLOAD_MAX_SIZE'] = 10
+
+        status, _ = self.post('/products', '{"id": 100000}',
+                              'application/json')
+
+        self.assertEqual(status, 413)
+
+    def test_size_is_not_limited_when_limit_is_none(self):
+        self.app.config['REQUEST_PAYLOAD_MAX_SIZE'] = None
+
+        status, body = self.post('/products', '{"id": 100000}',
+                                 'application/json')
+
+        self.assertEqual(body['payload'], {'id': 100000})
+
+    def test_ndjson_records_are_streamed(self):
+        status, body = self.post(
+            '/records', '{"id": 1}\n{"id": 2}\n{"id": 3}\n',
+            'application/x-ndjson'
+        )
+
+        self.assertEqual(self.parsed, [{'id': 1}])
+        self.assertEqual(body, {'count': 3})
+
+    def test_413_when_ndjson_line_is_too_large(self):
+        self.app.config['REQUEST_PAYLOAD_MAX_SIZE'] = 12
+
+        status, _ = self.post(
+            '/records', '{"id": 1}\n{"id": 100000}\n', 'application/x-ndjson'
+        )
+
+        self.assertEqual(status, 413)
+
+    def test_json_list_is_iterated(self):
+        status, body = self.post('/records', '[1, 2]', 'application/json')
+
+        self.assertEqual(body, {'count': 2})
+
+    def test_400_when_json_is_not_list_of_records(self):
+        status, _ = self.post('/records', '{"id": 1}', 'application/json')
+
+        self.assertEqual(status, 400)
+
+    @skipIf(msgpack is None, 'msgpack is not installed')
+    def test_registered_msgpack_parser(self):
+        self.app.request_parsers['application/msgpack'] = parsers.msgpack
+
+        status, body = self.post('/products', msgpack.packb({'id': 1}),
+                                 'application/msgpack')
+
+        self.assertEqual(body['payload'], {'id': 1})
+
+
+class HawkRequestPayloadTest(FlaskTestCase):
+    def setUp(self):
+        self.app = ResponsiveFlask(__name__)
+        self.hawk = Hawk(self.app)
+        self.reads = []
+
+        @self.hawk.client_key_loader
+        def get_client_key(client_id):
+            return CREDENTIALS['key']
+
+        @self.app.route('/products', methods=['POST'])
+        @self.hawk.auth_required
+        def create_product():
+            return {'payload': request.payload}
+
+        self.client = self.app.test_client()
+
+    def signed_post(self, content):
+        sender = make_sender(CREDENTIALS, 'POST', '/products', content,
+                             'application/json')
+        return self.client.post(
+            '/products', data=content, content_type='application/json',
+            headers={'Authorization': sender.request_header}
+        )
+
+    def count_reads(self):
+        reads = self.reads
+
+        @self.app.before_request
+        def wrap_input():
+            wsgi_input = request.environ['wsgi.input']
+            read = wsgi_input.read
+
+            def counted_read(*args):
+                data = read(*args)
+                if data:
+                    reads.append(len(data))
+                return data
+            wsgi_input.read = counted_read
+
+    def test_body_is_read_once(self):
+        self.count_reads()
+
+        r = self.signed_post('{"id": 1}')
+
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(self.reads, [len('{"id": 1}')])
+
+    def test_spooled_body_is_parsed(self):
+        self.app.config['HAWK_STREAMING_PAYLOAD_HASH'] = True
+
+        r = self.signed_post('{"id": 1}')
+
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(json.loads(r.data.decode('utf-8')),
+                         {'payload': {'id': 1}})
@@ -0,0 +1,60 @@
+# coding: utf-8
+from unittest import TestCase
+
+from flask import Flask, request
+from mohawk.util import calculate_payload_hash
+from api_utils.payload import hash_payload, spool_request_body
+
+app = Flask(__name__)
+
+
+class HashPayloadTest(TestCase):
+    def test_hash_is_equal_to_mohawk_hash(self):
+        content = u'caf\xe9' * 1000
+        with app.test_request_context(
+                method='POST', data=content.encode('utf-8'),
+                content_type='Application/JSON; charset=utf-8'):
+            payload_hash = hash_payload(request, 'sha256', max_size=64)
+
+        self.assertEqual(
+            payload_hash,
+            calculate_payload_hash(
+                content.encode('utf-8'), 'sha256', 'application/json'
+            )
+        )
+
+    def test_hash_of_already_read_body(self):
+        with app.test_request_context(
+                method='POST', data='hello', content_type='text/plain'):
+            request.get_data()
+            payload_hash = hash_payload(request, 'sha256', max_size=64)
+
+        self.assertEqual(
+            payload_hash,
+            calculate_payload_hash(b'hello', 'sha256', 'text/plain')
+        )
+
+
+class SpoolRequestBodyTest(TestCase):
+    def test_large_body_is_spooled_to_disk(self):
+        with app.test_request_context(method='POST', data='x' * 1000):
+            spool = spool_request_body(request, max_size=100)
+
+            self.assertTrue(spool._rolled)
+            self.assertEqual(request.get_data(), b'x' * 1000)
+
+    def test_small_body_is_kept_in_memory(self):
+        with app.test_request_context(method='POST', data='x' * 10):
+            spool = spool_request_body(request, max_size=100)
+
+            self.assertFalse(spool._rolled)
+            self.assertEqual(request.stream.read(), b'x' * 10)
+
+    def test_chunks_are_passed_to_callback(self):
+        chunks = []
+        with app.test_request_context(method='POST', data='x' * 10):
+            spool_request_body(
+                request, max_size=100, chunk_size=4, callback=chunks.append
+            )
+
+        self.assertEqual(chunks, [b'xxxx', b'xxxx', b'xx'])
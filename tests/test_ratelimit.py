@@ -0,0 +1,102 @@
+# coding: utf-8
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from api_utils.ratelimit import (
+    MemoryRateLimitBackend, RateLimitExceeded, SQLiteRateLimitBackend
+)
+
+from .utils import Clock
+
+
+class RateLimitBackendTestMixin(object):
+    def make_backend(self, clock):
+        raise NotImplementedError()
+
+    def setUp(self):
+        self.clock = Clock()
+        self.backend = self.make_backend(self.clock)
+
+    def test_burst_is_allowed(self):
+        waits = [self.backend.consume('Alice', 1, 3) for _ in range(3)]
+
+        self.assertEqual(waits, [0, 0, 0])
+
+    def test_request_is_rejected_when_bucket_is_empty(self):
+        for _ in range(3):
+            self.backend.consume('Alice', 2, 3)
+
+        self.assertAlmostEqual(self.backend.consume('Alice', 2, 3), 0.5)
+
+    def test_bucket_is_refilled_with_time(self):
+        for _ in range(3):
+            self.backend.consume('Alice', 2, 3)
+        self.clock.now += 0.5
+
+        self.assertEqual(self.backend.consume('Alice', 2, 3), 0)
+        self.assertGreater(self.backend.consume('Alice', 2, 3), 0)
+
+    def test_bucket_is_not_refilled_over_burst(self):
+        self.backend.consume('Alice', 1, 2)
+        self.clock.now += 100
+
+        waits = [self.backend.consume('Alice', 1, 2) for _ in range(3)]
+
+        self.assertEqual(waits[:2], [0, 0])
+        self.assertGreater(waits[2], 0)
+
+    def test_clients_have_separate_buckets(self):
+        self.backend.consume('Alice', 1, 1)
+
+        self.assertEqual(self.backend.consume('Bob', 1, 1), 0)
+
+
+class MemoryRateLimitBackendTest(RateLimitBackendTestMixin, TestCase):
+    def make_backend(self, clock):
+        return MemoryRateLimitBackend(clock=clock)
+
+    def test_evicted_bucket_is_full(self):
+        backend = MemoryRateLimitBackend(maxsize=1, clock=self.clock)
+        backend.consume('Alice', 1, 1)
+        backend.consume('Bob', 1, 1)
+
+        self.assertEqual(backend.consume('Alice', 1, 1), 0)
+
+
+class SQLiteRateLimitBackendTest(RateLimitBackendTestMixin, TestCase):
+    def make_backend(self, clock):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'rate_limits.db')
+        return SQLiteRateLimitBackend(self.path, clock=clock)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_buckets_are_shared_by_backend_instances(self):
+        self.backend.consume('Alice', 1, 1)
+        another_backend = SQLiteRateLimitBackend(self.path, clock=self.clock)
+
+        self.assertGreater(another_backend.consume('Alice', 1, 1), 0)
+
+    def test_full_buckets_are_deleted(self):
+        self.backend.cleanup_interval = 2
+        self.backend.consume('Alice', 1, 1)
+        self.clock.now += 10
+        self.backend.consume('Bob', 1, 1)
+
+        self.assertEqual(len(self.backend), 1)
+
+
+class RateLimitExceededTest(TestCase):
+    def test_retry_after_is_rounded_up(self):
+        e = RateLimitExceeded(0.2)
+
+        self.assertEqual(e.code, 429)
+        self.assertIn(('Retry-After', '1'), e.get_headers())
+
+    def test_retry_after_is_in_whole_seconds(self):
+        e = RateLimitExceeded(2.5)
+
+        self.assertIn(('Retry-After', '3'), e.get_headers())
@@ -0,0 +1,269 @@
+# coding: utf-8
+from datetime import datetime
+
+from flask import abort
+from flask.testsuite import FlaskTestCase
+from api_utils import ResponsiveFlask, Hawk, formatters
+from api_utils.cache import ResponseCache
+from api_utils.schema import (
+    SchemaSerializer, SchemaError, Optional, Any, output_schema
+)
+
+from .utils import make_sender
+
+CREDENTIALS = {
+    'id': 'Alice',
+    'key': 'werxhqb98rpaxn39848xrunpaw3489ruxnpa98w4rxn',
+    'algorithm': 'sha256'
+}
+
+product_schema = {
+    'id': int,
+    'title': str,
+    'price': float,
+    'available': bool,
+    'created': datetime,
+    'tags': [str],
+    'owner': Optional({'id': int, 'name': str}),
+    'extra': Any,
+}
+
+
+def product(i):
+    return {
+        'id': i,
+        'title': u'Caf\xe9 "{0}"'.format(i),
+        'price': i * 1.5,
+        'available': i % 2 == 0,
+        'created': datetime(2014, 1, 1),
+        'tags': ['new', 'sale'],
+        'owner': {'id': 1, 'name': 'Bob'} if i % 2 else None,
+        'extra': {'b': [1, None], 'a': 2},
+    }
+
+
+def product_list():
+    return {'count': 3, 'objects': [product(i) for i in range(3)]}
+
+
+class SchemaSerializerTest(FlaskTestCase):
+    def setUp(self):
+        self.app = ResponsiveFlask(__name__)
+        self.app.config['JSONIFY_PRETTYPRINT_REGULAR'] = False
+        self.serializer = SchemaSerializer(
+            {'count': int, 'objects': [product_schema]}
+        )
+
+    def test_output_is_the_same_as_of_json_formatter(self):
+        with self.app.test_request_context():
+            self.assertEqual(
+                self.serializer(**product_list()),
+                formatters.json(**product_list())
+            )
+
+    def test_keys_are_not_sorted_when_app_does_not_sort_them(self):
+        self.app.config['JSON_SORT_KEYS'] = False
+        serializer = SchemaSerializer({'b': int, 'a': int})
+
+        with self.app.test_request_context():
+            self.assertEqual(serializer(a=1, b=2), '{"b": 2, "a": 1}')
+
+    def test_non_ascii_is_kept_when_app_allows_it(self):
+        self.app.config['JSON_AS_ASCII'] = False
+        serializer = SchemaSerializer({'title': str})
+
+        with self.app.test_request_context():
+            self.assertEqual(serializer(title=u'Caf\xe9'),
+                             u'{"title": "Caf\xe9"}')
+
+    def test_pretty_print_is_formatted_by_json_formatter(self):
+        self.app.config['JSONIFY_PRETTYPRINT_REGULAR'] = True
+
+        with self.app.test_request_context():
+            self.assertEqual(
+                self.serializer(**product_list()),
+                formatters.json(**product_list())
+            )
+
+    def test_empty_list_and_dict(self):
+        serializer = SchemaSerializer({'tags': [str], 'meta': {}})
+
+        with self.app.test_request_context():
+            self.assertEqual(serializer(tags=[], meta={}),
+                             '{"meta": {}, "tags": []}')
+
+    def test_nested_lists(self):
+        serializer = SchemaSerializer({'matrix': [[int]]})
+
+        with self.app.test_request_context():
+            self.assertEqual(serializer(matrix=[[1, 2], [3]]),
+                             '{"matrix": [[1, 2], [3]]}')
+
+    def test_source_is_python(self):
+        compile(self.serializer._serializers[(True, True)].source,
+                '<test>', 'exec')
+
+    def test_malformed_schema_raises_error(self):
+        with self.assertRaises(SchemaError):
+            SchemaSerializer({'tags': [str, int]})
+        with self.assertRaises(SchemaError):
+            SchemaSerializer({'price': object})
+        with self.assertRaises(SchemaError):
+            SchemaSerializer([int])
+
+    def test_response_is_not_validated_in_production(self):
+        serializer = SchemaSerializer({'id': int})
+
+        with self.app.test_request_context():
+            self.assertEqual(serializer(id='1'), '{"id": 1}')
+
+    def test_response_is_validated_in_debug_mode(self):
+        self.app.debug = True
+        serializer = SchemaSerializer({'owner': Optional({'id': int})})
+
+        with self.app.test_request_context():
+            serializer(owner=None)
+            with self.assertRaises(SchemaError):
+                serializer(owner={'id': '1'})
+            with self.assertRaises(SchemaError):
+                serializer(owner={'id': 1, 'name': 'Bob'})
+            with self.assertRaises(SchemaError):
+                serializer(owner={'id': True})
+
+    def test_serializer_can_be_registered_as_formatter(self):
+        self.app.response_formatters['application/vnd.product+json'] = (
+            SchemaSerializer({'id': int})
+        )
+
+        @self.app.route('/')
+        def product_detail():
+            return {'id': 1}
+
+        r = self.app.test_client().get(
+            '/', headers={'Accept': 'application/vnd.product+json'}
+        )
+
+        self.assertEqual(r.data, b'{"id": 1}')
+
+    def test_registered_serializer_does_not_format_errors(self):
+        self.app.response_formatters['application/vnd.product+json'] = (
+            SchemaSerializer({'id': int})
+        )
+
+        @self.app.default_errorhandler
+        def error_handler(error):
+            return {'error': error.description}, error.code
+
+        @self.app.route('/')
+        def product_detail():
+            return {'message': 'not found'}, 404
+
+        client = self.app.test_client()
+        headers = {'Accept': 'application/vnd.product+json'}
+        missing = client.get('/missing', headers=headers)
+        returned = client.get('/', headers=headers)
+
+        self.assertEqual(missing.status_code, 404)
+        self.assertIn(b'"error": ', missing.data)
+        self.assertEqual(returned.status_code, 404)
+        self.assertEqual(returned.data, b'{"message": "not found"}')
+
+
+class OutputSchemaTest(FlaskTestCase):
+    def setUp(self):
+        self.app = ResponsiveFlask(__name__)
+        self.app.config['JSONIFY_PRETTYPRINT_REGULAR'] = False
+        self.app.debug = True
+        self.app.config['PROPAGATE_EXCEPTIONS'] = False
+        self.app.config['PRESERVE_CONTEXT_ON_EXCEPTION'] = False
+        self.app.add_url_rule('/products', view_func=output_schema(
+            {'count': int, 'objects': [product_schema]}
+        )(product_list))
+        self.client = self.app.test_client()
+
+    def test_json_response_is_serialized_by_schema(self):
+        r = self.client.get('/products')
+
+        with self.app.test_request_context():
+            expected = formatters.json(**product_list())
+        self.assertEqual(r.data.decode('utf-8'), expected)
+
+    def test_invalid_response_fails_in_debug_mode(self):
+        @self.app.route('/broken')
+        @output_schema({'id': int})
+        def broken():
+            return {'id': None}
+
+        r = self.client.get('/broken')
+
+        self.assertEqual(r.status_code, 500)
+
+    def test_other_formatters_are_used_for_other_mimetypes(self):
+        self.app.response_formatters['application/x-ndjson'] = (
+            formatters.ndjson
+        )
+
+        r = self.client.get(
+            '/products', headers={'Accept': 'application/x-ndjson'}
+        )
+
+        self.assertTrue(r.data.endswith(b'\n'))
+
+    def test_error_returned_by_view_is_formatted_by_json_formatter(self):
+        @self.app.route('/missing')
+        @output_schema({'id': int})
+        def missing():
+            return {'message': 'not found'}, 404
+
+        r = self.client.get('/missing')
+
+        self.assertEqual(r.status_code, 404)
+        self.assertEqual(r.data, b'{"message": "not found"}')
+
+    def test_error_handler_response_is_formatted_by_json_formatter(self):
+        @self.app.errorhandler(404)
+        def not_found(error):
+            return {'message': 'not found'}, 404
+
+        @self.app.route('/aborted')
+        @output_schema({'id': int})
+        def aborted():
+            abort(404)
+
+        r = self.client.get('/aborted')
+
+        self.assertEqual(r.status_code, 404)
+        self.assertEqual(r.data, b'{"message": "not found"}')
+
+    def test_schema_is_used_by_cached_view(self):
+        cache = ResponseCache(self.app)
+
+        @self.app.route('/cached')
+        @cache.cached()
+        @output_schema({'id': int})
+        def cached():
+            return {'id': '1'}
+
+        r = self.client.get('/cached')
+
+        self.assertEqual(r.status_code, 500)
+
+    def test_schema_is_kept_by_auth_decorator(self):
+        hawk = Hawk(self.app)
+
+        @hawk.client_key_loader
+        def get_client_key(client_id):
+            return CREDENTIALS['key']
+
+        @self.app.route('/private')
+        @hawk.auth_required
+        @output_schema({'id': int})
+        def private():
+            return {'id': '1'}
+
+        sender = make_sender(CREDENTIALS, path='/private')
+        r = self.client.get('/private', headers={
+            'Authorization': sender.request_header
+        })
+
+        self.assertEqual(r.status_code, 500)
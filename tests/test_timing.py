@@ -0,0 +1,124 @@
+# coding: utf-8
+from unittest import TestCase, skipUnless
+
+from flask.signals import signals_available
+from flask.testsuite import FlaskTestCase
+from api_utils import ResponsiveFlask, Hawk
+from api_utils.signals import phase_timed
+
+from .utils import make_sender
+
+CREDENTIALS = {
+    'id': 'Alice',
+    'key': 'werxhqb98rpaxn39848xrunpaw3489ruxnpa98w4rxn',
+    'algorithm': 'sha256'
+}
+
+
+def hello_world():
+    return {'hello': 'world'}
+
+
+def records():
+    return iter([{'id': 1}])
+
+
+class ServerTimingTest(FlaskTestCase):
+    def setUp(self):
+        self.app = ResponsiveFlask(__name__)
+        self.app.add_url_rule('/', view_func=hello_world)
+        self.app.add_url_rule('/records', view_func=records)
+        self.client = self.app.test_client()
+
+    def phases(self, header):
+        return [metric.split(';')[0] for metric in header.split(', ')]
+
+    def test_header_is_not_sent_by_default(self):
+        r = self.client.get('/')
+
+        self.assertNotIn('Server-Timing', r.headers)
+
+    def test_header_contains_phases(self):
+        self.app.config['SERVER_TIMING_ENABLED'] = True
+
+        r = self.client.get('/')
+
+        self.assertEqual(
+            self.phases(r.headers['Server-Timing']), ['negotiation', 'format']
+        )
+
+    def test_durations_are_in_milliseconds(self):
+        self.app.config['SERVER_TIMING_ENABLED'] = True
+
+        r = self.client.get('/')
+
+        for metric in r.headers['Server-Timing'].split(', '):
+            name, duration = metric.split(';dur=')
+            self.assertLess(float(duration), 1000)
+
+    def test_streamed_response_is_timed(self):
+        self.app.config['SERVER_TIMING_ENABLED'] = True
+
+        r = self.client.get('/records')
+
+        self.assertIn('format', self.phases(r.headers['Server-Timing']))
+
+    def test_406_is_timed(self):
+        self.app.config['SERVER_TIMING_ENABLED'] = True
+
+        r = self.client.get('/', headers={'Accept': 'text/html'})
+
+        self.assertEqual(r.status_code, 406)
+        self.assertIn('format', self.phases(r.headers['Server-Timing']))
+
+
+@skipUnless(signals_available, 'blinker is not installed')
+class PhaseTimedSignalTest(TestCase):
+    def setUp(self):
+        self.app = ResponsiveFlask(__name__)
+        self.app.config['HAWK_SIGN_RESPONSE'] = True
+        hawk = Hawk(self.app)
+
+        @hawk.client_key_loader
+        def get_client_key(client_id):
+            return CREDENTIALS['key']
+
+        @self.app.route('/')
+        @hawk.auth_required
+        def protected_view():
+            return {'hello': 'world'}
+
+        self.client = self.app.test_client()
+        self.timings = []
+        phase_timed.connect(self.receiver, sender=self.app)
+
+    def tearDown(self):
+        phase_timed.disconnect(self.receiver, sender=self.app)
+
+    def receiver(self, sender, phase, duration):
+        self.timings.append((phase, duration))
+
+    def test_phases_are_sent_to_receivers(self):
+        sender = make_sender(CREDENTIALS)
+
+        r = self.client.get('/', headers={
+            'Authorization': sender.request_header,
+        })
+
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(
+            [phase for phase, _ in self.timings],
+            ['hawk-credentials', 'hawk-verify', 'negotiation', 'format',
+             'hawk-sign']
+        )
+        for _, duration in self.timings:
+            self.assertGreaterEqual(duration, 0)
+
+    def test_header_is_not_sent_when_only_signal_is_used(self):
+        sender = make_sender(CREDENTIALS)
+
+        r = self.client.get('/', headers={
+            'Authorization': sender.request_header,
+        })
+
+        self.assertNotIn('Server-Timing', r.headers)
@@ -4,19 +4,32 @@ import json
 import mohawk
 
 
+def make_sender(credentials, method='GET', path='/', content='',
+                content_type=''):
+    return mohawk.Sender(
+        credentials,
+        'http://localhost' + path,
+        method,
+        content,
+        content_type
+    )
+
+
+class Clock(object):
+    """Time function of tests which is moved by setting ``now``."""
+    def __init__(self, now=1400000000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
 class HawkTestMixin(object):
     def signed_request(self, credentials, method='GET', path='/', data=None):
-        url = 'http://localhost' + path
         content = json.dumps(data)
         content_type = 'application/json'
 
-        sender = mohawk.Sender(
-            credentials,
-            url,
-            method,
-            content,
-            content_type
-        )
+        sender = make_sender(credentials, method, path, content, content_type)
 
         return self.client.open(
             method=method,